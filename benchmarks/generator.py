@@ -0,0 +1,222 @@
+"""Synthetic races for benchmarks
+
+from benchmarks.generator import generate_event
+generate_event("relay", persons=5000, seed=1)
+"""
+
+import random
+from typing import List
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    ControlPoint,
+    Course,
+    CourseControl,
+    Group,
+    Organization,
+    Person,
+    Qualification,
+    Race,
+    RaceType,
+    ResultSportident,
+    ResultStatus,
+    Split,
+    create,
+    new_event,
+    set_current_race_index,
+)
+
+KINDS = ("individual", "relay", "scores", "ardf", "multi_day")
+
+GROUP_SIZE = 100
+ORGANIZATION_SIZE = 20
+RELAY_LEGS = 4
+# relay bib is leg * 1000 + team number
+MAX_RELAY_TEAMS = 999
+MULTI_DAY_COUNT = 3
+START_CORRIDORS = 10
+
+DNS_RATE = 0.03
+MISSING_PUNCH_RATE = 0.02
+EXTRA_PUNCH_RATE = 0.05
+
+SURNAMES = [
+    "Ivanov",
+    "Smirnov",
+    "Kuznetsov",
+    "Popov",
+    "Vasiliev",
+    "Petrov",
+    "Sokolov",
+    "Mikhailov",
+    "Novikov",
+    "Fedorov",
+]
+NAMES = ["Alexey", "Dmitry", "Ivan", "Sergey", "Anna", "Elena", "Maria", "Olga"]
+
+
+def generate_event(
+    kind: str = "individual", persons: int = 1000, seed: int = 0
+) -> List[Race]:
+    """Create the event and make it current, multi day kind has several races"""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown race kind: {kind}")
+
+    days = MULTI_DAY_COUNT if kind == "multi_day" else 1
+    event = [create(Race) for _ in range(days)]
+    new_event(event)
+    for day, obj in enumerate(event):
+        set_current_race_index(day)
+        _RaceGenerator(obj, kind, persons, random.Random(seed * 100 + day)).generate()
+    set_current_race_index(0)
+    return event
+
+
+class _RaceGenerator:
+    def __init__(self, obj: Race, kind: str, persons: int, rnd: random.Random):
+        self.race = obj
+        self.kind = kind
+        self.persons = persons
+        self.random = rnd
+        self.organizations: List[Organization] = []
+        self.relay_team_count = 0
+
+    def generate(self) -> None:
+        obj = self.race
+        obj.data.title = f"Benchmark {self.kind} {self.persons}"
+        obj.set_setting("scores_mode", "formula")
+        obj.set_setting("scores_formula", "round(1000 * leader / time)")
+        if self.kind == "scores":
+            obj.set_setting("result_processing_mode", "scores")
+            obj.set_setting("result_processing_score_mode", "rogain")
+        elif self.kind == "ardf":
+            obj.set_setting("result_processing_mode", "ardf")
+        elif self.kind == "relay":
+            obj.data.race_type = RaceType.RELAY
+        elif self.kind == "multi_day":
+            obj.data.race_type = RaceType.MULTI_DAY_RACE
+
+        for i in range(max(1, self.persons // ORGANIZATION_SIZE)):
+            org = create(Organization, name=f"Club {i + 1}")
+            obj.organizations.append(org)
+            self.organizations.append(org)
+
+        if self.kind == "scores":
+            for code in range(31, 100):
+                control = create(ControlPoint, code=str(code), score=code // 10)
+                obj.controls.append(control)
+
+        group_count = max(1, self.persons // GROUP_SIZE)
+        for i in range(group_count):
+            count = self.persons // group_count
+            if i < self.persons % group_count:
+                count += 1
+            self._add_group(i, count)
+
+    def _add_group(self, index: int, count: int) -> None:
+        obj = self.race
+        course = create(Course, name=f"C{index + 1}")
+        course.controls = self._make_controls()
+        obj.courses.append(course)
+        course.index_name()
+
+        group = create(Group, name=f"G{index + 1}", course=course)
+        group.start_interval = OTime(minute=1)
+        group.start_corridor = index % START_CORRIDORS + 1
+        group.order_in_corridor = index
+        if self.kind == "scores":
+            group.max_time = OTime(hour=1, minute=30)
+        obj.groups.append(group)
+
+        if self.kind == "relay":
+            group.set_type(RaceType.RELAY)
+            for _ in range(count // RELAY_LEGS):
+                if self.relay_team_count >= MAX_RELAY_TEAMS:
+                    break
+                self.relay_team_count += 1
+                self._add_relay_team(group, self.relay_team_count)
+        else:
+            if self.kind == "multi_day":
+                group.set_type(RaceType.MULTI_DAY_RACE)
+            for i in range(count):
+                person = self._add_person(group, index * 1000 + i + 1)
+                person.start_time = OTime(hour=10, minute=i)
+                self._add_result(person, person.start_time)
+
+    def _add_relay_team(self, group: Group, bib: int) -> None:
+        start = OTime(hour=10)
+        for leg in range(1, RELAY_LEGS + 1):
+            person = self._add_person(group, leg * 1000 + bib)
+            person.start_time = start
+            result = self._add_result(person, start)
+            if not result:
+                break
+            start = result.finish_time
+
+    def _make_controls(self) -> List[CourseControl]:
+        codes = self.random.sample(range(31, 100), self.random.randint(8, 25))
+        controls = []
+        for code in codes:
+            control = CourseControl()
+            if self.kind == "ardf":
+                control.code = f"?({code})"
+            else:
+                control.code = str(code)
+            control.length = self.random.randint(100, 800)
+            controls.append(control)
+        return controls
+
+    def _add_person(self, group: Group, bib: int) -> Person:
+        obj = self.race
+        person = Person()
+        # same and unique names on each day for multi day index
+        person.surname = SURNAMES[bib % len(SURNAMES)]
+        person.name = f"{NAMES[bib % len(NAMES)]} {bib}"
+        person.group = group
+        person.organization = self.random.choice(self.organizations)
+        person.qual = self.random.choice(list(Qualification))
+        person.set_year(self.random.randint(1950, 2015))
+        person.set_bib(bib)
+        person.set_card_number(100000 + bib)
+        obj.persons.append(person)
+        return person
+
+    def _add_result(self, person: Person, start: OTime):
+        if self.random.random() < DNS_RATE:
+            return None
+
+        course = person.group.course
+        pace = self.random.uniform(4, 10) * 60  # sec per km
+        result = ResultSportident()
+        result.person = person
+        result.card_number = person.card_number
+        result.start_time = start
+
+        msec = start.to_msec()
+        codes = [
+            str(control.get_number_code()) or control.code.strip("?()")
+            for control in course.controls
+        ]
+        if self.kind == "scores":
+            codes = self.random.sample(codes, self.random.randint(1, len(codes)))
+        for control, code in zip(course.controls, codes):
+            msec += int(control.length * pace * self.random.uniform(0.8, 1.5))
+            if self.random.random() < MISSING_PUNCH_RATE:
+                continue
+            if self.random.random() < EXTRA_PUNCH_RATE:
+                result.splits.append(
+                    self._make_split(self.random.randint(31, 99), msec)
+                )
+                msec += 20000
+            result.splits.append(self._make_split(code, msec))
+        result.finish_time = OTime(msec=msec + self.random.randint(10000, 60000))
+        result.status = ResultStatus.OK
+        self.race.results.append(result)
+        return result
+
+    @staticmethod
+    def _make_split(code, msec: int) -> Split:
+        split = Split()
+        split.code = str(code)
+        split.time = OTime(msec=msec)
+        return split
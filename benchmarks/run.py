@@ -0,0 +1,244 @@
+import argparse
+import datetime
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from benchmarks.generator import KINDS, generate_event
+from sportorg import config
+from sportorg.common.otime import OTime
+from sportorg.common.template import get_text_from_file
+from sportorg.models.constant import RentCards
+from sportorg.models.memory import (
+    Race,
+    get_current_race_index,
+    new_event,
+    race,
+    races,
+    set_current_race_index,
+)
+from sportorg.models.result.result_checker import ResultChecker
+from sportorg.models.result.result_tools import recalculate_results
+from sportorg.models.result.score_calculation import ScoreCalculation
+from sportorg.models.result.split_calculation import RaceSplits
+from sportorg.models.start.start_preparation import StartSlotAllocator
+from sportorg.modules.backup import json
+
+DEFAULT_SIZES = [100, 1000, 5000]
+REPORT_TEMPLATE = "reports/1_results.html"
+
+
+def recalculate() -> None:
+    for obj in races():
+        recalculate_results(race_object=obj)
+
+
+def check_all() -> None:
+    ResultChecker.check_all()
+
+
+def race_splits() -> None:
+    RaceSplits(race()).generate()
+
+
+def scores() -> None:
+    ScoreCalculation(race()).calculate_scores()
+
+
+def start_times() -> None:
+    StartSlotAllocator(race()).process(
+        OTime(hour=10), True, OTime(minute=1), course_gap=OTime(minute=2)
+    )
+
+
+def to_dict() -> None:
+    for obj in races():
+        obj.to_dict()
+
+
+def update_data() -> None:
+    event = races()
+    current_race = get_current_race_index()
+    data = [obj.to_dict() for obj in event]
+    # parsing creates indexes in the current race, use temporary one
+    new_event([Race()])
+    try:
+        for race_dict in data:
+            Race().update_data(race_dict)
+    finally:
+        new_event(event)
+        set_current_race_index(current_race)
+
+
+def json_dump(compress: bool = False) -> Callable[[], None]:
+    def step() -> None:
+        with tempfile.TemporaryFile("wb" if compress else "w+") as file:
+            json.dump(file, compress=compress)
+
+    return step
+
+
+def json_autosave() -> Callable[[], None]:
+    """Compact gzip dump, unchanged races are taken from the previous one"""
+    cache = json.DumpCache()
+
+    def step() -> None:
+        with tempfile.TemporaryFile("wb") as file:
+            json.dump_snapshot(
+                file, json.get_snapshot(), compress=True, indent=False, cache=cache
+            )
+
+    return step
+
+
+def json_load() -> None:
+    with tempfile.TemporaryFile("wb+") as file:
+        json.dump(file, compress=True)
+        file.seek(0)
+        json.load(file, compress=True)
+
+
+def report() -> None:
+    races_dict = [r.to_dict() for r in races()]
+    get_text_from_file(
+        REPORT_TEMPLATE,
+        race=races_dict[get_current_race_index()],
+        races=races_dict,
+        rent_cards=list(RentCards().get()),
+        current_race=get_current_race_index(),
+        selected={"persons": []},
+    )
+
+
+# start_times changes start times of persons, json_load replaces the event,
+# so they go last
+STEPS: Dict[str, Callable[[], None]] = {
+    "recalculate_results": recalculate,
+    "check_all": check_all,
+    "race_splits": race_splits,
+    "scores": scores,
+    "to_dict": to_dict,
+    "update_data": update_data,
+    "json_dump": json_dump(),
+    "json_dump_gzip": json_dump(compress=True),
+    "json_autosave": json_autosave(),
+    "report": report,
+    "start_times": start_times,
+    "json_load": json_load,
+}
+
+
+def measure(step: Callable[[], None], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        step()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run(
+    kinds: List[str],
+    sizes: List[int],
+    steps: Optional[List[str]] = None,
+    repeat: int = 3,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    ret = []
+    for kind in kinds:
+        for size in sizes:
+            generate_event(kind, size, seed)
+            recalculate()
+            for name, step in STEPS.items():
+                if steps and name not in steps:
+                    continue
+                timings = measure(step, repeat)
+                item = {
+                    "kind": kind,
+                    "persons": size,
+                    "step": name,
+                    "results": sum(len(obj.results) for obj in races()),
+                    "min": min(timings),
+                    "median": statistics.median(timings),
+                    "timings": timings,
+                }
+                logging.info("%s %s %s: %.4f s", kind, size, name, item["min"])
+                ret.append(item)
+    return ret
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=config.BASE_DIR,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current: List[Dict[str, Any]], path: str) -> List[str]:
+    with open(path, "rb") as f:
+        previous = orjson.loads(f.read())
+    baseline = {
+        (item["kind"], item["persons"], item["step"]): item["min"]
+        for item in previous["benchmarks"]
+    }
+    lines = []
+    for item in current:
+        key = (item["kind"], item["persons"], item["step"])
+        if key in baseline and baseline[key]:
+            lines.append(
+                "{:<10} {:>6} {:<20} {:8.4f} s  x{:.2f}".format(
+                    *key, item["min"], item["min"] / baseline[key]
+                )
+            )
+    return lines
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark result processing on synthetic races",
+    )
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--steps", nargs="+", choices=list(STEPS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks.json")
+    parser.add_argument("--compare", help="previous output file")
+    options = parser.parse_args(args)
+
+    logging.basicConfig(format="%(message)s")
+    logging.getLogger().setLevel(logging.INFO)
+
+    benchmarks = run(
+        options.kinds, options.sizes, options.steps, options.repeat, options.seed
+    )
+    data = {
+        "version": str(config.VERSION),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": datetime.datetime.now().isoformat(),
+        "seed": options.seed,
+        "repeat": options.repeat,
+        "benchmarks": benchmarks,
+    }
+    with open(options.output, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    logging.info("Saved to %s", os.path.abspath(options.output))
+
+    if options.compare:
+        for line in compare(benchmarks, options.compare):
+            print(line)
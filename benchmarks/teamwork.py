@@ -0,0 +1,192 @@
+"""Teamwork throughput on a local server and clients
+
+python -m benchmarks.teamwork --persons 5000 --clients 2
+
+Many stations pushing results, e.g. 20 readout laptops:
+
+python -m benchmarks.teamwork --mode push --persons 5000 --clients 20
+"""
+
+import argparse
+import logging
+import time
+import uuid
+from queue import Queue
+from threading import Event
+from typing import List, Optional, Tuple
+
+from benchmarks.generator import KINDS, generate_event
+from sportorg.models.memory import race
+from sportorg.modules.teamwork.client import ClientThread
+from sportorg.modules.teamwork.packet_header import Operations
+from sportorg.modules.teamwork.server import Command, ServerThread
+
+TIMEOUT = 60
+
+
+class LocalTeamwork:
+    """Server and clients in threads, connected on a free local port"""
+
+    def __init__(self, clients: int = 1):
+        self.stop_event = Event()
+        self.server_in = Queue()
+        self.server_out = Queue()
+        self.server = ServerThread(
+            ("127.0.0.1", 0),
+            self.server_in,
+            self.server_out,
+            self.stop_event,
+            logging.root,
+        )
+        self.client_in: List[Queue] = []
+        self.client_out: List[Queue] = []
+        self.clients: List[ClientThread] = []
+        self.client_count = clients
+
+    def __enter__(self) -> "LocalTeamwork":
+        self.server.start()
+        self.server.wait()
+        for _ in range(self.client_count):
+            in_queue = Queue()
+            out_queue = Queue()
+            client = ClientThread(
+                self.server.addr, in_queue, out_queue, self.stop_event, logging.root
+            )
+            client.start()
+            client.wait()
+            self.client_in.append(in_queue)
+            self.client_out.append(out_queue)
+            self.clients.append(client)
+            # the server sends only to accepted connections, a new object
+            # for every client, so the greeting is never a stale version
+            in_queue.put(Command({"object": "Race", "id": str(uuid.uuid4())}))
+            client.wake()
+            self.server_out.get(timeout=TIMEOUT)
+        # greetings of the clients connected later
+        for i, out_queue in enumerate(self.client_out):
+            for _ in range(self.client_count - i - 1):
+                out_queue.get(timeout=TIMEOUT)
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop_event.set()
+        for client in self.clients:
+            client.wake()
+            client.join()
+        self.server.wake()
+        self.server.join()
+
+
+def get_race_objects() -> List[dict]:
+    obj = race()
+    return [
+        item.to_dict()
+        for items in (
+            obj.courses,
+            obj.groups,
+            obj.organizations,
+            obj.persons,
+            obj.results,
+        )
+        for item in items
+    ]
+
+
+def sync_race(objects: List[dict], race_dict: dict, clients: int = 2) -> float:
+    """Send the race object by object and as one SyncRace packet to all clients"""
+    with LocalTeamwork(clients) as teamwork:
+        start = time.perf_counter()
+        for item in objects:
+            teamwork.server_in.put(Command(item))
+        teamwork.server_in.put(Command(race_dict, Operations.SyncRace.name))
+        teamwork.server.wake()
+        for out_queue in teamwork.client_out:
+            for _ in range(len(objects) + 1):
+                out_queue.get(timeout=TIMEOUT)
+        return time.perf_counter() - start
+
+
+def push_results(results: List[dict], clients: int = 20) -> Tuple[float, float]:
+    """
+    Every client sends its part of the results as a readout station does,
+    the server and every other client get them
+
+    Returns:
+        Time until the server has all results and until every client has them
+    """
+    with LocalTeamwork(clients) as teamwork:
+        parts = [results[i::clients] for i in range(clients)]
+        start = time.perf_counter()
+        for in_queue, client, part in zip(teamwork.client_in, teamwork.clients, parts):
+            for item in part:
+                in_queue.put(Command(item))
+            client.wake()
+        for _ in range(len(results)):
+            teamwork.server_out.get(timeout=TIMEOUT)
+        server_time = time.perf_counter() - start
+        for out_queue, part in zip(teamwork.client_out, parts):
+            for _ in range(len(results) - len(part)):
+                out_queue.get(timeout=TIMEOUT)
+        return server_time, time.perf_counter() - start
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.teamwork",
+        description="Sync a synthetic race from a local teamwork server to clients",
+    )
+    parser.add_argument("--mode", choices=("sync", "push"), default="sync")
+    parser.add_argument("--kind", choices=KINDS, default="individual")
+    parser.add_argument("--persons", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args(args)
+
+    logging.basicConfig(format="%(message)s")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    generate_event(options.kind, options.persons, options.seed)
+    if options.mode == "push":
+        print_push_results(options)
+        return
+    objects = get_race_objects()
+    race_dict = race().to_dict()
+    size = sum(len(Command(item).get_packet()) for item in objects)
+    size += len(Command(race_dict, Operations.SyncRace.name).get_packet())
+
+    timings = [
+        sync_race(objects, race_dict, options.clients) for _ in range(options.repeat)
+    ]
+    best = min(timings)
+    print(
+        "{} objects, {:.1f} MB to {} clients: {:.3f} s, {:.0f} objects/s, "
+        "{:.1f} MB/s".format(
+            len(objects) + 1,
+            size / 1e6,
+            options.clients,
+            best,
+            (len(objects) + 1) * options.clients / best,
+            size * options.clients / best / 1e6,
+        )
+    )
+
+
+def print_push_results(options: argparse.Namespace) -> None:
+    results = [item.to_dict() for item in race().results]
+    timings = [push_results(results, options.clients) for _ in range(options.repeat)]
+    server_time, total_time = min(timings, key=lambda item: item[1])
+    print(
+        "{} results from {} clients: server {:.3f} s, all clients {:.3f} s, "
+        "{:.0f} results/s delivered".format(
+            len(results),
+            options.clients,
+            server_time,
+            total_time,
+            len(results) * options.clients / total_time,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
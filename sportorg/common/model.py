@@ -2,6 +2,8 @@ from typing import Any, Dict
 
 
 class Model:
+    __slots__ = ()
+
     @classmethod
     def create(cls, **kwargs: Dict[str, Any]) -> Any:
         o = cls()
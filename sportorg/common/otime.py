@@ -10,12 +10,50 @@ class TimeRounding(Enum):
     up = 2
 
 
+def _wrap(value):
+    if value < 0:
+        # emulation of midnight - add 1 day if time < 0.
+        # Note, that now we don't support races > 24h
+        # TODO: real day difference, support races > 24h
+        value += 86400000
+    return value
+
+
 class OTime:
-    def __init__(
-        self, day: int = 0, hour: int = 0, minute: int = 0, sec: int = 0, msec: int = 0
+    """Time value in milliseconds. Instances are shared, e.g. OTime() is OTime(0),
+    so never change them in place."""
+
+    __slots__ = ("_msec", "_args")
+
+    def __new__(
+        cls, day: int = 0, hour: int = 0, minute: int = 0, sec: int = 0, msec: int = 0
     ):
-        self._msec = self.get_msec(day, hour, minute, sec, msec)
-        self._args = None
+        return cls._from_msec(
+            _wrap(day * 86400000 + hour * 3600000 + minute * 60000 + sec * 1000 + msec)
+        )
+
+    @classmethod
+    def _from_msec(cls, value) -> "OTime":
+        if value.__class__ is not int:
+            value = value // 1
+        # only zero is shared: it's the default of empty times, other values
+        # come from punches and are rarely equal, a cache lookup on every
+        # arithmetic operation would cost more than it saves
+        if value == 0 and cls is OTime:
+            return _ZERO
+        obj = object.__new__(cls)
+        obj._msec = value
+        obj._args = None
+        return obj
+
+    def __copy__(self) -> "OTime":
+        return self
+
+    def __deepcopy__(self, memo) -> "OTime":
+        return self
+
+    def __reduce__(self):
+        return self.__class__._from_msec, (self._msec,)
 
     @property
     def day(self):
@@ -40,54 +78,65 @@ class OTime:
     @property
     def args(self):
         if self._args is None:
-            day = self._msec // 86400000
-            hour = (self._msec % 86400000) // 3600000
-            minute = ((self._msec % 86400000) % 3600000) // 60000
-            sec = (((self._msec % 86400000) % 3600000) % 60000) // 1000
-            msec = (((self._msec % 86400000) % 3600000) % 60000) % 1000
-
+            day, rest = divmod(self._msec, 86400000)
+            hour, rest = divmod(rest, 3600000)
+            minute, rest = divmod(rest, 60000)
+            sec, msec = divmod(rest, 1000)
             self._args = day, hour, minute, sec, msec
 
         return self._args
 
+    def __hash__(self):
+        return hash(self._msec)
+
     def __eq__(self, other):
         if not isinstance(other, OTime):
             return False
-        return self.to_msec() == other.to_msec()
+        return self._msec == other._msec
 
     def __gt__(self, other):
         if not isinstance(other, OTime):
             return True
-        return self.to_msec() > other.to_msec()
+        return self._msec > other._msec
 
     def __ge__(self, other):
         if not isinstance(other, OTime):
             return False
-        return self.to_msec() >= other.to_msec()
+        return self._msec >= other._msec
+
+    def __lt__(self, other):
+        if not isinstance(other, OTime):
+            return NotImplemented
+        return self._msec < other._msec
+
+    def __le__(self, other):
+        if not isinstance(other, OTime):
+            return NotImplemented
+        return self._msec <= other._msec
 
     def __add__(self, other):
-        return OTime(msec=(self.to_msec() + other.to_msec()))
+        return OTime._from_msec(_wrap(self._msec + other.to_msec()))
 
     def __sub__(self, other):
-        return OTime(msec=(self.to_msec() - other.to_msec()))
+        return OTime._from_msec(_wrap(self._msec - other.to_msec()))
 
     def __mul__(self, mlt):
-        return OTime(msec=int(self.to_msec() * mlt))
+        return OTime(msec=int(self._msec * mlt))
 
     def __truediv__(self, div):
-        return OTime(msec=int(self.to_msec() / div))
+        return OTime(msec=int(self._msec / div))
 
     def __int__(self):
-        return self.to_msec()
+        return self._msec
 
     def __str__(self):
         return self.to_str()
 
     def __repr__(self):
-        return self.__str__()
+        return self.to_str()
 
     def __bool__(self):
-        return self.to_msec() != 0
+        return self._msec != 0
 
     @classmethod
     def now(cls) -> "OTime":
@@ -104,7 +153,7 @@ class OTime:
         )
 
     def copy(self) -> "OTime":
-        return OTime(msec=self.to_msec())
+        return OTime._from_msec(self._msec)
 
     def to_minute(self):
         return trunc(self.to_msec() / (1000 * 60))
@@ -113,6 +162,8 @@ class OTime:
         return trunc(self.to_msec() / 1000)
 
     def to_msec(self, sub_sec: int = 3) -> int:
+        if sub_sec == 3:
+            return self._msec
         if not 0 <= sub_sec <= 3:
             sub_sec = 3
         mlt = 10 ** (3 - sub_sec)
@@ -130,28 +181,25 @@ class OTime:
 
     @staticmethod
     def get_msec(day=0, hour=0, minute=0, sec=0, msec=0):
-        ret = day * 86400000 + hour * 3600000 + minute * 60000 + sec * 1000 + msec
-        if ret < 0:
-            # emulation of midnight - add 1 day if time < 0.
-            # Note, that now we don't support races > 24h
-            # TODO: real day difference, support races > 24h
-            ret += 86400000
-        return ret
+        return _wrap(
+            day * 86400000 + hour * 3600000 + minute * 60000 + sec * 1000 + msec
+        )
 
     @staticmethod
     def if_none(val: Optional[int], default: int) -> int:
         return default if val is None else val
 
     def to_str(self, time_accuracy: int = 0) -> str:
-        hour = self.hour + self.day * 24
+        day, hour, minute, sec, msec = self.args
+        hour += day * 24
         if time_accuracy == 0:
-            return f"{hour:02}:{self.minute:02}:{self.sec:02}"
+            return f"{hour:02}:{minute:02}:{sec:02}"
         elif time_accuracy == 3:
-            return f"{hour:02}:{self.minute:02}:{self.sec:02}.{self.msec:003}"
+            return f"{hour:02}:{minute:02}:{sec:02}.{msec:003}"
         elif time_accuracy == 2:
-            return f"{hour:02}:{self.minute:02}:{self.sec:02}.{self.msec // 10:02}"
+            return f"{hour:02}:{minute:02}:{sec:02}.{msec // 10:02}"
         elif time_accuracy == 1:
-            return f"{hour:02}:{self.minute:02}:{self.sec:02}.{self.msec // 100}"
+            return f"{hour:02}:{minute:02}:{sec:02}.{msec // 100}"
         raise ValueError("time_accuracy is invalid")
 
     def round(
@@ -167,3 +215,8 @@ class OTime:
             new_ms = -(-ms // multiplier) * multiplier  # math.ceil is slower
 
         return OTime(msec=new_ms)
+
+
+_ZERO = object.__new__(OTime)
+_ZERO._msec = 0
+_ZERO._args = None
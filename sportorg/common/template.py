@@ -1,5 +1,7 @@
+import logging
 import os
-from typing import Any, List
+from threading import Thread
+from typing import Any, List, Optional
 
 from sportorg import config, settings
 from sportorg.libs.template import template
@@ -34,3 +36,34 @@ def get_text_from_file(path: str, **kwargs: Any) -> str:
         return template.get_text_from_path(path, **kwargs)
 
     return template.get_text_from_template(settings.template_dir(), path, **kwargs)
+
+
+def warm_up_templates(paths: Optional[List[str]] = None) -> Thread:
+    """Compile templates in the background, the first printout is fast too
+
+    By default the templates of the template directory and the default
+    split printout are compiled.
+    """
+    thread = Thread(
+        target=_compile_templates, args=(paths,), name="TemplateWarmUp", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def _compile_templates(paths: Optional[List[str]]) -> None:
+    if paths is None:
+        try:
+            paths = get_templates()
+        except OSError as e:
+            logging.debug(str(e))
+            paths = []
+        paths.append(settings.template_dir("split", "1_split_printout.html"))
+    for path in paths:
+        try:
+            if os.path.isfile(path):
+                template.get_template_from_path(path)
+            else:
+                template.get_template(settings.template_dir(), path)
+        except Exception as e:
+            logging.debug("Template %s is not compiled: %s", path, e)
@@ -12,7 +12,7 @@ except ModuleNotFoundError:
 from sportorg import config
 from sportorg.gui.dialogs.person_edit import PersonEditDialog
 from sportorg.gui.global_access import GlobalAccess
-from sportorg.gui.utils.custom_controls import AdvComboBox, AdvSpinBox
+from sportorg.gui.utils.custom_controls import AdvComboBox
 from sportorg.language import translate
 
 
@@ -59,23 +59,17 @@ class DialogFilter(QDialog):
 
         self.recover_filter()
 
-        self.max_rows_count_label = QtWidgets.QLabel(self)
-
-        self.max_rows_count_spin_box = AdvSpinBox(5000, 100000)
-        self.layout.addWidget(self.max_rows_count_label, len(headers), 0)
-        self.layout.addWidget(self.max_rows_count_spin_box, len(headers), 1)
-
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.button_ok = button_box.button(QDialogButtonBox.Ok)
         self.button_ok.clicked.connect(self.accept)
         self.button_cancel = button_box.button(QDialogButtonBox.Cancel)
         self.button_cancel.clicked.connect(self.reject)
 
-        self.layout.addWidget(button_box, len(headers) + 1, 0)
+        self.layout.addWidget(button_box, len(headers), 0)
 
         self.button_clear = QPushButton(text=translate("Clear"))
         self.button_clear.clicked.connect(self.clear_filter)
-        self.layout.addWidget(self.button_clear, len(headers) + 1, 1)
+        self.layout.addWidget(self.button_clear, len(headers), 1)
 
         self.translate_ui()
 
@@ -89,7 +83,6 @@ class DialogFilter(QDialog):
             if self.table:
                 proxy_model = self.table.model()
                 proxy_model.clear_filter()
-                proxy_model.max_rows_count = self.max_rows_count_spin_box.value()
 
                 headers = proxy_model.get_headers()
                 for i in range(len(headers)):
@@ -138,6 +131,5 @@ class DialogFilter(QDialog):
 
     def translate_ui(self):
         self.setWindowTitle(translate("Filter Dialog"))
-        self.max_rows_count_label.setText(translate("Max rows count"))
         self.button_ok.setText(translate("OK"))
         self.button_cancel.setText(translate("Cancel"))
@@ -43,7 +43,7 @@ from sportorg.language import translate
 from sportorg.models.constant import StatusComments
 from sportorg.models.memory import Limit, Result, ResultStatus, Split, race
 from sportorg.models.result.result_checker import ResultChecker, ResultCheckerException
-from sportorg.models.result.result_tools import recalculate_results
+from sportorg.models.result.result_tools import get_tracker, recalculate_results
 from sportorg.models.result.split_calculation import GroupSplits
 from sportorg.modules.live.live import live_client
 from sportorg.modules.teamwork.teamwork import Teamwork
@@ -290,7 +290,9 @@ class ResultEditDialog(QDialog):
                     race().person_card_number(result.person, result.card_number)
             result.bib = new_bib
 
-            GlobalAccess().get_main_window().get_result_table().model().init_cache()
+            GlobalAccess().get_main_window().get_result_table().model().update_objects(
+                [result]
+            )
 
         if self.item_days.value() != result.days:
             result.days = self.item_days.value()
@@ -309,8 +311,9 @@ class ResultEditDialog(QDialog):
                     GroupSplits(race(), result.person.group).generate(True)
             except ResultCheckerException as e:
                 logging.error(str(e))
-        group = result.person.group if result.person else None
-        recalculate_results(recheck_results=False, group=group)
+        race().reindex_result_readout(result)
+        get_tracker().mark_result(result)
+        recalculate_results(recheck_results=False, incremental=True)
         live_client.send(result)
         Teamwork().send(result.to_dict())
 
@@ -37,11 +37,11 @@ class StartPreparationDialog(QDialog):
         self.setWindowIcon(QtGui.QIcon(config.ICON))
         self.setSizeGripEnabled(False)
         self.setModal(True)
-        self.resize(724, 400)
+        self.resize(724, 430)
         self.setFixedSize(self.size())
 
         self.button_box = QtWidgets.QDialogButtonBox(self)
-        self.button_box.setGeometry(QtCore.QRect(40, 360, 341, 32))
+        self.button_box.setGeometry(QtCore.QRect(40, 390, 341, 32))
         self.button_box.setOrientation(QtCore.Qt.Horizontal)
         self.button_box.setStandardButtons(
             QtWidgets.QDialogButtonBox.Cancel | QtWidgets.QDialogButtonBox.Ok
@@ -50,7 +50,7 @@ class StartPreparationDialog(QDialog):
         self.reserve_group_box = QtWidgets.QGroupBox(self)
         self.reserve_group_box.setGeometry(QtCore.QRect(8, 0, 350, 150))
         self.widget_reserve = QtWidgets.QWidget(self.reserve_group_box)
-        self.widget_reserve.setGeometry(QtCore.QRect(19, 20, 300, 97))
+        self.widget_reserve.setGeometry(QtCore.QRect(19, 20, 300, 122))
         self.reserve_layout = QtWidgets.QFormLayout(self.widget_reserve)
         self.reserve_layout.setContentsMargins(0, 0, 0, 0)
         self.reserve_prefix_label = QtWidgets.QLabel(self.widget_reserve)
@@ -83,6 +83,11 @@ class StartPreparationDialog(QDialog):
         self.reserve_layout.setWidget(
             3, QtWidgets.QFormLayout.FieldRole, self.reserve_group_percent_spin_box
         )
+        self.reserve_slots_check_box = QtWidgets.QCheckBox(self.widget_reserve)
+        self.reserve_slots_check_box.setEnabled(False)
+        self.reserve_layout.setWidget(
+            4, QtWidgets.QFormLayout.SpanningRole, self.reserve_slots_check_box
+        )
         self.reserve_check_box = QtWidgets.QCheckBox(self)
         self.reserve_layout.setWidget(
             0, QtWidgets.QFormLayout.SpanningRole, self.reserve_check_box
@@ -125,9 +130,9 @@ class StartPreparationDialog(QDialog):
         self.draw_check_box.stateChanged.connect(self.draw_activate)
 
         self.start_group_box = QtWidgets.QGroupBox(self)
-        self.start_group_box.setGeometry(QtCore.QRect(8, 150, 350, 150))
+        self.start_group_box.setGeometry(QtCore.QRect(8, 150, 350, 180))
         self.widget_start = QtWidgets.QWidget(self.start_group_box)
-        self.widget_start.setGeometry(QtCore.QRect(18, 20, 300, 124))
+        self.widget_start.setGeometry(QtCore.QRect(18, 20, 300, 152))
         self.start_layout = QtWidgets.QFormLayout(self.widget_start)
         self.start_layout.setContentsMargins(0, 0, 0, 0)
         self.start_check_box = QtWidgets.QCheckBox(self.widget_start)
@@ -176,6 +181,17 @@ class StartPreparationDialog(QDialog):
         self.start_layout.setWidget(
             4, QtWidgets.QFormLayout.FieldRole, self.start_one_minute_qty
         )
+        self.start_course_gap_label = QtWidgets.QLabel(self.widget_start)
+        self.start_layout.setWidget(
+            5, QtWidgets.QFormLayout.LabelRole, self.start_course_gap_label
+        )
+        self.start_course_gap_time_edit = AdvTimeEdit(
+            display_format=self.time_format, parent=self.widget_start
+        )
+        self.start_course_gap_time_edit.setEnabled(False)
+        self.start_layout.setWidget(
+            5, QtWidgets.QFormLayout.FieldRole, self.start_course_gap_time_edit
+        )
         self.start_check_box.stateChanged.connect(self.start_activate)
 
         self.numbers_group_box = QtWidgets.QGroupBox(self)
@@ -223,7 +239,7 @@ class StartPreparationDialog(QDialog):
         self.numbers_interval_radio_button.raise_()
 
         self.progress_bar = QtWidgets.QProgressBar(self)
-        self.progress_bar.setGeometry(QtCore.QRect(10, 320, 700, 23))
+        self.progress_bar.setGeometry(QtCore.QRect(10, 350, 700, 23))
         self.progress_bar.setProperty("value", 0)
 
         self.button_box.raise_()
@@ -247,6 +263,7 @@ class StartPreparationDialog(QDialog):
         self.reserve_group_count_label.setText(translate("Reserves per group, ps"))
         self.reserve_group_percent_label.setText(translate("Reserves per group, %"))
         self.reserve_check_box.setText(translate("Insert reserves"))
+        self.reserve_slots_check_box.setText(translate("Empty start slots instead"))
         self.draw_group_box.setTitle(translate("Draw"))
         self.draw_check_box.setText(translate("Draw"))
         self.draw_groups_check_box.setText(translate("Split by start groups"))
@@ -263,6 +280,7 @@ class StartPreparationDialog(QDialog):
         self.start_one_minute_qty_label.setText(
             translate("Several athletes on one minute")
         )
+        self.start_course_gap_label.setText(translate("Same course gap"))
         self.numbers_group_box.setTitle(translate("Start numbers"))
         self.numbers_check_box.setText(translate("Change start numbers"))
         self.numbers_interval_radio_button.setText(translate("First number"))
@@ -277,6 +295,7 @@ class StartPreparationDialog(QDialog):
         self.reserve_group_count_spin_box.setEnabled(status)
         self.reserve_group_percent_spin_box.setEnabled(status)
         self.reserve_prefix.setEnabled(status)
+        self.reserve_slots_check_box.setEnabled(status)
 
     def number_activate(self):
         status = self.numbers_check_box.isChecked()
@@ -295,6 +314,8 @@ class StartPreparationDialog(QDialog):
         self.start_interval_time_edit.setEnabled(status)
         self.start_one_minute_qty_label.setEnabled(status)
         self.start_one_minute_qty.setEnabled(status)
+        self.start_course_gap_label.setEnabled(status)
+        self.start_course_gap_time_edit.setEnabled(status)
 
     def draw_activate(self):
         status = self.draw_check_box.isChecked()
@@ -307,14 +328,21 @@ class StartPreparationDialog(QDialog):
         try:
             progressbar_delay = 0.01
             obj = race()
+            vacant_slots = {}
             if self.reserve_check_box.isChecked():
                 reserve_prefix = self.reserve_prefix.text()
                 reserve_count = self.reserve_group_count_spin_box.value()
                 reserve_percent = self.reserve_group_percent_spin_box.value()
 
-                ReserveManager(obj).process(
-                    reserve_prefix, reserve_count, reserve_percent
-                )
+                if self.reserve_slots_check_box.isChecked():
+                    # the start time step leaves the slots empty
+                    vacant_slots = ReserveManager(obj).get_reserve_slots(
+                        reserve_count, reserve_percent
+                    )
+                else:
+                    ReserveManager(obj).process(
+                        reserve_prefix, reserve_count, reserve_percent
+                    )
 
             self.progress_bar.setValue(25)
             sleep(progressbar_delay)
@@ -337,6 +365,7 @@ class StartPreparationDialog(QDialog):
                 fixed_start_interval = self.start_interval_time_edit.getOTime()
 
                 one_minute_qty = self.start_one_minute_qty.value()
+                course_gap = self.start_course_gap_time_edit.getOTime()
                 if self.start_interval_radio_button.isChecked():
                     StartTimeManager(obj).process(
                         corridor_first_start,
@@ -344,11 +373,18 @@ class StartPreparationDialog(QDialog):
                         fixed_start_interval,
                         one_minute_qty,
                         mix_groups=mix_groups,
+                        course_gap=course_gap,
+                        vacant_slots=vacant_slots,
                     )
 
                 if self.start_group_settings_radio_button.isChecked():
                     StartTimeManager(obj).process(
-                        corridor_first_start, True, fixed_start_interval, one_minute_qty
+                        corridor_first_start,
+                        True,
+                        fixed_start_interval,
+                        one_minute_qty,
+                        course_gap=course_gap,
+                        vacant_slots=vacant_slots,
                     )
 
             self.progress_bar.setValue(75)
@@ -382,6 +418,7 @@ class StartPreparationDialog(QDialog):
         obj.set_setting("reserve_prefix", self.reserve_prefix.text())
         obj.set_setting("reserve_count", self.reserve_group_count_spin_box.value())
         obj.set_setting("reserve_percent", self.reserve_group_percent_spin_box.value())
+        obj.set_setting("reserve_slots", self.reserve_slots_check_box.isChecked())
 
         obj.set_setting("is_start_preparation_draw", self.draw_check_box.isChecked())
         obj.set_setting("is_split_start_groups", self.draw_groups_check_box.isChecked())
@@ -402,6 +439,10 @@ class StartPreparationDialog(QDialog):
             self.start_first_time_edit.getOTime().to_msec(),
         )
         obj.set_setting("start_one_minute_qty", self.start_one_minute_qty.value())
+        obj.set_setting(
+            "start_course_gap",
+            self.start_course_gap_time_edit.getOTime().to_msec(),
+        )
 
         obj.set_setting(
             "is_start_preparation_numbers", self.numbers_check_box.isChecked()
@@ -431,6 +472,7 @@ class StartPreparationDialog(QDialog):
         self.reserve_group_percent_spin_box.setValue(
             obj.get_setting("reserve_percent", 0)
         )
+        self.reserve_slots_check_box.setChecked(obj.get_setting("reserve_slots", False))
 
         self.draw_check_box.setChecked(
             obj.get_setting("is_start_preparation_draw", False)
@@ -459,6 +501,8 @@ class StartPreparationDialog(QDialog):
         t = OTime(msec=obj.get_setting("start_first_time", 60000))
         self.start_first_time_edit.setTime(QTime(t.hour, t.minute, t.sec))
         self.start_one_minute_qty.setValue(obj.get_setting("start_one_minute_qty", 1))
+        t = OTime(msec=obj.get_setting("start_course_gap", 0))
+        self.start_course_gap_time_edit.setTime(QTime(t.hour, t.minute, t.sec))
 
         self.numbers_check_box.setChecked(
             obj.get_setting("is_start_preparation_numbers", False)
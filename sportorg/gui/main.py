@@ -11,6 +11,7 @@ except ModuleNotFoundError:
 
 from sportorg import config, settings
 from sportorg.common.singleton import Singleton
+from sportorg.common.template import warm_up_templates
 from sportorg.gui.global_access import GlobalAccess
 from sportorg.gui.main_window import MainWindow
 from sportorg.language import generate_mo
@@ -48,6 +49,7 @@ class Application(metaclass=Singleton):
         self.set_regions()
         self.set_ranking()
         self.set_rent_cards()
+        warm_up_templates()
         self.main_window.show_window()
         sys.exit(self.app.exec_())
 
@@ -4,6 +4,7 @@ import time
 from os import remove
 from os.path import exists
 from queue import Queue
+from typing import Optional
 
 import psutil
 from psutil import Process
@@ -42,15 +43,21 @@ from sportorg.models.memory import (
     NotEmptyException,
     Race,
     RaceType,
+    Result,
     get_current_race_index,
+    get_multi_day_index,
     new_event,
     race,
     races,
     set_current_race_index,
 )
-from sportorg.models.result.result_tools import recalculate_results
+from sportorg.models.result.result_tools import (
+    ResultChanges,
+    get_tracker,
+    recalculate_results,
+)
 from sportorg.models.result.split_calculation import GroupSplits
-from sportorg.modules.backup.file import File
+from sportorg.modules.backup.file import File, is_saving, wait_for_save
 from sportorg.modules.live.live import live_client
 from sportorg.modules.printing.model import (
     NoPrinterSelectedException,
@@ -58,9 +65,11 @@ from sportorg.modules.printing.model import (
     split_printout,
     split_printout_close,
 )
+from sportorg.modules.printing.printing import get_print_statuses
 from sportorg.modules.rfid_impinj.rfid_impinj import ImpinjClient
 from sportorg.modules.sfr.sfrreader import SFRReaderClient
 from sportorg.modules.sound import Sound
+from sportorg.modules.sportident.backup import close_journal
 from sportorg.modules.sportident.result_generation import ResultSportidentGeneration
 from sportorg.modules.sportident.sireader import SIReaderClient
 from sportorg.modules.sportiduino.sportiduino import SportiduinoClient
@@ -114,8 +123,6 @@ class MainWindow(QMainWindow):
 
         self.last_update = time.time()
         self.relay_number_assign = False
-        self.split_printer_thread = None
-        self.split_printer_queue = None
 
     def _set_style(self):
         try:
@@ -194,8 +201,9 @@ class MainWindow(QMainWindow):
                     if (
                         time.time() - self.last_update
                         > settings.SETTINGS.file_autosave_interval
+                        and not is_saving()
                     ):
-                        self.save_file()
+                        self.save_file(background=True)
                         logging.info(translate("Auto save"))
                 else:
                     pass
@@ -203,6 +211,10 @@ class MainWindow(QMainWindow):
         except Exception as e:
             logging.error(str(e))
 
+        for status in get_print_statuses():
+            if status.state == "failed":
+                logging.error("Split printout failed: {}".format(status.error))
+
         while not self.log_queue.empty():
             rec = self.log_queue.get()
             text = rec["text"]
@@ -224,16 +236,12 @@ class MainWindow(QMainWindow):
 
     def close(self):
         self.conf_write()
+        wait_for_save()
+        close_journal()
         self.unlock_file(self.file)
 
     def close_split_printer(self):
-        if self.split_printer_thread:
-            split_printout_close()
-            self.set_split_printer_thread(None)
-
-        if self.split_printer_queue:
-            self.split_printer_queue.close()
-            self.set_split_printer_queue(None)
+        split_printout_close()
 
     def closeEvent(self, _event):
         quit_msg = translate("Save file before exit?")
@@ -459,12 +467,15 @@ class MainWindow(QMainWindow):
 
             obj = race()
             if obj.data.race_type == RaceType.MULTI_DAY_RACE:
+                # other days keep results from the file, they are
+                # recalculated when selected
                 day_index = get_current_race_index()
                 for i in range(len(races())):
                     set_current_race_index(i)
                     race().rebuild_indexes()
-                    recalculate_results(race_object=race())
                 set_current_race_index(day_index)
+                get_multi_day_index().clear()
+                recalculate_results(race_object=obj)
             else:
                 obj.rebuild_indexes(True, True)
 
@@ -488,25 +499,11 @@ class MainWindow(QMainWindow):
     def refresh(self):
         try:
             t = time.time()
-            table = self.get_person_table()
-            table.model().init_cache()
-            table.model().layoutChanged.emit()
-
-            table = self.get_result_table()
-            table.model().init_cache()
-            table.model().layoutChanged.emit()
-
-            table = self.get_group_table()
-            table.model().init_cache()
-            table.model().layoutChanged.emit()
-
-            table = self.get_course_table()
-            table.model().init_cache()
-            table.model().layoutChanged.emit()
-
-            table = self.get_organization_table()
-            table.model().init_cache()
-            table.model().layoutChanged.emit()
+            self.get_person_table().model().refresh()
+            self.get_result_table().model().refresh()
+            self.get_group_table().model().refresh()
+            self.get_course_table().model().refresh()
+            self.get_organization_table().model().refresh()
             self.set_title()
 
             logging.debug("Refresh in %s seconds", "{:.3f}".format(time.time() - t))
@@ -514,6 +511,41 @@ class MainWindow(QMainWindow):
         except Exception as e:
             logging.error(str(e))
 
+    def refresh_readout(
+        self,
+        result: Result,
+        result_count: int,
+        person_count: int,
+        changes: Optional[ResultChanges],
+    ):
+        """Update table rows changed by a readout
+
+        A new result is inserted on top of the result table, only results of
+        the recalculated groups are updated. Other changes (merged punches,
+        created persons, full recalculation) refresh all tables.
+        """
+        try:
+            obj = race()
+            result_model = self.get_result_table().model()
+            if (
+                changes is None
+                or len(obj.persons) != person_count
+                or len(obj.results) != result_count + 1
+                or len(result_model.cache) != result_count
+                or obj.results[0] is not result
+            ):
+                self.refresh()
+                return
+            result_model.insert_rows(0)
+            result_model.update_objects(changes.get_changed_results(obj))
+            if result.person:
+                self.get_person_table().model().update_objects([result.person])
+            self.get_group_table().model().update_objects(changes.get_groups(obj))
+            self.set_title()
+            self.get_result_table().update_splits()
+        except Exception as e:
+            logging.error(str(e))
+
     def clear_filters(self, remove_condition=True):
         if self.get_person_table():
             self.get_person_table().model().clear_filter(remove_condition)
@@ -591,11 +623,16 @@ class MainWindow(QMainWindow):
             assignment_mode = race().get_setting("system_assignment_mode", False)
             if not assignment_mode:
                 self.clear_filters(remove_condition=False)
+                result_count = len(race().results)
+                person_count = len(race().persons)
                 rg = ResultSportidentGeneration(result)
+                changes = None
                 if rg.add_result():
                     result = rg.get_result()
-                    group = result.person.group if result.person else None
-                    recalculate_results(recheck_results=False, group=group)
+                    get_tracker().mark_result(result)
+                    changes = recalculate_results(
+                        recheck_results=False, incremental=True
+                    )
                     if race().get_setting("split_printout", False):
                         try:
                             split_printout([result])
@@ -619,6 +656,7 @@ class MainWindow(QMainWindow):
                             result.person.card_number
                         ):
                             Sound().rented_card()
+                self.refresh_readout(result, result_count, person_count, changes)
             else:
                 mv = GlobalAccess().get_main_window()
                 selection = mv.get_selected_rows(mv.get_table_by_name("PersonTable"))
@@ -651,7 +689,7 @@ class MainWindow(QMainWindow):
                             Teamwork().send(person.to_dict())
                             live_client.send(person)
                             break
-            self.refresh()
+                self.refresh()
         except Exception as e:
             logging.exception(e)
 
@@ -714,11 +752,14 @@ class MainWindow(QMainWindow):
     def save_file_as(self):
         self.create_file(update_data=False, is_new=False)
 
-    def save_file(self):
+    def save_file(self, background=False):
         if self.file:
             try:
                 self.clear_filters(remove_condition=False)
-                File(self.file).save()
+                if background:
+                    File(self.file).save_in_background()
+                else:
+                    File(self.file).save()
                 self.apply_filters()
                 self.last_update = time.time()
             except Exception as e:
@@ -886,18 +927,6 @@ class MainWindow(QMainWindow):
         if len(res):
             Teamwork().delete([r.to_dict() for r in res])
 
-    def get_split_printer_thread(self):
-        return self.split_printer_thread
-
-    def set_split_printer_thread(self, split_printer):
-        self.split_printer_thread = split_printer
-
-    def get_split_printer_queue(self):
-        return self.split_printer_queue
-
-    def set_split_printer_queue(self, split_printer_app):
-        self.split_printer_queue = split_printer_app
-
     def lock_file(self, file_name: str):
         logging.info("lock start")
         if self.file == file_name:
@@ -399,7 +399,7 @@ class RecoverySportorgSiLogAction(Action, metaclass=ActionFactory):
     def execute(self):
         file_name = get_open_file_name(
             translate("Open SportOrg SI log file"),
-            translate("SportOrg SI log (*.log)"),
+            translate("SportOrg SI log (*.jsonl *.log)"),
             False,
         )
         recovery_sportorg_si_log.recovery(file_name, race())
@@ -753,7 +753,6 @@ class AddSPORTidentResultAction(Action, metaclass=ActionFactory):
         race().add_new_result(result)
         Teamwork().send(result.to_dict())
         logging.info("SPORTident result")
-        self.app.get_result_table().model().init_cache()
         self.app.refresh()
 
 
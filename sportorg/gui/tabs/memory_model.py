@@ -3,14 +3,14 @@ import re
 import uuid
 from abc import abstractmethod
 from copy import copy, deepcopy
-from typing import List
+from typing import Dict, Iterable, List, Optional
 
 from sportorg.gui.global_access import GlobalAccess
 
 try:
-    from PySide6.QtCore import QAbstractTableModel, Qt
+    from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
 except ModuleNotFoundError:
-    from PySide2.QtCore import QAbstractTableModel, Qt
+    from PySide2.QtCore import QAbstractTableModel, QModelIndex, Qt
 
 from sportorg import settings
 from sportorg.language import translate
@@ -30,16 +30,18 @@ from sportorg.utils.time import time_to_hhmmss
 class AbstractSportOrgMemoryModel(QAbstractTableModel):
     """
     Used to specify common table behavior
+
+    Rows are cached lazily: the cache holds None until the view asks for the row
     """
 
     def __init__(self):
         super().__init__()
         self.race: Race = race()
-        self.cache = []
+        self.cache: List[Optional[List]] = []
+        self._rows: Optional[Dict[int, int]] = None
         self.init_cache()
         self.filter = {}
         self.r_count = 0
-        self.max_rows_count = 5000
         self.c_count = len(self.get_headers())
 
         # temporary list, used to keep records, that are not filtered
@@ -51,9 +53,9 @@ class AbstractSportOrgMemoryModel(QAbstractTableModel):
         self.search_old = ""
         self.search_offset = 0
 
-    @abstractmethod
     def init_cache(self):
-        pass
+        self.cache = [None] * len(self.get_source_array())
+        self._rows = None
 
     @abstractmethod
     def get_values_from_object(self, obj):
@@ -83,7 +85,7 @@ class AbstractSportOrgMemoryModel(QAbstractTableModel):
         return self.c_count
 
     def rowCount(self, parent=None, *args, **kwargs):
-        return min(len(self.cache), self.max_rows_count)
+        return len(self.cache)
 
     def headerData(self, index, orientation, role=None):
         if role == Qt.DisplayRole:
@@ -102,14 +104,74 @@ class AbstractSportOrgMemoryModel(QAbstractTableModel):
     def data(self, index, role=None):
         if role == Qt.DisplayRole:
             try:
-                row = index.row()
-                column = index.column()
-                answer = self.cache[row][column]
-                return answer
+                return self.get_row(index.row())[index.column()]
             except Exception as e:
                 logging.error(str(e))
         return
 
+    def get_row(self, row: int) -> List:
+        values = self.cache[row]
+        if values is None:
+            values = self.cache[row] = self.get_data(row)
+        return values
+
+    def get_row_by_object(self, obj) -> Optional[int]:
+        source_array = self.get_source_array()
+        if self._rows is not None:
+            row = self._rows.get(id(obj))
+            if row is not None and row < len(source_array) and source_array[row] is obj:
+                return row
+        self._rows = {id(item): i for i, item in enumerate(source_array)}
+        return self._rows.get(id(obj))
+
+    def refresh(self):
+        """Drop cached rows after any change of the source array
+
+        Only the row count difference is reported, the view requests visible
+        rows again after dataChanged
+        """
+        count = len(self.get_source_array())
+        old_count = len(self.cache)
+        if count > old_count:
+            self.beginInsertRows(QModelIndex(), old_count, count - 1)
+            self.init_cache()
+            self.endInsertRows()
+        elif count < old_count:
+            self.beginRemoveRows(QModelIndex(), count, old_count - 1)
+            self.init_cache()
+            self.endRemoveRows()
+        else:
+            self.init_cache()
+        self.headerDataChanged.emit(Qt.Horizontal, 0, self.c_count - 1)
+        if count:
+            self.headerDataChanged.emit(Qt.Vertical, 0, count - 1)
+            self.dataChanged.emit(
+                self.index(0, 0), self.index(count - 1, self.c_count - 1)
+            )
+
+    def update_objects(self, objects: Iterable):
+        """Update rows of the changed objects only"""
+        for obj in objects:
+            row = self.get_row_by_object(obj)
+            if row is None:
+                continue
+            self.cache[row] = None
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.c_count - 1))
+
+    def insert_rows(self, position: int, count: int = 1):
+        """Call after objects are inserted to the source array"""
+        self.beginInsertRows(QModelIndex(), position, position + count - 1)
+        self.cache[position:position] = [None] * count
+        self._rows = None
+        self.endInsertRows()
+
+    def remove_rows(self, position: int, count: int = 1):
+        """Call after objects are removed from the source array"""
+        self.beginRemoveRows(QModelIndex(), position, position + count - 1)
+        del self.cache[position : position + count]
+        self._rows = None
+        self.endRemoveRows()
+
     def clear_filter(self, remove_condition=True):
         if remove_condition:
             self.filter.clear()
@@ -143,8 +205,10 @@ class AbstractSportOrgMemoryModel(QAbstractTableModel):
 
         # set main list to result
         # note, unfiltered items are in filter_backup
+        self.beginResetModel()
         self.set_source_array(current_array)
         self.init_cache()
+        self.endResetModel()
 
     @staticmethod
     def compile_regex(action: str, raw_value: str) -> re.Pattern:
@@ -279,7 +343,12 @@ class AbstractSportOrgMemoryModel(QAbstractTableModel):
                 person.get_relay_leg_number(),
             )
 
+        def result_sort_key(result: Result):
+            # the order of places, not of the result text
+            return result.get_sort_key(mode)
+
         current_tab = GlobalAccess().get_main_window().current_tab
+        mode = race().get_setting("result_processing_mode", "time")
         sort_key = default_sort_key
         if self.get_headers()[p_int] == translate("Birthday title"):
             sort_key = birthday_sort_key
@@ -287,6 +356,8 @@ class AbstractSportOrgMemoryModel(QAbstractTableModel):
             sort_key = bib_persons_sort_key
         elif self.get_headers()[p_int] == translate("Bib") and current_tab == 1:
             sort_key = bib_results_sort_key
+        elif self.get_headers()[p_int] == translate("Result") and current_tab == 1:
+            sort_key = result_sort_key
 
         try:
             is_descending = order == Qt.DescendingOrder
@@ -304,21 +375,19 @@ class AbstractSportOrgMemoryModel(QAbstractTableModel):
         except Exception as e:
             logging.error(str(e))
 
-    def update_one_object(self, part, index):
-        self.values[index] = self.get_values_from_object(part)
-
     def get_item(self, obj, n_col):
         return self.get_values_from_object(obj)[n_col]
 
     def get_column_unique_values(self, n_col):
         # returns sorted unique values from specified column
-        return sorted(set([str(row[n_col]) for row in self.cache]))
+        return sorted(
+            set(str(self.get_row(row)[n_col]) for row in range(len(self.cache)))
+        )
 
 
 class PersonMemoryModel(AbstractSportOrgMemoryModel):
     def __init__(self):
         super().__init__()
-        self.init_cache()
 
     def get_headers(self) -> List[str]:
         use_birthday = settings.SETTINGS.race_use_birthday
@@ -345,11 +414,6 @@ class PersonMemoryModel(AbstractSportOrgMemoryModel):
             translate("Result count title"),
         ]
 
-    def init_cache(self):
-        self.cache.clear()
-        for row in range(len(self.race.persons)):
-            self.cache.append(self.get_data(row))
-
     def get_data(self, position: int):
         return self.get_values_from_object(self.race.persons[position])
 
@@ -360,6 +424,7 @@ class PersonMemoryModel(AbstractSportOrgMemoryModel):
         new_person.set_bib_without_indexing(0)
         new_person.set_card_number_without_indexing(0)
         self.race.persons.insert(position, new_person)
+        self.insert_rows(position)
 
     def get_values_from_object(self, person: Person):
         ret = []
@@ -446,11 +511,6 @@ class ResultMemoryModel(AbstractSportOrgMemoryModel):
     def _vertical_header_data(self, index):
         return str(len(self.cache) - index)
 
-    def init_cache(self):
-        self.cache.clear()
-        for row in range(len(self.race.results)):
-            self.cache.append(self.get_data(row))
-
     def get_data(self, position):
         ret = self.get_values_from_object(self.race.results[position])
         return ret
@@ -461,6 +521,7 @@ class ResultMemoryModel(AbstractSportOrgMemoryModel):
         new_result.id = uuid.uuid4()
         new_result.splits = deepcopy(result.splits)
         self.race.results.insert(position, new_result)
+        self.insert_rows(position)
 
     def get_values_from_object(self, result: Result):
         person = result.person if result.person is not None else Person()
@@ -538,11 +599,6 @@ class GroupMemoryModel(AbstractSportOrgMemoryModel):
             translate("Count of not finished"),
         ]
 
-    def init_cache(self):
-        self.cache.clear()
-        for row in range(len(self.race.groups)):
-            self.cache.append(self.get_data(row))
-
     def get_data(self, position):
         ret = self.get_values_from_object(self.race.groups[position])
         return ret
@@ -553,6 +609,7 @@ class GroupMemoryModel(AbstractSportOrgMemoryModel):
         new_group.id = uuid.uuid4()
         new_group.name = new_group.name + "_"
         self.race.groups.insert(position, new_group)
+        self.insert_rows(position)
 
     def get_values_from_object(self, group: Group):
         course = group.course
@@ -603,11 +660,6 @@ class CourseMemoryModel(AbstractSportOrgMemoryModel):
             translate("Count of groups"),
         ]
 
-    def init_cache(self):
-        self.cache.clear()
-        for row in range(len(self.race.courses)):
-            self.cache.append(self.get_data(row))
-
     def get_data(self, position):
         ret = self.get_values_from_object(self.race.courses[position])
         return ret
@@ -626,6 +678,7 @@ class CourseMemoryModel(AbstractSportOrgMemoryModel):
         )
         new_course.controls = deepcopy(course.controls)
         self.race.courses.insert(position, new_course)
+        self.insert_rows(position)
 
     def get_values_from_object(self, course: Course):
         return [
@@ -663,11 +716,6 @@ class OrganizationMemoryModel(AbstractSportOrgMemoryModel):
             translate("Count of not finished"),
         ]
 
-    def init_cache(self):
-        self.cache.clear()
-        for row in range(len(self.race.organizations)):
-            self.cache.append(self.get_data(row))
-
     def get_data(self, position):
         ret = self.get_values_from_object(self.race.organizations[position])
         return ret
@@ -678,6 +726,7 @@ class OrganizationMemoryModel(AbstractSportOrgMemoryModel):
         new_organization.id = uuid.uuid4()
         new_organization.name = new_organization.name + "_"
         self.race.organizations.insert(position, new_organization)
+        self.insert_rows(position)
 
     def get_values_from_object(self, organization: Organization):
         return [
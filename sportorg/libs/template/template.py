@@ -2,9 +2,18 @@ import base64
 import datetime
 import gzip
 import locale
+import os
+from threading import Lock
+from typing import Dict, Optional
 
 import dateutil.parser
-from jinja2 import Environment, FileSystemLoader, Template
+from jinja2 import (
+    BaseLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    TemplateNotFound,
+)
 
 
 def to_hhmmss(value, fmt=None):
@@ -37,13 +46,73 @@ def finalize(thing):
     return thing if thing else ""
 
 
-def get_text_from_path(path, **kwargs):
-    custom_encoding = locale.getdefaultlocale()[1] or "utf-8"
-    with open(path, errors="ignore") as f:
-        html = f.read().encode(custom_encoding, "ignore").decode(errors="ignore")
+class PathLoader(BaseLoader):
+    """Templates by file path, e.g. the split printout chosen by the user
+
+    The file is read in the system locale, unknown characters are dropped.
+    """
+
+    def get_source(self, environment, template):
+        try:
+            mtime = os.path.getmtime(template)
+        except OSError:
+            raise TemplateNotFound(template)
+        custom_encoding = locale.getdefaultlocale()[1] or "utf-8"
+        with open(template, errors="ignore") as f:
+            html = f.read().encode(custom_encoding, "ignore").decode(errors="ignore")
+
+        def uptodate():
+            try:
+                return os.path.getmtime(template) == mtime
+            except OSError:
+                return False
+
+        return html, template, uptodate
+
+
+# compiled templates are kept by the environments and checked by mtime,
+# the bytecode is kept on disk between runs
+_environments: Dict[Optional[str], Environment] = {}
+_environments_lock = Lock()
+_bytecode_cache: Optional[FileSystemBytecodeCache] = None
+
 
-    template = Template(html, finalize=finalize)
-    return template.render(**kwargs)
+def get_environment(searchpath: Optional[str] = None) -> Environment:
+    """Shared environment of the template directory, None for file paths"""
+    global _bytecode_cache
+    with _environments_lock:
+        env = _environments.get(searchpath)
+        if env is not None:
+            return env
+        if _bytecode_cache is None:
+            _bytecode_cache = FileSystemBytecodeCache()
+        if searchpath is None:
+            loader: BaseLoader = PathLoader()
+        else:
+            loader = FileSystemLoader(searchpath)
+        env = Environment(
+            loader=loader, finalize=finalize, bytecode_cache=_bytecode_cache
+        )
+        # the split printout uses the filters too
+        env.filters["tohhmmss"] = to_hhmmss
+        env.filters["date"] = date
+        env.filters["compress"] = compress
+        env.policies["json.dumps_kwargs"]["ensure_ascii"] = False
+        _environments[searchpath] = env
+        return env
+
+
+def get_template_from_path(path: str):
+    return get_environment().get_template(os.path.abspath(path))
+
+
+def get_template(searchpath: str, path: str):
+    # "/reports/1_results.html" from the report dialog is the same template
+    return get_environment(searchpath).get_template(path.replace("\\", "/").lstrip("/"))
+
+
+def get_text_from_path(path, **kwargs):
+    return get_template_from_path(path).render(**kwargs)
 
 
 def compress(data: str) -> str:
@@ -51,11 +120,4 @@ def compress(data: str) -> str:
 
 
 def get_text_from_template(searchpath: str, path: str, **kwargs):
-    env = Environment(loader=FileSystemLoader(searchpath), finalize=finalize)
-    env.filters["tohhmmss"] = to_hhmmss
-    env.filters["date"] = date
-    env.filters["compress"] = compress
-    env.policies["json.dumps_kwargs"]["ensure_ascii"] = False
-    template = env.get_template(path)
-
-    return template.render(**kwargs)
+    return get_template(searchpath, path).render(**kwargs)
@@ -3,10 +3,11 @@ import logging
 import re
 import time
 import uuid
+import weakref
 from abc import ABC, abstractmethod
 from datetime import date
 from enum import Enum, IntEnum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
 
 import dateutil.parser
 
@@ -189,6 +190,64 @@ class CourseControl(Model):
         self.length = int(data["length"])
 
 
+class CourseControlTemplate:
+    """Parsed course control code, used for course checking
+    31 989 -> plain control
+    31(31,32,35-45) -> plain control with optional codes
+    % or %(31,32) -> any control, non-unique
+    * or *(31,32) -> any control, unique among free order controls
+    ? or ?(31,32) -> optional control
+    """
+
+    __slots__ = ("code", "kind", "is_unique", "has_list", "codes", "ranges", "_error")
+
+    def __init__(self, code):
+        self.code = code
+        template = str(code)
+        if template.find("%") > -1:
+            self.kind = "%"
+        elif template.find("*") > -1:
+            self.kind = "*"
+        elif template.find("?") > -1:
+            self.kind = "?"
+        else:
+            self.kind = ""
+        self.is_unique = template.find("*") > -1
+        self.codes: Set[int] = set()
+        self.ranges: List[Tuple[int, int]] = []
+        self._error = ""
+
+        ind_begin = template.find("(")
+        ind_end = template.find(")")
+        self.has_list = ind_begin > 0 and ind_end > 0
+        if self.has_list:
+            arr = re.split(r"\s*,\s*", template[ind_begin + 1 : ind_end])
+            try:
+                for cp in arr:
+                    cp_range = re.split(r"\s*-\s*", cp)
+                    self.codes.add(int(cp_range[0]))
+                    if len(cp_range) > 1:
+                        self.ranges.append((int(cp_range[0]), int(cp_range[-1])))
+            except ValueError as e:
+                self._error = str(e)
+
+    @property
+    def main_code(self) -> str:
+        return str(self.code).split("(")[0].strip()
+
+    def contains(self, code) -> bool:
+        """Check if code is in the list, e.g. '%(31,32,35-45)'"""
+        value = int(code)
+        if self._error:
+            raise ValueError(self._error)
+        if value in self.codes:
+            return True
+        for first, last in self.ranges:
+            if first < value <= last:
+                return True
+        return False
+
+
 class ControlPoint(Model):
     """Description of independent control point. Used for score calculation in rogain"""
 
@@ -217,6 +276,9 @@ class Course(Model):
         self.count_person = 0
         self.count_finished = 0
 
+        self._templates: List[CourseControlTemplate] = []
+        self._templates_key: Optional[Tuple[Any, ...]] = None
+
     def __repr__(self) -> str:
         return "Course {} {}".format(self.name, repr(self.controls))
 
@@ -250,6 +312,16 @@ class Course(Model):
             ret.append(str(i.code))
         return ret
 
+    def get_control_templates(self) -> List[CourseControlTemplate]:
+        """Parsed controls, rebuilt only if the control codes have changed"""
+        key = tuple(control.code for control in self.controls)
+        if key != self._templates_key:
+            self._templates = [
+                CourseControlTemplate(control.code) for control in self.controls
+            ]
+            self._templates_key = key
+        return self._templates
+
     def to_dict(self):
         controls = [control.to_dict() for control in self.controls]
         return {
@@ -408,6 +480,24 @@ class Group(Model):
 
 
 class Split(Model):
+    # there are splits for every punch of every result, keep them small
+    __slots__ = (
+        "index",
+        "course_index",
+        "code",
+        "days",
+        "_time",
+        "leg_time",
+        "relative_time",
+        "leader_time",
+        "leg_place",
+        "relative_place",
+        "is_correct",
+        "has_penalty",
+        "speed",
+        "length_leg",
+    )
+
     def __init__(self):
         self.index = 0
         self.course_index = -1
@@ -416,6 +506,7 @@ class Split(Model):
         self._time: OTime = OTime()
         self.leg_time: OTime = OTime()
         self.relative_time: OTime = OTime()
+        self.leader_time: OTime = OTime()
         self.leg_place = 0
         self.relative_place = 0
         self.is_correct = True
@@ -490,7 +581,7 @@ class Result(ABC):
         self.bib = 0
         self.start_time: Optional[OTime] = None
         self.finish_time: OTime = OTime.now()
-        self.person: Optional[Person] = None
+        self._person: Optional[Person] = None
         self.status = ResultStatus.OK
         self.status_comment = ""
         self.penalty_time: Optional[OTime] = None
@@ -509,7 +600,7 @@ class Result(ABC):
         self.can_win_count = 0  # quantity of athletes who can win at current time
         self.final_result_time: Optional[OTime] = None  # real time, when nobody can win
 
-        self.card_number = 0
+        self._card_number = 0
         self.splits: List[Split] = []
         self.__start_time = None
         self.__finish_time = None
@@ -590,6 +681,40 @@ class Result(ABC):
     def system_type(self) -> SystemType:
         pass
 
+    @property
+    def person(self) -> Optional["Person"]:
+        return self._person
+
+    @person.setter
+    def person(self, new_person: Optional["Person"]) -> None:
+        old_person = self._person
+        self._person = new_person
+        if old_person is not new_person:
+            for obj in list(_indexed_races):
+                obj.reindex_result_person(self, old_person)
+
+    @property
+    def card_number(self) -> int:
+        return self._card_number
+
+    @card_number.setter
+    def card_number(self, new_card: int) -> None:
+        if self._card_number != new_card:
+            self._card_number = new_card
+            for obj in list(_indexed_races):
+                obj.reindex_result_readout(self)
+
+    def get_readout_key(self) -> Tuple[Any, ...]:
+        """Card, finish and punches, the same for every readout of the card
+
+        Start is not in the key, a readout without start is the same result.
+        """
+        return (
+            self._card_number,
+            self.finish_time,
+            tuple((split.code, split.time) for split in self.splits),
+        )
+
     def to_dict(self):
         accuracy = race().get_setting("time_accuracy", 0)
         return {
@@ -766,6 +891,29 @@ class Result(ABC):
         ret = self.get_result_otime()
         return self.status, ret.to_msec()
 
+    def get_sort_key(self, mode: Optional[str] = None) -> Tuple:
+        """
+        Key for sorting results, smaller is better, the same order as __gt__ gives
+
+        Args:
+            mode: result processing mode, read from the race settings if None
+        """
+        if mode is None:
+            mode = race().get_setting("result_processing_mode", "time")
+        # calculated first, multi day result can change status
+        result_msec = self.get_result_otime().to_msec()
+        if self.is_status_ok():
+            status_key = (0, 0)
+        else:
+            status_key = (1, self.status.value)
+
+        if mode == "time":
+            # empty result time is worse than any other
+            return (*status_key, 0, result_msec == 0, result_msec)
+        if mode == "ardf":
+            return (*status_key, -self.scores_ardf, False, result_msec)
+        return (*status_key, -self.rogaine_score, False, result_msec)
+
     def get_result_otime(self):
         race_type = RaceType.INDIVIDUAL_RACE
         if self.person and self.person.group:
@@ -797,7 +945,8 @@ class Result(ABC):
         ret_ms += self.get_penalty_time().to_msec()
         ret_ms -= self.get_credit_time().to_msec()
 
-        if self.person:
+        # as in get_result_relay, bibs of other groups are not legs
+        if self.person and self.person.group and self.person.group.is_relay():
             cur_bib = self.person.bib - 1000
             while cur_bib > 1000:
                 prev_person = race().find_person_by_bib(cur_bib)
@@ -810,21 +959,14 @@ class Result(ABC):
         return OTime(msec=ret_ms).round(time_accuracy, TimeRounding[time_rounding])
 
     def get_result_otime_multi_day(self):
-        person_id = self.person.multi_day_id
-        sum_result = OTime()
-        for day in races():
-            result_tmp = day.find_result_by_person_id(person_id)
-            if result_tmp:
-                if result_tmp.is_status_ok():
-                    sum_result += result_tmp.get_result_otime_current_day()
-                else:
-                    self.status = ResultStatus.MULTI_DAY_ISSUE
-                    self.status_comment = result_tmp.status_comment
-                    return OTime()  # DSQ/DNS
-            else:
-                self.status = ResultStatus.MULTI_DAY_ISSUE
-                return OTime()  # result not found in that day
-        return sum_result
+        total = get_multi_day_index().get_total(self.person.multi_day_id)
+        if total.is_ok:
+            return total.time
+        self.status = ResultStatus.MULTI_DAY_ISSUE
+        if total.status_comment is not None:
+            # DSQ/DNS, otherwise result not found in that day
+            self.status_comment = total.status_comment
+        return OTime()
 
     def get_start_time(self):
         if self.person and self.person.group:
@@ -1088,14 +1230,16 @@ class ResultSportident(Result):
         obj = race()
         if not course:
             return super().check()
-        controls = course.controls
+        controls = course.get_control_templates()
         course_index = 0
         count_controls = len(controls)
         if count_controls == 0:
             return True
 
-        # list of indexes, coincide with course, used for mixed course order
-        recognized_indexes = []
+        # number of recognized splits, coincide with course, used for mixed course order
+        recognized_count = 0
+        # codes of recognized splits on free order controls, should be unique
+        unique_controls_taken = set()
 
         # invalidate all splits before check
         for i in self.splits:
@@ -1109,116 +1253,86 @@ class ResultSportident(Result):
 
         optional_controls_taken = set()
 
-        for i in range(len(self.splits)):
+        for split in self.splits:
             try:
-                split = self.splits[i]
-
                 # ignore splits before start (not cleaned card or unintentional punches before start)
                 if ignore_punches_before_start and split.time < self.get_start_time():
                     continue
 
-                template = str(controls[course_index].code)
+                template = controls[course_index]
                 cur_code = split.code
 
-                list_exists = False
-                list_contains = False
-                ind_begin = template.find("(")
-                ind_end = template.find(")")
-                if ind_begin > 0 and ind_end > 0:
-                    list_exists = True
-                    # any control from the list e.g. '%(31,32,35-45)'
-                    arr = re.split(r"\s*,\s*", template[ind_begin + 1 : ind_end])
-                    for cp in arr:
-                        cp_range = re.split(r"\s*-\s*", cp)
-                        if int(cur_code) == int(cp_range[0]):
-                            list_contains = True
-                        elif len(cp_range) > 1:
-                            if int(cur_code) > int(cp_range[0]) and int(
-                                cur_code
-                            ) <= int(cp_range[len(cp_range) - 1]):
-                                list_contains = True
-
-                if template.find("%") > -1:
+                # any control from the list e.g. '%(31,32,35-45)'
+                list_contains = template.has_list and template.contains(cur_code)
+                is_recognized = False
+
+                if template.kind == "%":
                     # non-unique control
-                    if not list_exists or list_contains:
+                    if not template.has_list or list_contains:
                         # any control '%' or '%(31,32,33)' or '31%'
                         split.is_correct = True
                         split.has_penalty = False
-                        recognized_indexes.append(i)
+                        is_recognized = True
                         split.course_index = course_index
                         course_index += 1
 
-                elif template.find("*") > -1:
+                elif template.kind == "*":
                     # unique control '*' or '*(31,32,33)' or '31*'
-                    if list_exists and not list_contains:
+                    if template.has_list and not list_contains:
                         # not in list
                         continue
-                    # test previous splits
-                    is_unique = True
-                    course_index_current = -1
-                    for j in range(i):
-                        prev_split = self.splits[j]
-
-                        if prev_split.is_correct:
-                            course_index_current += 1
-
-                        if prev_split.code == cur_code and j in recognized_indexes:
-                            if (
-                                course_index_current < 0
-                                or str(controls[course_index_current].code).find("*")
-                                < 0
-                            ):
-                                # check only free order controls to be duplicated
-                                continue
-
-                            is_unique = False
-                            break
-                    if is_unique:
+                    # check only free order controls to be duplicated
+                    if cur_code not in unique_controls_taken:
                         split.is_correct = True
                         split.has_penalty = False
-                        recognized_indexes.append(i)
+                        is_recognized = True
                         split.course_index = course_index
                         course_index += 1
 
-                elif template.find("?") > -1:
+                elif template.kind == "?":
                     # optional control '?' or '?(31,32,33)' or '31?'
                     if cur_code in optional_controls_taken:
                         continue
 
-                    if not list_exists or list_contains:
+                    if not template.has_list or list_contains:
                         # any control '?' or '?(31,32,33)' or '31?'
                         split.is_correct = True
                         split.has_penalty = False
-                        recognized_indexes.append(i)
+                        is_recognized = True
                         optional_controls_taken.add(cur_code)
                         split.course_index = course_index
 
                 else:
                     # simple pre-ordered control '31 989' or '31(31,32,33) 989'
-                    if list_exists:
+                    if template.has_list:
                         # control with optional codes '31(31,32,33) 989'
                         if list_contains:
                             split.is_correct = True
-                            recognized_indexes.append(i)
+                            is_recognized = True
 
-                            correct_code = (
-                                str(controls[course_index].code).split("(")[0].strip()
-                            )
-                            if split.code == correct_code:
+                            if split.code == template.main_code:
                                 split.has_penalty = False
 
                             split.course_index = course_index
                             course_index += 1
                     else:
                         # just cp '31 989'
-                        is_equal = str(cur_code) == controls[course_index].code
+                        is_equal = str(cur_code) == template.code
                         if is_equal:
                             split.is_correct = True
                             split.has_penalty = False
-                            recognized_indexes.append(i)
+                            is_recognized = True
                             split.course_index = course_index
                             course_index += 1
 
+                if is_recognized:
+                    if (
+                        recognized_count < count_controls
+                        and controls[recognized_count].is_unique
+                    ):
+                        unique_controls_taken.add(cur_code)
+                    recognized_count += 1
+
                 if course_index == count_controls:
                     return True
 
@@ -1324,8 +1438,8 @@ class Person(Model):
         self._bib = 0
 
         self.birth_date: Optional[date] = None
-        self.organization: Optional[Organization] = None
-        self.group: Optional[Group] = None
+        self._organization: Optional[Organization] = None
+        self._group: Optional[Group] = None
         self.world_code = ""  # WRE ID for orienteering and the same
         self.national_code = 0
         self.qual: Qualification = Qualification.NOT_QUALIFIED
@@ -1342,6 +1456,30 @@ class Person(Model):
     def __repr__(self) -> str:
         return f"{self.full_name} {self.bib} {self.group}"
 
+    @property
+    def group(self) -> Optional[Group]:
+        return self._group
+
+    @group.setter
+    def group(self, new_group: Optional[Group]) -> None:
+        old_group = self._group
+        self._group = new_group
+        if old_group is not new_group:
+            for obj in list(_indexed_races):
+                obj.reindex_person_group(self, old_group)
+
+    @property
+    def organization(self) -> Optional[Organization]:
+        return self._organization
+
+    @organization.setter
+    def organization(self, new_organization: Optional[Organization]) -> None:
+        old_organization = self._organization
+        self._organization = new_organization
+        if old_organization is not new_organization:
+            for obj in list(_indexed_races):
+                obj.reindex_person_group(self, self._group)
+
     @property
     def year(self):
         return self.get_year()
@@ -1462,7 +1600,10 @@ class Person(Model):
         if self._bib == new_bib:
             return
         self._index_bib(new_bib)
+        old_bib = self._bib
         self._bib = new_bib
+        for obj in list(_indexed_races):
+            obj.reindex_person_bib(self, old_bib)
 
     def get_relay_team_number(self) -> int:
         """Return relay team bib if relay leg, otherwise 0"""
@@ -1648,6 +1789,25 @@ class Race(Model):
         self.organization_index: Dict[str, Organization] = {}
         self.course_index: Dict[str, Course] = {}
         self.course_index_name: Dict[str, Course] = {}
+        self.group_person_index: Dict[Optional[Group], List[Person]] = {}
+        self.organization_person_index: Dict[Optional[Organization], List[Person]] = {}
+        self.group_result_index: Dict[Optional[Group], List[Result]] = {}
+        self.person_result_index: Dict[Person, Result] = {}
+        # id() of indexed objects, copied races have the same uuids
+        self._indexed_person_ids: Set[int] = set()
+        self._indexed_result_ids: Set[int] = set()
+        self._group_index_key: Optional[Tuple[int, int, int, int]] = None
+        self.relay_team_index: Dict[int, RelayTeam] = {}
+        self.group_relay_team_index: Dict[Optional[Group], List[RelayTeam]] = {}
+        self._relay_team_index_key: Optional[Tuple[int, int]] = None
+        # readouts of the card and readouts with the same content,
+        # see Result.get_readout_key
+        self.result_card_index: Dict[int, List[Result]] = {}
+        self.result_readout_index: Dict[Tuple[Any, ...], List[Result]] = {}
+        self._result_readout_keys: Dict[int, Tuple[Any, ...]] = {}
+        self._readout_index_key: Optional[Tuple[int, int]] = None
+        # marks changes for the incremental result calculation, see get_tracker
+        self.result_tracker: Optional[Any] = None
 
     def __repr__(self) -> str:
         return repr(self.data)
@@ -1815,6 +1975,13 @@ class Race(Model):
 
     def update_obj(self, obj, dict_obj):
         obj.update_data(dict_obj)
+        if isinstance(obj, Result):
+            self.reindex_result_readout(obj)
+        if self.result_tracker is not None:
+            if isinstance(obj, Person):
+                self.result_tracker.mark_person(obj)
+            elif isinstance(obj, Result):
+                self.result_tracker.mark_result(obj)
         if dict_obj["object"] == "Person":
             obj.group = self.get_obj("Group", dict_obj["group_id"])
             obj.organization = self.get_obj("Organization", dict_obj["organization_id"])
@@ -1835,8 +2002,24 @@ class Race(Model):
         obj = self.support_obj[dict_obj["object"]]()
         obj.id = uuid.UUID(dict_obj["id"])
         self.update_obj(obj, dict_obj)
+        is_valid = self._is_group_index_valid()
+        is_readout_valid = self._is_readout_index_valid()
         self.list_obj[dict_obj["object"]].append(obj)
         self.index_obj[dict_obj["object"]][dict_obj["id"]] = obj
+        if self.result_tracker is not None:
+            if isinstance(obj, Person):
+                self.result_tracker.mark_new_person(obj)
+            elif isinstance(obj, Result):
+                self.result_tracker.mark_new_result(obj)
+        if is_valid:
+            if isinstance(obj, Person):
+                self._index_group_person(obj)
+            elif isinstance(obj, Result):
+                self._index_result(obj)
+            self._group_index_key = self._get_group_index_key()
+        if is_readout_valid and isinstance(obj, Result):
+            self._index_readout(obj)
+            self._readout_index_key = self._get_readout_index_key()
 
     def get_type(self, group: Group):
         if group.get_type():
@@ -1886,14 +2069,29 @@ class Race(Model):
             person = self.persons[i]
             persons.append(person)
             self.remove_person_from_indexes(person)
+            is_valid = self._is_group_index_valid()
             del self.persons[i]
+            if self.result_tracker is not None:
+                self.result_tracker.mark_deleted_person(person)
+            if is_valid:
+                self._indexed_person_ids.discard(id(person))
+                self._remove_from_bucket(self.group_person_index, person.group, person)
+                self._remove_from_bucket(
+                    self.organization_person_index, person.organization, person
+                )
+                self._group_index_key = self._get_group_index_key()
         return persons
 
     def remove_person_from_indexes(self, person: Person):
-        for result in self.results:
-            if result.person is person:
-                result.person = None
-                result.bib = person.bib
+        self._check_group_indexes()
+        results = [
+            result
+            for result in self.group_result_index.get(person.group, [])
+            if result.person is person
+        ]
+        for result in results:
+            result.person = None
+            result.bib = person.bib
         if (
             person.bib
             and person.bib in self.person_index_bib
@@ -1913,7 +2111,18 @@ class Race(Model):
         for i in indexes:
             result = self.results[i]
             results.append(result)
+            is_valid = self._is_group_index_valid()
+            is_readout_valid = self._is_readout_index_valid()
             del self.results[i]
+            if self.result_tracker is not None:
+                self.result_tracker.mark_deleted_result(result)
+            self.result_index.pop(str(result.id), None)
+            if is_valid:
+                self._unindex_result(result, result.person)
+                self._group_index_key = self._get_group_index_key()
+            if is_readout_valid:
+                self._unindex_readout(result)
+                self._readout_index_key = self._get_readout_index_key()
         return results
 
     def delete_groups(self, indexes: List[int]) -> List[Group]:
@@ -1956,10 +2165,8 @@ class Race(Model):
         return organizations
 
     def find_person_result(self, person: Person) -> Optional[Result]:
-        for i in self.results:
-            if i.person is person:
-                return i
-        return None
+        self._check_group_indexes()
+        return self.person_result_index.get(person)
 
     def find_person_by_bib(self, bib: int) -> Person:
         try:
@@ -1973,6 +2180,19 @@ class Race(Model):
         except KeyError:
             return None
 
+    def find_results_by_card(self, card: int) -> List[Result]:
+        """Results of the card, the last added first"""
+        self._check_readout_indexes()
+        return list(self.result_card_index.get(card, []))
+
+    def find_results_by_readout(self, result: Result) -> List[Result]:
+        """Results with the same card, finish and punches, see Result.get_readout_key"""
+        self._check_readout_indexes()
+        return list(self.result_readout_index.get(result.get_readout_key(), []))
+
+    def get_max_bib(self) -> int:
+        return max(self.person_index_bib, default=0)
+
     def find_course(self, result: Result) -> Optional[Course]:
         # first get course by number
         person = result.person
@@ -2042,8 +2262,14 @@ class Race(Model):
         return new_person
 
     def add_person(self, new_person: Person):
+        is_valid = self._is_group_index_valid()
         self.persons.insert(0, new_person)
         self.index_person(new_person)
+        if self.result_tracker is not None:
+            self.result_tracker.mark_new_person(new_person)
+        if is_valid:
+            self._index_group_person(new_person, first=True)
+            self._group_index_key = self._get_group_index_key()
 
     def index_person(self, person: Person):
         # update index
@@ -2103,7 +2329,218 @@ class Race(Model):
                 i.course.count_group += 1
 
     def get_persons_by_group(self, group):
-        return find(self.persons, group=group, return_all=True)
+        self._check_group_indexes()
+        persons = self.group_person_index.get(group)
+        if persons:
+            return list(persons)
+        return None
+
+    def get_persons_by_organization(
+        self, organization: Optional[Organization]
+    ) -> List[Person]:
+        self._check_group_indexes()
+        return list(self.organization_person_index.get(organization, []))
+
+    def get_group_results(self, group: Optional[Group]) -> List[Result]:
+        """Results of the group persons in the order of the result list"""
+        self._check_group_indexes()
+        return list(self.group_result_index.get(group, []))
+
+    def rebuild_group_indexes(self) -> None:
+        self.group_person_index = {}
+        self.organization_person_index = {}
+        self.group_result_index = {}
+        self.person_result_index = {}
+        self._indexed_person_ids = set()
+        self._indexed_result_ids = set()
+        for person in self.persons:
+            self._index_group_person(person)
+        for result in self.results:
+            self._index_result(result)
+        self._group_index_key = self._get_group_index_key()
+        # setters of persons and results update the races they belong to
+        _indexed_races.add(self)
+
+    def reindex_person_group(self, person: Person, old_group: Optional[Group]):
+        """Called when the group or the organization of the person is changed"""
+        if id(person) not in self._indexed_person_ids:
+            return
+        if self.result_tracker is not None:
+            self.result_tracker.mark_person(person, old_group, person.bib)
+        if self._is_group_index_valid():
+            # position in the new group is unknown, rebuild on demand
+            self._group_index_key = None
+
+    def reindex_person_bib(self, person: Person, old_bib: int):
+        """Called when the bib of the person is changed, it's the relay team"""
+        if id(person) not in self._indexed_person_ids:
+            return
+        if self.result_tracker is not None:
+            self.result_tracker.mark_person(person, person.group, old_bib)
+
+    def reindex_result_person(self, result: Result, old_person: Optional[Person]):
+        """Called when the person of the result is changed"""
+        if id(result) not in self._indexed_result_ids:
+            return
+        if self.result_tracker is not None:
+            self.result_tracker.mark_result(result)
+            if old_person is not None:
+                self.result_tracker.mark_person(old_person)
+        if not self._is_group_index_valid():
+            return
+        new_person = result.person
+        if new_person is None:
+            self._unindex_result(result, old_person)
+            self._indexed_result_ids.add(id(result))
+        elif old_person is not None and old_person.group is new_person.group:
+            # the same group, position in the list is not changed
+            self._index_person_result(old_person)
+            self._index_person_result(new_person)
+        else:
+            self._group_index_key = None
+
+    def _get_group_index_key(self) -> Tuple[int, int, int, int]:
+        # lists can be replaced or changed directly, then the index is rebuilt
+        return id(self.persons), len(self.persons), id(self.results), len(self.results)
+
+    def _is_group_index_valid(self) -> bool:
+        return self._group_index_key == self._get_group_index_key()
+
+    def _check_group_indexes(self) -> None:
+        if not self._is_group_index_valid():
+            self.rebuild_group_indexes()
+
+    def find_relay_team(self, bib_number: int) -> Optional["RelayTeam"]:
+        """The first relay team with the number"""
+        self._check_relay_team_indexes()
+        return self.relay_team_index.get(bib_number)
+
+    def get_relay_teams_by_group(self, group: Optional[Group]) -> List["RelayTeam"]:
+        self._check_relay_team_indexes()
+        return list(self.group_relay_team_index.get(group, []))
+
+    def add_relay_team(self, team: "RelayTeam") -> None:
+        is_valid = self._is_relay_team_index_valid()
+        self.relay_teams.append(team)
+        if is_valid:
+            self._index_relay_team(team)
+            self._relay_team_index_key = self._get_relay_team_index_key()
+
+    def rebuild_relay_team_indexes(self) -> None:
+        self.relay_team_index = {}
+        self.group_relay_team_index = {}
+        for team in self.relay_teams:
+            self._index_relay_team(team)
+        self._relay_team_index_key = self._get_relay_team_index_key()
+
+    def _index_relay_team(self, team: "RelayTeam") -> None:
+        self.relay_team_index.setdefault(team.bib_number, team)
+        self.group_relay_team_index.setdefault(team.group, []).append(team)
+
+    def _get_relay_team_index_key(self) -> Tuple[int, int]:
+        return id(self.relay_teams), len(self.relay_teams)
+
+    def _is_relay_team_index_valid(self) -> bool:
+        return self._relay_team_index_key == self._get_relay_team_index_key()
+
+    def _check_relay_team_indexes(self) -> None:
+        if not self._is_relay_team_index_valid():
+            self.rebuild_relay_team_indexes()
+
+    def rebuild_readout_indexes(self) -> None:
+        self.result_card_index = {}
+        self.result_readout_index = {}
+        self._result_readout_keys = {}
+        for result in self.results:
+            self._index_readout(result)
+        self._readout_index_key = self._get_readout_index_key()
+        _indexed_races.add(self)
+
+    def reindex_result_readout(self, result: Result) -> None:
+        """Called when the card or the punches of the result are changed"""
+        if id(result) not in self._result_readout_keys:
+            return
+        if self._is_readout_index_valid():
+            self._unindex_readout(result)
+            self._index_readout(result)
+
+    def _index_readout(self, result: Result, first: bool = False) -> None:
+        key = result.get_readout_key()
+        self._result_readout_keys[id(result)] = key
+        for index, index_key in (
+            (self.result_card_index, key[0]),
+            (self.result_readout_index, key),
+        ):
+            results = index.setdefault(index_key, [])
+            if first:
+                results.insert(0, result)
+            else:
+                results.append(result)
+
+    def _unindex_readout(self, result: Result) -> None:
+        # the key of the indexed content, the result can be changed since
+        key = self._result_readout_keys.pop(id(result), None)
+        if key is None:
+            return
+        self._remove_from_bucket(self.result_card_index, key[0], result)
+        self._remove_from_bucket(self.result_readout_index, key, result)
+
+    def _get_readout_index_key(self) -> Tuple[int, int]:
+        return id(self.results), len(self.results)
+
+    def _is_readout_index_valid(self) -> bool:
+        return self._readout_index_key == self._get_readout_index_key()
+
+    def _check_readout_indexes(self) -> None:
+        if not self._is_readout_index_valid():
+            self.rebuild_readout_indexes()
+
+    def _index_group_person(self, person: Person, first: bool = False) -> None:
+        self._indexed_person_ids.add(id(person))
+        for index, key in (
+            (self.group_person_index, person.group),
+            (self.organization_person_index, person.organization),
+        ):
+            persons = index.setdefault(key, [])
+            if first:
+                persons.insert(0, person)
+            else:
+                persons.append(person)
+
+    def _index_result(self, result: Result, first: bool = False) -> None:
+        self._indexed_result_ids.add(id(result))
+        person = result.person
+        if not person:
+            return
+        results = self.group_result_index.setdefault(person.group, [])
+        if first:
+            results.insert(0, result)
+            self.person_result_index[person] = result
+        else:
+            results.append(result)
+            self.person_result_index.setdefault(person, result)
+
+    def _unindex_result(self, result: Result, person: Optional[Person]) -> None:
+        self._indexed_result_ids.discard(id(result))
+        if not person:
+            return
+        self._remove_from_bucket(self.group_result_index, person.group, result)
+        self._index_person_result(person)
+
+    def _index_person_result(self, person: Person) -> None:
+        self.person_result_index.pop(person, None)
+        for result in self.group_result_index.get(person.group, []):
+            if result.person is person:
+                self.person_result_index[person] = result
+                return
+
+    @staticmethod
+    def _remove_from_bucket(index: Dict[Any, List[Any]], key: Any, obj: Any) -> None:
+        bucket = index.get(key, [])
+        for i, item in enumerate(bucket):
+            if item is obj:
+                del bucket[i]
+                return
 
     def get_persons_by_corridor(self, corridor):
         ret = []
@@ -2126,8 +2563,18 @@ class Race(Model):
                 )
                 return
 
+        is_valid = self._is_group_index_valid()
+        is_readout_valid = self._is_readout_index_valid()
         self.results.insert(0, result)
         self.index_obj[result.__class__.__name__][str(result.id)] = result
+        if self.result_tracker is not None:
+            self.result_tracker.mark_new_result(result)
+        if is_valid:
+            self._index_result(result, first=True)
+            self._group_index_key = self._get_group_index_key()
+        if is_readout_valid:
+            self._index_readout(result, first=True)
+            self._readout_index_key = self._get_readout_index_key()
 
     def add_result(self, result):
         if not self.index_obj[result.__class__.__name__].get(str(result.id), None):
@@ -2182,16 +2629,8 @@ class Race(Model):
         return ret
 
     def find_result_by_person_id(self, person_id) -> Optional[Result]:
-        if len(self.result_index) < 1:
-            for res in self.results:
-                if res.person:
-                    id = res.person.multi_day_id
-                    self.result_index[id] = res
-
-        if person_id in self.result_index:
-            return self.result_index[person_id]
-        else:
-            return None
+        """Find result by multi_day_id of the person"""
+        return get_multi_day_index().find_result(self, person_id)
 
 
 class Qualification(IntEnum):
@@ -2415,11 +2854,15 @@ class RelayLeg:
         return self.team
 
     def get_next_leg(self):
-        """:return next leg of relay team, None if this leg is last"""
+        """:return next leg of relay team, None if this leg is last
+
+        The leg is found by number as in get_prev_leg, not by the position
+        in the list of legs: legs[self.leg + 1] was the leg after the next one.
+        If the team has no leg with the next number, None is returned.
+        """
         team = self.get_relay_team()
         if team and isinstance(team, RelayTeam):
-            if len(team.legs) > self.leg + 1:
-                return team.legs[self.leg + 1]
+            return team.get_leg(self.leg + 1)
         return None
 
     def get_prev_leg(self):
@@ -2427,9 +2870,7 @@ class RelayLeg:
         if self.leg > 1:
             team = self.get_relay_team()
             if team and isinstance(team, RelayTeam):
-                for cur_leg in team.legs:
-                    if cur_leg.leg == self.leg - 1:
-                        return cur_leg
+                return team.get_leg(self.leg - 1)
         return None
 
     def get_bib(self):
@@ -2540,6 +2981,11 @@ class RelayTeam:
         self.last_correct_leg = 0
         self.place = 0
         self.order = 0
+        self._leg_index: Dict[int, RelayLeg] = {}
+        # calculated once per recalculation, see clear_cache
+        self._is_status_ok: Optional[bool] = None
+        self._correct_lap_count: Optional[int] = None
+        self._time: Optional[OTime] = None
 
     def __eq__(self, other) -> bool:
         if self.get_is_status_ok() == other.get_is_status_ok():
@@ -2568,6 +3014,15 @@ class RelayTeam:
 
         return self.get_time() > other.get_time()
 
+    def get_sort_key(self) -> Tuple:
+        """Key for sorting teams, smaller is better, the same order as __gt__ gives"""
+        return (
+            not self.get_is_status_ok(),
+            -self.get_correct_lap_count(),
+            self.get_is_out_of_competition(),
+            self.get_time().to_msec(),
+        )
+
     def get_all_results(self):
         """return: all results of persons, connected with team"""
 
@@ -2584,6 +3039,14 @@ class RelayTeam:
                 self.description = ""
 
         self.legs.append(leg)
+        self._leg_index.setdefault(leg.leg, leg)
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Forget team time and status after results of the legs are changed"""
+        self._is_status_ok = None
+        self._correct_lap_count = None
+        self._time = None
 
     def set_leg_for_person(self, person, leg):
         """Set leg for person"""
@@ -2597,12 +3060,14 @@ class RelayTeam:
             i.set_start_time_from_previous()
 
     def get_leg(self, leg_number):
-        for i in self.legs:
-            if i.leg == leg_number:
-                return i
-        return None
+        return self._leg_index.get(leg_number)
 
     def get_time(self):
+        if self._time is None:
+            self._time = self._get_time()
+        return self._time
+
+    def _get_time(self):
         if len(self.legs):
             last_correct_leg = self.get_correct_lap_count()
             if last_correct_leg > 0:
@@ -2626,6 +3091,11 @@ class RelayTeam:
 
     def get_correct_lap_count(self):
         """quantity of successfully finished laps"""
+        if self._correct_lap_count is None:
+            self._correct_lap_count = self._get_correct_lap_count()
+        return self._correct_lap_count
+
+    def _get_correct_lap_count(self):
         correct_qty = 0
         for i in range(len(self.legs)):
             leg = self.get_leg(i + 1)
@@ -2649,10 +3119,9 @@ class RelayTeam:
 
     def get_is_status_ok(self):
         """Get the whole team status - OK if all laps are OK"""
-        for leg in self.legs:
-            if not leg.is_correct():
-                return False
-        return True
+        if self._is_status_ok is None:
+            self._is_status_ok = all(leg.is_correct() for leg in self.legs)
+        return self._is_status_ok
 
     def get_is_all_legs_finished(self):
         # check leg count
@@ -2709,14 +3178,83 @@ def find(iterable: list, **kwargs):
         return None
 
 
+class MultiDayTotal(NamedTuple):
+    time: OTime
+    is_ok: bool = True
+    # comment of the day result with a bad status, None if the day has no result
+    status_comment: Optional[str] = None
+
+
+class MultiDayIndex:
+    """
+    Results of the event days by multi_day_id of the person
+
+    Day indexes are rebuilt when the result list of the day is changed,
+    totals are kept until the result lists are changed or clear is called,
+    result calculation clears them once per pass
+    """
+
+    def __init__(self):
+        self._days: Dict[int, Tuple[Race, Tuple[int, int], Dict[str, Result]]] = {}
+        self._totals: Dict[str, MultiDayTotal] = {}
+        self._totals_key: Optional[Tuple] = None
+
+    def clear(self) -> None:
+        self._days = {}
+        self._totals = {}
+        self._totals_key = None
+
+    def find_result(self, obj: Race, person_id: str) -> Optional[Result]:
+        key = (id(obj.results), len(obj.results))
+        item = self._days.get(id(obj))
+        if item is None or item[0] is not obj or item[1] != key:
+            index = {}
+            for res in obj.results:
+                if res.person:
+                    index[res.person.multi_day_id] = res
+            item = (obj, key, index)
+            self._days[id(obj)] = item
+        return item[2].get(person_id)
+
+    def get_total(self, person_id: str) -> MultiDayTotal:
+        key = tuple((id(obj), id(obj.results), len(obj.results)) for obj in races())
+        if key != self._totals_key:
+            self._totals = {}
+            self._totals_key = key
+        total = self._totals.get(person_id)
+        if total is None:
+            total = self._get_total(person_id)
+            self._totals[person_id] = total
+        return total
+
+    def _get_total(self, person_id: str) -> MultiDayTotal:
+        sum_result = OTime()
+        for day in races():
+            result = self.find_result(day, person_id)
+            if result is None:
+                return MultiDayTotal(OTime(), False)
+            if not result.is_status_ok():
+                return MultiDayTotal(OTime(), False, result.status_comment)
+            sum_result += result.get_result_otime_current_day()
+        return MultiDayTotal(sum_result)
+
+
+# races with group and readout indexes, see Race.rebuild_group_indexes
+_indexed_races: "weakref.WeakSet[Race]" = weakref.WeakSet()
 _event = [create(Race)]
 current_race = 0
+_multi_day_index = MultiDayIndex()
+
+
+def get_multi_day_index() -> MultiDayIndex:
+    return _multi_day_index
 
 
 def new_event(event):
     if len(event):
         global _event
         _event = event
+        _multi_day_index.clear()
 
 
 def add_race():
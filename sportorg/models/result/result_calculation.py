@@ -1,10 +1,11 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Set, Tuple
 
 from sportorg import settings
 from sportorg.common.otime import OTime
 from sportorg.models.constant import RankingTable
 from sportorg.models.memory import (
     Group,
+    Person,
     Qualification,
     Race,
     RaceType,
@@ -12,19 +13,79 @@ from sportorg.models.memory import (
     Result,
     ResultStatus,
     find,
+    get_multi_day_index,
 )
 
 
-class ResultCalculation:
+class CalculationContext:
+    """
+    Data of one recalculation pass, shared by ResultCalculation,
+    ScoreCalculation, RaceSplits and GroupSplits not to sort
+    the same group results several times
+    """
+
     def __init__(self, r: Race):
         self.race = r
-        self._group_finishes = {}
-        self._group_persons = {}
+        self.group_finishes: Dict[Group, List[Result]] = {}
+        self.group_persons: Dict[Group, List[Person]] = {}
+        self.leader_times: Dict[Group, Optional[OTime]] = {}
+        self.mode = r.get_setting("result_processing_mode", "time")
+        # results are not hashable, keys are stored by id
+        self.sort_keys: Dict[int, Tuple] = {}
+
+    def get_sort_key(self, result: Result) -> Tuple:
+        key = self.sort_keys.get(id(result))
+        if key is None:
+            key = result.get_sort_key(self.mode)
+            self.sort_keys[id(result)] = key
+        return key
+
+
+class ResultCalculation:
+    def __init__(self, r: Race, context: Optional[CalculationContext] = None):
+        self.race = r
+        if context is None:
+            context = CalculationContext(r)
+        self.context = context
+        self._group_finishes = context.group_finishes
+        self._group_persons = context.group_persons
+
+    def process_results(
+        self,
+        groups: Optional[List[Group]] = None,
+        relay_team_numbers: Optional[Dict[Group, Optional[Set[int]]]] = None,
+    ):
+        """
+        Calculate places, relay teams and ranks
+
+        Args:
+            groups: process only these groups, other groups keep their results and
+                relay teams untouched. If None, all groups are processed
+            relay_team_numbers: for partially processed relay groups, numbers of
+                the teams to rebuild, None value means all teams of the group
+        """
+        if groups is None:
+            groups = self.race.groups
+            group_set = None
+        else:
+            group_set = set(groups)
 
-    def process_results(self):
-        self.race.relay_teams.clear()
-        self.race.result_index = {}
+        old_teams: Dict[Group, List[RelayTeam]] = {}
+        if group_set is None:
+            self.race.relay_teams.clear()
+        else:
+            for team in self.race.relay_teams:
+                old_teams.setdefault(team.group, []).append(team)
+            self.race.relay_teams[:] = [
+                team for team in self.race.relay_teams if team.group not in group_set
+            ]
+        # new teams can have the same count, the index key would not notice it
+        self.race.rebuild_relay_team_indexes()
+
+        get_multi_day_index().clear()
         for person in self.race.persons:
+            if group_set is not None and person.group not in group_set:
+                continue
             person.result_count = 0
             if person.start_time and person.group:
                 if person.group.pursuit_start_time != OTime():
@@ -36,29 +97,41 @@ class ResultCalculation:
 
         for result in self.race.results:
             if result.person:
+                if group_set is not None and result.person.group not in group_set:
+                    continue
                 result.person.result_count += 1
-        for i in self.race.groups:
+        for i in groups:
             if not self.race.get_type(i) == RaceType.RELAY:
                 # single race
                 array = self.get_group_finishes(i)
                 self.set_places(array)
             else:
                 # relay
-                new_relays = self.process_relay_results(i)
+                team_numbers = None
+                if group_set is not None and relay_team_numbers:
+                    team_numbers = relay_team_numbers.get(i)
+                new_relays = self.process_relay_results(
+                    i, old_teams.get(i, []), team_numbers
+                )
                 for a in new_relays:
-                    self.race.relay_teams.append(a)
+                    self.race.add_relay_team(a)
             self.set_rank(i)
 
+        if group_set is not None:
+            # keep the same order of teams as the full processing gives
+            teams_by_group: Dict[Group, List[RelayTeam]] = {}
+            for team in self.race.relay_teams:
+                teams_by_group.setdefault(team.group, []).append(team)
+            self.race.relay_teams[:] = [
+                team for i in self.race.groups for team in teams_by_group.get(i, [])
+            ]
+            self.race.rebuild_relay_team_indexes()
+
     def get_group_finishes(self, group: Group) -> Result:
         if group in self._group_finishes:
             return self._group_finishes[group]
-        ret = []
-        for i in self.race.results:
-            person = i.person
-            if person:
-                if person.group is group:
-                    ret.append(i)
-        ret.sort()
+        ret = self.race.get_group_results(group)
+        ret.sort(key=self.context.get_sort_key)
         group.count_finished = len(ret)
         self._group_finishes[group] = ret
         return ret
@@ -66,11 +139,7 @@ class ResultCalculation:
     def get_group_persons(self, group):
         if group in self._group_persons:
             return self._group_persons[group]
-        ret = []
-        for i in self.race.persons:
-            person = i
-            if person.group is group:
-                ret.append(i)
+        ret = self.race.get_persons_by_group(group) or []
         group.count_person = len(ret)
         self._group_persons[group] = ret
         return ret
@@ -110,14 +179,36 @@ class ResultCalculation:
             else:
                 res.current_result = res.get_result()
 
-    def process_relay_results(self, group: Group) -> List[RelayTeam]:
+    def process_relay_results(
+        self,
+        group: Group,
+        old_teams: Optional[List[RelayTeam]] = None,
+        team_numbers: Optional[Set[int]] = None,
+    ) -> List[RelayTeam]:
+        """
+        Build relay teams of the group and set places
+
+        If team_numbers is specified, only these teams are rebuilt,
+        other teams are taken from old_teams as is
+        """
         results = self.get_group_finishes(group)
 
+        kept_teams: Dict[int, RelayTeam] = {}
+        if team_numbers is not None and old_teams:
+            for team in old_teams:
+                if team.bib_number not in team_numbers:
+                    kept_teams[team.bib_number] = team
+
         relay_teams: Dict[str, RelayTeam] = {}
         for res in results:
             bib = res.person.bib
 
             team_number = bib % 1000
+            if team_number in kept_teams:
+                if str(team_number) not in relay_teams:
+                    kept_teams[team_number].clear_cache()
+                    relay_teams[str(team_number)] = kept_teams[team_number]
+                continue
             if str(team_number) not in relay_teams:
                 new_team = RelayTeam(self.race)
                 new_team.group = group
@@ -128,7 +219,7 @@ class ResultCalculation:
 
             team = relay_teams[str(team_number)]
             team.add_result(res)
-        teams_sorted = sorted(relay_teams.values())
+        teams_sorted = sorted(relay_teams.values(), key=RelayTeam.get_sort_key)
 
         if group.is_best_team_placing_mode:
             teams_sorted = self.sort_best_relay_team_placing(teams_sorted)
@@ -256,7 +347,9 @@ class ResultCalculation:
 
     def get_group_leader_time(self, group):
         if self.race.get_type(group) == RaceType.RELAY:
-            team_result = find(self.race.relay_teams, group=group, place=1)
+            team_result = find(
+                self.race.get_relay_teams_by_group(group), group=group, place=1
+            )
             if isinstance(team_result, RelayTeam):
                 leader_time = team_result.get_time()
             else:
@@ -325,7 +418,7 @@ class ResultCalculation:
 
         :return: rank of group, -1 if we have < X (default=4) successful teams
         """
-        teams = find(self.race.relay_teams, group=group, return_all=True)
+        teams = self.race.get_relay_teams_by_group(group)
         success_teams = []
 
         start_limit = settings.SETTINGS.ranking.get("start_limit_relay", 6)
@@ -108,8 +108,10 @@ class ResultChecker:
         return o
 
     @staticmethod
-    def check_all():
-        for result in race().results:
+    def check_all(results=None):
+        if results is None:
+            results = race().results
+        for result in results:
             if result.person:
                 ResultChecker.checking(result)
 
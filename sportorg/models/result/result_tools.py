@@ -1,10 +1,14 @@
 import logging
 import time
 from functools import wraps
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from sportorg.common.otime import OTime
-from sportorg.models.memory import Group, Race, race
-from sportorg.models.result.result_calculation import ResultCalculation
+from sportorg.models.memory import Group, Person, Race, RaceType, Result, race
+from sportorg.models.result.result_calculation import (
+    CalculationContext,
+    ResultCalculation,
+)
 from sportorg.models.result.result_checker import ResultChecker
 from sportorg.models.result.score_calculation import ScoreCalculation
 from sportorg.models.result.split_calculation import RaceSplits
@@ -52,11 +56,226 @@ def _measure_calc_performance(func):
     return wrapper
 
 
+class ResultTracker:
+    """
+    Dirty state of the race results between recalculations
+
+    Persons and results are marked by the race when they are added or deleted
+    and when the group, the bib or the person of the result is changed.
+    Incremental recalculation processes only the groups (and relay teams)
+    of the marked objects. Other changes of persons and results
+    (e.g. edited split times or status) should be marked by mark_person
+    or mark_result, or followed by the full recalculation.
+
+    Settings and groups are few, they are compared with the saved state.
+    Person and result lists changed bypassing the race methods
+    fall back to the full recalculation.
+    """
+
+    def __init__(self):
+        self.is_ready = False
+        self._settings: Dict[str, Any] = {}
+        self._data: Dict[str, Any] = {}
+        self._groups: Dict[Group, Dict[str, Any]] = {}
+        self._lists: Tuple[int, int] = (0, 0)
+        self._person_count = 0
+        self._result_count = 0
+        self._marked_groups: Set[Group] = set()
+        self._marked_members: Set[Tuple[Optional[Group], int]] = set()
+        self._marked_persons: Dict[int, Person] = {}
+        self._marked_results: Dict[int, Result] = {}
+
+    def mark_group(self, group: Optional[Group]) -> None:
+        if group is not None:
+            self._marked_groups.add(group)
+
+    def mark_person(
+        self, person: Person, group: Optional[Group] = None, bib: int = 0
+    ) -> None:
+        """Changed person, group and bib are the previous team of the person"""
+        self._marked_persons[id(person)] = person
+        if group is not None:
+            self._marked_members.add((group, bib))
+
+    def mark_result(self, result: Result) -> None:
+        self._marked_results[id(result)] = result
+
+    def mark_new_person(self, person: Person) -> None:
+        self.mark_person(person)
+        self._person_count += 1
+
+    def mark_deleted_person(self, person: Person) -> None:
+        self._marked_persons.pop(id(person), None)
+        if person.group is not None:
+            self._marked_members.add((person.group, person.bib))
+        self._person_count -= 1
+
+    def mark_new_result(self, result: Result) -> None:
+        self.mark_result(result)
+        self._result_count += 1
+
+    def mark_deleted_result(self, result: Result) -> None:
+        self._marked_results.pop(id(result), None)
+        if result.person and result.person.group is not None:
+            self._marked_members.add((result.person.group, result.person.bib))
+        self._result_count -= 1
+
+    def reset(self) -> None:
+        self.is_ready = False
+        self._clear_marks()
+
+    def save(self, race_object: Race) -> None:
+        self._settings = race_object.settings.copy()
+        self._data = race_object.data.to_dict()
+        self._groups = {i: _group_state(i) for i in race_object.groups}
+        self._lists = (id(race_object.persons), id(race_object.results))
+        self._person_count = len(race_object.persons)
+        self._result_count = len(race_object.results)
+        self._clear_marks()
+        self.is_ready = True
+
+    def _clear_marks(self) -> None:
+        self._marked_groups.clear()
+        self._marked_members.clear()
+        self._marked_persons.clear()
+        self._marked_results.clear()
+
+    def is_valid(self, race_object: Race) -> bool:
+        if not self.is_ready:
+            return False
+        if self._lists != (id(race_object.persons), id(race_object.results)):
+            return False
+        if (self._person_count, self._result_count) != (
+            len(race_object.persons),
+            len(race_object.results),
+        ):
+            return False
+        if self._settings != race_object.settings:
+            return False
+        if self._data != race_object.data.to_dict():
+            return False
+        if len(self._groups) != len(race_object.groups):
+            return False
+        return all(i in self._groups for i in race_object.groups)
+
+    def get_changes(self, race_object: Race) -> "ResultChanges":
+        changes = ResultChanges()
+        for group in self._marked_groups:
+            changes.add_group(group)
+
+        for group in race_object.groups:
+            if group.get_type() == RaceType.MULTI_DAY_RACE:
+                # multi day results depend on the other days
+                changes.add_group(group)
+            elif self._groups[group] != _group_state(group):
+                changes.add_group(group)
+
+        for group, bib in self._marked_members:
+            changes.add_member(group, bib)
+        for person in self._marked_persons.values():
+            changes.add_member(person.group, person.bib)
+        for result in self._marked_results.values():
+            changes.add_result(result)
+            if result.person:
+                changes.add_member(result.person.group, result.person.bib)
+
+        return changes
+
+
+class ResultChanges:
+    """Groups, relay teams and results which must be recalculated"""
+
+    def __init__(self):
+        self.groups: Set[Group] = set()
+        self.relay_team_numbers: Dict[Group, Optional[Set[int]]] = {}
+        self.results: List[Result] = []
+
+    def add_group(self, group: Group) -> None:
+        self.groups.add(group)
+        self.relay_team_numbers[group] = None
+
+    def add_member(self, group: Optional[Group], bib: int) -> None:
+        """Mark the group and the relay team of the person as changed"""
+        if group is None:
+            return
+        self.groups.add(group)
+        if group in self.relay_team_numbers:
+            team_numbers = self.relay_team_numbers[group]
+            if team_numbers is not None:
+                team_numbers.add(bib % 1000)
+        else:
+            self.relay_team_numbers[group] = {bib % 1000}
+
+    def add_result(self, result: Result) -> None:
+        self.results.append(result)
+
+    def get_groups(self, race_object: Race) -> List[Group]:
+        """Changed groups in the race order"""
+        return [i for i in race_object.groups if i in self.groups]
+
+    def get_changed_results(self, race_object: Race) -> List[Result]:
+        """Results whose values or places may be changed"""
+        ret = self.get_group_results(race_object, self.get_groups(race_object))
+        # results without group are not processed, but should be cleared
+        ret.extend(i for i in self.results if not i.person or not i.person.group)
+        return ret
+
+    @staticmethod
+    def get_group_results(race_object: Race, groups: List[Group]) -> List[Result]:
+        ret = []
+        for group in groups:
+            ret.extend(race_object.get_group_results(group))
+        return ret
+
+    def get_score_results(self, race_object: Race, groups: List[Group]) -> List[Result]:
+        """
+        Results of changed groups and results of the relay teams
+        with the same numbers in other groups (team result is found by number)
+        """
+        ret = self.get_group_results(race_object, groups)
+        team_numbers: Set[int] = set()
+        for group in groups:
+            if race_object.get_type(group) == RaceType.RELAY:
+                team_numbers.update(
+                    i.person.bib % 1000 for i in race_object.get_group_results(group)
+                )
+        if team_numbers:
+            for group in race_object.groups:
+                if (
+                    group in self.groups
+                    or race_object.get_type(group) != RaceType.RELAY
+                ):
+                    continue
+                for result in race_object.get_group_results(group):
+                    if result.person.bib % 1000 in team_numbers:
+                        ret.append(result)
+        return ret
+
+
+def _group_state(group: Group) -> Dict[str, Any]:
+    ret = group.to_dict()
+    # counters are changed by the calculation itself
+    ret.pop("count_person")
+    ret.pop("count_finished")
+    return ret
+
+
+def get_tracker(race_object: Optional[Race] = None) -> ResultTracker:
+    if race_object is None:
+        race_object = race()
+    if race_object.result_tracker is None:
+        race_object.result_tracker = ResultTracker()
+    return race_object.result_tracker
+
+
 @_register("Total")
 @_measure_calc_performance
 def recalculate_results(
-    race_object: Race = None, group: Group = None, recheck_results: bool = True
-) -> None:
+    race_object: Race = None,
+    group: Group = None,
+    recheck_results: bool = True,
+    incremental: bool = False,
+) -> Optional[ResultChanges]:
     """
     Recalculates all results and scores for the specified race
 
@@ -64,6 +283,11 @@ def recalculate_results(
         race_object (Race, optional): The race object to process. If None, uses the current race
         group (Group, optional): The group to process. If None, processes all groups
         recheck_results (bool, optional): If True, checks all results before recalculating
+        incremental (bool, optional): If True, processes only changed groups and relay teams,
+            see ResultTracker. The output is the same as of the full recalculation
+
+    Returns:
+        Changes processed by the incremental recalculation, None after the full one
 
     This function performs the following steps:
 
@@ -77,42 +301,82 @@ def recalculate_results(
     if race_object is None:
         race_object = race()
 
+    tracker = get_tracker(race_object)
+    if incremental and tracker.is_valid(race_object):
+        tracker.mark_group(group)
+        changes = tracker.get_changes(race_object)
+        groups = changes.get_groups(race_object)
+        results = changes.get_changed_results(race_object)
+
+        context = CalculationContext(race_object)
+        _clear_results(race_object, results)
+        _check_all(recheck_results, results)
+        _process_results(race_object, context, groups, changes.relay_team_numbers)
+        _generate_race_splits(race_object, context, None, groups)
+        _calculate_scores(
+            race_object, context, changes.get_score_results(race_object, groups)
+        )
+        tracker.save(race_object)
+        return changes
+
+    race_object.rebuild_group_indexes()
+    context = CalculationContext(race_object)
     _clear_results(race_object)
     _check_all(recheck_results)
-    _process_results(race_object)
-    _generate_race_splits(race_object, group)
-    _calculate_scores(race_object)
+    _process_results(race_object, context)
+    _generate_race_splits(race_object, context, group)
+    _calculate_scores(race_object, context)
+    tracker.save(race_object)
+    return None
 
 
 @_register("Clear")
 @_measure_calc_performance
-def _clear_results(race_object: Race) -> None:
-    race_object.clear_results()
+def _clear_results(race_object: Race, results: Optional[List[Result]] = None) -> None:
+    if results is None:
+        race_object.clear_results()
+    else:
+        for result in results:
+            result.clear()
 
 
 @_register("Check")
 @_measure_calc_performance
-def _check_all(recheck_results: bool) -> None:
+def _check_all(recheck_results: bool, results: Optional[List[Result]] = None) -> None:
     if recheck_results:
-        ResultChecker.check_all()
+        ResultChecker.check_all(results)
 
 
 @_register("Process")
 @_measure_calc_performance
-def _process_results(race_object: Race) -> None:
-    ResultCalculation(race_object).process_results()
+def _process_results(
+    race_object: Race,
+    context: CalculationContext,
+    groups: Optional[List[Group]] = None,
+    relay_team_numbers: Optional[Dict[Group, Optional[Set[int]]]] = None,
+) -> None:
+    ResultCalculation(race_object, context).process_results(groups, relay_team_numbers)
 
 
 @_register("Splits")
 @_measure_calc_performance
-def _generate_race_splits(race_object: Race, group: Group) -> None:
-    RaceSplits(race_object).generate(group=group)
+def _generate_race_splits(
+    race_object: Race,
+    context: CalculationContext,
+    group: Group,
+    groups: Optional[List[Group]] = None,
+) -> None:
+    RaceSplits(race_object, context).generate(group=group, groups=groups)
 
 
 @_register("Scores")
 @_measure_calc_performance
-def _calculate_scores(race_object: Race) -> None:
-    ScoreCalculation(race_object).calculate_scores()
+def _calculate_scores(
+    race_object: Race,
+    context: CalculationContext,
+    results: Optional[List[Result]] = None,
+) -> None:
+    ScoreCalculation(race_object, context).calculate_scores(results)
 
 
 def change_control_time(control_number: int, add: bool, time: OTime) -> None:
@@ -1,14 +1,21 @@
 import logging
+from typing import Optional
 
 from sportorg.common.otime import OTime
 from sportorg.models.memory import RaceType, Result
-from sportorg.models.result.result_calculation import ResultCalculation
+from sportorg.models.result.result_calculation import (
+    CalculationContext,
+    ResultCalculation,
+)
 from sportorg.models.start.relay import get_team_result
 
 
 class ScoreCalculation:
-    def __init__(self, r):
+    def __init__(self, r, context: Optional[CalculationContext] = None):
         self.race = r
+        if context is None:
+            context = CalculationContext(r)
+        self.context = context
         self.formula = None
         self.wrong_formula = False
         if self.race.get_setting("scores_mode", "off") == "formula":
@@ -23,8 +30,10 @@ class ScoreCalculation:
                 self.wrong_formula = True
         return 0
 
-    def calculate_scores(self):
-        for i in self.race.results:
+    def calculate_scores(self, results=None):
+        if results is None:
+            results = self.race.results
+        for i in results:
             self.calculate_scores_result(i)
 
     def calculate_scores_result(self, result):
@@ -70,7 +79,11 @@ class ScoreCalculation:
         if result and isinstance(result, Result):
             if result.person and result.person.group:
                 group = result.person.group
-                results = ResultCalculation(self.race).get_group_finishes(group)
+                if group in self.context.leader_times:
+                    return self.context.leader_times[group]
+                results = ResultCalculation(self.race, self.context).get_group_finishes(
+                    group
+                )
                 best_time = None
                 for cur_result in results:
                     if not cur_result.is_status_ok():
@@ -82,26 +95,22 @@ class ScoreCalculation:
                     if not best_time or cur_time < best_time:
                         if cur_time > OTime(0):
                             best_time = cur_time
+                self.context.leader_times[group] = best_time
                 return best_time
         return None
 
     def get_group_team_results(self, group, team):
         ret = []
-        for result in self.race.results:
-            if result.person and result.person.group == group:
-                if result.person.organization == team:
-                    ret.append(result)
+        for result in self.race.get_group_results(group):
+            if result.person.organization == team:
+                ret.append(result)
         return ret
 
     def get_group_region_results(self, group, region):
         ret = []
-        for result in self.race.results:
-            if result.person and result.person.group == group:
-                if (
-                    self.get_region_for_organization(result.person.organization)
-                    == region
-                ):
-                    ret.append(result)
+        for result in self.race.get_group_results(group):
+            if self.get_region_for_organization(result.person.organization) == region:
+                ret.append(result)
         return ret
 
     @staticmethod
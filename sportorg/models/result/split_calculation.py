@@ -1,8 +1,18 @@
 import logging
-from typing import Optional
-
-from sportorg.models.memory import Course, Group, Qualification, ResultStatus
-from sportorg.models.result.result_calculation import ResultCalculation
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Course,
+    Group,
+    Qualification,
+    ResultStatus,
+    Split,
+)
+from sportorg.models.result.result_calculation import (
+    CalculationContext,
+    ResultCalculation,
+)
 from sportorg.utils.time import get_speed_min_per_km
 
 
@@ -21,6 +31,8 @@ class PersonSplits:
 
         self.relay_leg = self.result.person.bib // 1000
         self.last_correct_index = 0
+        # correct splits by course index
+        self.legs: List[Split] = []
 
     @property
     def person(self):
@@ -45,6 +57,7 @@ class PersonSplits:
                 self.result.get_result_otime(), self.course.length
             )
 
+        self.legs = []
         for split in self.result.splits:
             split.relative_time = split.time - start_time
 
@@ -75,6 +88,7 @@ class PersonSplits:
                     )
 
                 cur_split.leg_place = 0
+                self.legs.append(cur_split)
 
                 course_index += 1
 
@@ -87,13 +101,8 @@ class PersonSplits:
         return self.last_correct_index
 
     def get_leg_by_course_index(self, index):
-        if index > self.get_last_correct_index():
-            return None
-
-        for i in self.result.splits:
-            if i.course_index == index:
-                return i
-
+        if 0 <= index < len(self.legs):
+            return self.legs[index]
         return None
 
     def get_leg_time(self, index):
@@ -116,23 +125,100 @@ class PersonSplits:
         }
 
 
+class LegMatrix:
+    """Legs of a group, a row per person and a column per course control
+
+    Rows are taken from PersonSplits.generate in one pass over the splits,
+    leg and relative (cumulative) places are ranked per column and set to
+    the splits as well.
+    """
+
+    def __init__(self, person_splits: List[PersonSplits], cp_count: int):
+        self.person_splits = list(person_splits)
+        self.cp_count = cp_count
+        self.legs: List[List[Optional[Split]]] = [
+            [ps.get_leg_by_course_index(i) for i in range(cp_count)]
+            for ps in self.person_splits
+        ]
+        self.leg_places = [[0] * cp_count for _ in self.legs]
+        self.relative_places = [[0] * cp_count for _ in self.legs]
+        # name and leg time of the fastest person on every leg
+        self.leaders: List[Tuple[str, Optional[OTime]]] = []
+
+    def rank(self) -> "LegMatrix":
+        self.leaders = []
+        for i in range(self.cp_count):
+            column = [(row, legs[i]) for row, legs in enumerate(self.legs) if legs[i]]
+            leader_time = None
+            leader_name = ""
+            for place, row, leg in _rank(column, lambda leg: leg.leg_time):
+                if leader_time is None:
+                    leader_time = leg.leg_time
+                    leader_name = self.person_splits[row].person.name
+                leg.leg_place = place
+                leg.leader_time = leader_time
+                self.leg_places[row][i] = place
+            for place, row, leg in _rank(column, lambda leg: leg.relative_time):
+                leg.relative_place = place
+                self.relative_places[row][i] = place
+            self.leaders.append((leader_name, leader_time))
+        return self
+
+    def get_column(self, index: int) -> List[Optional[Split]]:
+        return [legs[index] for legs in self.legs]
+
+    def to_dict(self):
+        return {
+            "leaders": [
+                {"name": name, "leg_time": time.to_msec() if time else None}
+                for name, time in self.leaders
+            ],
+            "rows": [
+                {
+                    "person_id": str(ps.person.id),
+                    "legs": [leg.to_dict() if leg else None for leg in legs],
+                }
+                for ps, legs in zip(self.person_splits, self.legs)
+            ],
+        }
+
+
+def _rank(
+    column: List[Tuple[int, Split]], get_time: Callable[[Split], OTime]
+) -> Iterator[Tuple[int, int, Split]]:
+    """Place, row and leg, equal times share the place: 1, 1, 3"""
+    place = 0
+    prev_time = None
+    for i, (row, leg) in enumerate(sorted(column, key=lambda item: get_time(item[1]))):
+        time = get_time(leg)
+        if i == 0 or time != prev_time:
+            place = i + 1
+        prev_time = time
+        yield place, row, leg
+
+
 class GroupSplits:
-    def __init__(self, r, group):
+    def __init__(self, r, group, context: Optional[CalculationContext] = None):
         self.race = r
         self.group = group
+        if context is None:
+            context = CalculationContext(r)
+        self.context = context
         self.cp_count = len(self.group.course.controls) if self.group.course else 0
 
         self.person_splits = []
+        self.legs = LegMatrix([], self.cp_count)
 
-        self.leader = {}
+        self.leader: Dict[str, Tuple[str, Optional[OTime]]] = {}
 
     def generate(self, logged=False):
         if logged:
             logging.debug("Group splits generate for " + self.group.name)
+        result_calculation = ResultCalculation(self.race, self.context)
         # to have group count
-        ResultCalculation(self.race).get_group_persons(self.group)
+        result_calculation.get_group_persons(self.group)
 
-        for i in ResultCalculation(self.race).get_group_finishes(self.group):
+        for i in result_calculation.get_group_finishes(self.group):
             self.person_splits.append(PersonSplits(self.race, i).generate())
 
         self.set_places()
@@ -143,34 +229,8 @@ class GroupSplits:
         return self
 
     def set_places(self):
-        len_persons = len(self.person_splits)
-        for i in range(self.cp_count):
-            self.sort_by_leg(i)
-            self.set_places_for_leg(i)
-            if not len_persons > 0:
-                continue
-            self.set_leg_leader(i, self.person_splits[0])
-
-            self.sort_by_leg(i, relative=True)
-            self.set_places_for_leg(i, relative=True)
-
-    def sort_by_leg(self, index, relative=False):
-        if relative:
-            self.person_splits = sorted(
-                self.person_splits,
-                key=lambda item: (
-                    item.get_leg_relative_time(index) is None,
-                    item.get_leg_relative_time(index),
-                ),
-            )
-        else:
-            self.person_splits = sorted(
-                self.person_splits,
-                key=lambda item: (
-                    item.get_leg_time(index) is None,
-                    item.get_leg_time(index),
-                ),
-            )
+        self.legs = LegMatrix(self.person_splits, self.cp_count).rank()
+        self.leader = {str(i): leader for i, leader in enumerate(self.legs.leaders)}
 
     def sort_by_result(self):
         status_priority = [
@@ -185,7 +245,7 @@ class GroupSplits:
             priority = 0
             if item.result.status in status_priority:
                 priority = status_priority.index(item.result.status) + 1
-            return item.result is None, priority, item.result
+            return priority, self.context.get_sort_key(item.result)
 
         self.person_splits = sorted(self.person_splits, key=sort_func)
 
@@ -199,73 +259,32 @@ class GroupSplits:
             ),
         )
 
-    def set_places_for_leg(self, index, relative=False):
-        if not len(self.person_splits):
-            return
-
-        if relative:
-            # calculate places for relative (cumulative from start) times
-            leader_time = self.person_splits[0].get_leg_relative_time(index)
-
-            double_places_counter = 0
-            prev_split_time = leader_time
-            for i, person in enumerate(self.person_splits):
-                leg = person.get_leg_by_course_index(index)
-                if leg:
-                    if i != 0 and prev_split_time == leg.relative_time:
-                        double_places_counter += 1
-                    else:
-                        double_places_counter = 0
-
-                    leg.relative_place = i + 1 - double_places_counter
-                    prev_split_time = leg.relative_time
-        else:
-            # calculate places for specified leg
-            leader_time = self.person_splits[0].get_leg_time(index)
-
-            double_places_counter = 0
-            prev_split_time = leader_time
-            for i, person in enumerate(self.person_splits):
-                leg = person.get_leg_by_course_index(index)
-                if leg:
-                    if i != 0 and prev_split_time == leg.leg_time:
-                        double_places_counter += 1
-                    else:
-                        double_places_counter = 0
-
-                    leg.leg_place = i + 1 - double_places_counter
-                    leg.leader_time = leader_time
-                    prev_split_time = leg.leg_time
-
-    def set_leg_leader(self, index, person_split):
-        self.leader[str(index)] = (
-            person_split.person.name,
-            person_split.get_leg_time(index),
-        )
-
     def get_leg_leader(self, index):
         if str(index) in self.leader.keys():
             return self.leader[str(index)]
         return "", ""
 
-    def set_places_relative(self):
-        for i in range(self.cp_count):
-            self.sort_by_leg(i, True)
-            self.set_places_for_leg(i, True)
-
     def to_dict(self):
         return [ps.to_dict() for ps in self.person_splits]
 
 
 class RaceSplits:
-    def __init__(self, r):
+    def __init__(self, r, context: Optional[CalculationContext] = None):
         self.race = r
-
-    def generate(self, group: Optional[Group] = None):
-        if group is None:
+        if context is None:
+            context = CalculationContext(r)
+        self.context = context
+
+    def generate(
+        self, group: Optional[Group] = None, groups: Optional[List[Group]] = None
+    ):
+        if groups is not None:
+            for group in groups:
+                GroupSplits(self.race, group, self.context).generate()
+        elif group is None:
             for group in self.race.groups:
-                GroupSplits(self.race, group).generate()
+                GroupSplits(self.race, group, self.context).generate()
         else:
-            GroupSplits(self.race, group).generate()
+            GroupSplits(self.race, group, self.context).generate()
 
         return self
@@ -1,5 +1,5 @@
 from sportorg.common.otime import OTime
-from sportorg.models.memory import find, race
+from sportorg.models.memory import race
 
 
 def get_last_relay_number_protocol():
@@ -54,7 +54,7 @@ def set_next_relay_number_to_person(person):
 
 def get_team_result(person):
     bib = person.bib % 1000
-    relay_team = find(race().relay_teams, bib_number=bib)
+    relay_team = race().find_relay_team(bib)
     if relay_team:
         if relay_team.get_lap_finished() == get_leg_count():
             if relay_team.get_is_status_ok():
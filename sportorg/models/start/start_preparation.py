@@ -1,9 +1,10 @@
+import heapq
 import logging
 import math
 import uuid
 from copy import copy
-from random import randint, shuffle
-from typing import Dict, List
+from random import Random
+from typing import Dict, List, Optional, Tuple
 
 from sportorg.common.otime import OTime
 from sportorg.models.memory import Person, race
@@ -23,13 +24,23 @@ class ReserveManager:
     def __init__(self, r):
         self.race = r
 
+    def get_reserve_count(self, group, reserve_count, reserve_percent) -> int:
+        percent_count = math.ceil(group.count_person * reserve_percent / 100)
+        return int(max(reserve_count, percent_count))
+
+    def get_reserve_slots(self, reserve_count, reserve_percent) -> Dict[object, int]:
+        """Empty start slots instead of reserve persons, see StartSlotAllocator"""
+        return {
+            group: self.get_reserve_count(group, reserve_count, reserve_percent)
+            for group in self.race.groups
+        }
+
     def process(self, reserve_prefix, reserve_count, reserve_percent):
         current_race = self.race
 
         for current_group in current_race.groups:
             count = current_group.count_person
 
-            percent_count = math.ceil(count * reserve_percent / 100)
             persons = current_race.get_persons_by_group(current_group)
 
             existing_reserves = 0
@@ -41,7 +52,10 @@ class ReserveManager:
                     if str.find(str_name, reserve_prefix) > -1:
                         existing_reserves += 1
 
-            insert_count = int(max(reserve_count, percent_count) - existing_reserves)
+            insert_count = (
+                self.get_reserve_count(current_group, reserve_count, reserve_percent)
+                - existing_reserves
+            )
 
             for i in range(insert_count):
                 new_person = Person()
@@ -57,8 +71,9 @@ class DrawManager:
     with filtered persons.
     """
 
-    def __init__(self, r):
+    def __init__(self, r, seed: Optional[int] = None):
         self.race = r
+        self.random = Random(seed)
         self.person_array = []
         self.mix_groups = False
         self.split_regions = False
@@ -111,21 +126,18 @@ class DrawManager:
 
         # toss by course
         if mix_groups:
-            for cur_course in obj.courses + [None]:
-                groups = []
-                for cur_group in obj.groups:
-                    if cur_group.course == cur_course:
-                        groups.append(cur_group)
-
-                if len(groups) < 1:
-                    continue
-
-                cur_array = []
-                for cur_person in persons:
-                    assert isinstance(cur_person, Person)
-                    if cur_person.group in groups:
-                        cur_array.append(cur_person)
-
+            group_courses = {group: group.course for group in obj.groups}
+            courses = obj.courses + [None]
+            course_persons: Dict[int, List[Person]] = {id(i): [] for i in courses}
+            for cur_person in persons:
+                assert isinstance(cur_person, Person)
+                if cur_person.group in group_courses:
+                    course = group_courses[cur_person.group]
+                    if id(course) in course_persons:
+                        course_persons[id(course)].append(cur_person)
+
+            for cur_course in courses:
+                cur_array = course_persons[id(cur_course)]
                 if len(cur_array) < 1:
                     continue
 
@@ -425,9 +437,9 @@ class DrawManager:
         persons.reverse()
 
     def process_array_impl(self, persons, split_teams: bool, split_regions: bool):
-        shuffle(persons)
+        persons = list(persons)
+        self.random.shuffle(persons)
         separated_dict: Dict[str, List[Person]] = {}
-        result_list: List[Person] = []
 
         # separate all person to arrays by split property
         for cur_person in persons:
@@ -436,65 +448,72 @@ class DrawManager:
                 separated_dict[prop] = []
             separated_dict[prop].append(cur_person)
 
-        rest_count = len(persons)
-        max_name, max_count, max_index = self.get_max_group_size(separated_dict, "")
+        sets = list(separated_dict.values())
+        for cur_set in sets:
+            # take persons from the end
+            cur_set.reverse()
+        buckets = _WeightedBuckets([len(cur_set) for cur_set in sets])
+        result_list: List[Person] = []
         duplicated_array: List[Person] = []
 
+        rest_count = len(persons)
+        max_index, max_count = buckets.get_max(-1)
+
         # limit = (N+1)//2 (e.g. 5 for 10 and 6 for 11)
         limit = (rest_count + 1) // 2
         if max_count > limit:
             # impossible to split
-            duplicated_array = separated_dict[max_name][limit:]
-            separated_dict[max_name] = separated_dict[max_name][:limit]
+            max_set = sets[max_index]
+            duplicated_array = max_set[: max_count - limit]
+            del max_set[: max_count - limit]
+            buckets.add(max_index, limit - max_count)
             rest_count -= len(duplicated_array)
+            max_count = limit
 
-        cur_index = 0
-        cur_prop = ""
+        cur_index = -1
         while max_count > 0:
             limit = (rest_count + 1) // 2
             if max_count >= limit:
                 # take person from max set, otherwise they will be duplicated
-                cur_prop = max_name
                 cur_index = max_index
             else:
-                # can take person from random set
-                # add one index of list for each element of list to have proportional shuffle
-                shuffle_indexes = []
-                for i in range(len(separated_dict)):
-                    if cur_index == i:
-                        continue  # skip previous value not to duplicate
-                    i_prop = list(separated_dict.keys())[i]
-                    for j in range(len(separated_dict[i_prop])):
-                        shuffle_indexes.append(i)
-                cur_index = shuffle_indexes[randint(0, len(shuffle_indexes) - 1)]
-                cur_prop = list(separated_dict.keys())[cur_index]
+                # can take person from random set, proportionally to the set size,
+                # skip previous value not to duplicate
+                cur_index = buckets.choice(self.random, cur_index)
 
             # extract person from selected set
-            result_list.append(separated_dict[cur_prop].pop(0))
+            result_list.append(sets[cur_index].pop())
+            buckets.add(cur_index, -1)
             rest_count -= 1
-            if len(separated_dict[cur_prop]) < 1:
-                # remove set if it's empty
-                separated_dict.pop(cur_prop)
 
             # recalculate max set for next loop
-            max_name, max_count, max_index = self.get_max_group_size(
-                separated_dict, cur_prop
-            )
+            max_index, max_count = buckets.get_max(cur_index)
 
         # insert at random positions rest values, that are out of limit N/2 for max set
-        if len(duplicated_array) > 0:
-            for cur_person in duplicated_array:
-                result_list.insert(randint(0, len(result_list) - 1), cur_person)
-        if cur_prop in separated_dict.keys():
-            array_tmp = separated_dict.get(cur_prop)
-            if array_tmp:
-                for cur_person in array_tmp:
-                    pos = 0
-                    if len(result_list) > 1:
-                        pos = randint(0, len(result_list) - 1)
-                    result_list.insert(pos, cur_person)
-
-        return result_list
+        rest = duplicated_array
+        if cur_index >= 0:
+            rest += reversed(sets[cur_index])
+        return self._insert_at_random_positions(result_list, rest)
+
+    def _insert_at_random_positions(
+        self, persons: List[Person], rest: List[Person]
+    ) -> List[Person]:
+        """
+        Insert persons at random positions, but not after the last one,
+        the same as inserting them one by one with randint(0, len(persons) - 1)
+        """
+        if not rest or not persons:
+            return persons + rest
+        self.random.shuffle(rest)
+        count = len(persons) - 1 + len(rest)
+        positions = set(self.random.sample(range(count), len(rest)))
+        ret: List[Person] = []
+        persons_iter = iter(persons)
+        rest_iter = iter(rest)
+        for i in range(count):
+            ret.append(next(rest_iter) if i in positions else next(persons_iter))
+        ret.append(persons[-1])
+        return ret
 
     def get_split_property(self, person, split_teams, split_regions) -> str:
         if person.organization is None:
@@ -507,21 +526,79 @@ class DrawManager:
         else:
             return "s"
 
-    def get_max_group_size(self, separated_dict: dict, ignore_name):
-        max_count = 0
-        max_index = 0
-        max_group = None
-        i = -1
-        for k in separated_dict.keys():
-            i += 1
-            if ignore_name == k:
-                continue
-            if len(separated_dict[k]) > max_count:
-                max_count = len(separated_dict[k])
-                max_group = k
-                max_index = i
 
-        return max_group, max_count, max_index
+class _WeightedBuckets:
+    """
+    Sizes of person sets for the draw
+
+    Binary indexed tree over the sizes gives a random set proportionally
+    to its size and a heap gives the largest set, both in O(log N)
+    """
+
+    def __init__(self, sizes: List[int]):
+        self.sizes = list(sizes)
+        self.total = sum(sizes)
+        self._tree = [0] * (len(sizes) + 1)
+        for i, size in enumerate(sizes):
+            self._tree_add(i, size)
+        # the first of the largest sets has the priority
+        self._heap = [(-size, i) for i, size in enumerate(sizes) if size]
+        heapq.heapify(self._heap)
+
+    def add(self, index: int, value: int) -> None:
+        self.sizes[index] += value
+        self.total += value
+        self._tree_add(index, value)
+        if self.sizes[index]:
+            heapq.heappush(self._heap, (-self.sizes[index], index))
+
+    def get_max(self, ignore_index: int) -> Tuple[int, int]:
+        """Index and size of the largest set except the ignored one"""
+        skipped = None
+        ret = (0, 0)
+        while self._heap:
+            size, index = self._heap[0]
+            if -size != self.sizes[index]:
+                # outdated size
+                heapq.heappop(self._heap)
+            elif index == ignore_index and skipped is None:
+                skipped = heapq.heappop(self._heap)
+            else:
+                ret = (index, -size)
+                break
+        if skipped is not None:
+            heapq.heappush(self._heap, skipped)
+        return ret
+
+    def choice(self, rnd: Random, ignore_index: int) -> int:
+        """Random set proportionally to its size except the ignored one"""
+        ignored_size = self.sizes[ignore_index] if ignore_index >= 0 else 0
+        value = rnd.randrange(self.total - ignored_size)
+        if ignored_size and value >= self._prefix_sum(ignore_index):
+            value += ignored_size
+        # find the first set with prefix sum greater than value
+        index = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            if index + step < len(self._tree) and self._tree[index + step] <= value:
+                index += step
+                value -= self._tree[index]
+            step >>= 1
+        return index
+
+    def _tree_add(self, index: int, value: int) -> None:
+        index += 1
+        while index < len(self._tree):
+            self._tree[index] += value
+            index += index & -index
+
+    def _prefix_sum(self, index: int) -> int:
+        """Sum of sizes before index"""
+        ret = 0
+        while index > 0:
+            ret += self._tree[index]
+            index -= index & -index
+        return ret
 
 
 class StartNumberManager:
@@ -610,28 +687,18 @@ class StartTimeManager:
         fixed_start_interval=None,
         one_minute_qty=1,
         mix_groups=False,
+        course_gap=None,
+        vacant_slots=0,
     ):
-        corridors = get_corridors()
-        for cur_corridor in corridors:
-            cur_start = corridor_first_start
-
-            if mix_groups:
-                self.process_corridor(
-                    cur_corridor, cur_start, fixed_start_interval, one_minute_qty
-                )
-            else:
-                groups = get_groups_by_corridor(cur_corridor)
-                for cur_group in groups:
-                    start_interval = fixed_start_interval
-
-                    # try to take start interval from group properties
-                    if is_group_start_interval:
-                        if cur_group.start_interval:
-                            start_interval = cur_group.start_interval
-
-                    cur_start = self.process_group(
-                        cur_group, cur_start, start_interval, one_minute_qty
-                    )
+        StartSlotAllocator(self.race).process(
+            corridor_first_start,
+            is_group_start_interval,
+            fixed_start_interval,
+            one_minute_qty,
+            mix_groups=mix_groups,
+            course_gap=course_gap,
+            vacant_slots=vacant_slots,
+        )
 
     def process_group(self, group, first_start, start_interval, one_minute_qty):
         current_race = self.race
@@ -664,6 +731,172 @@ class StartTimeManager:
                     one_minute_count = 0
 
 
+class _CorridorState:
+    __slots__ = ("corridor", "entries", "index", "time", "count")
+
+    def __init__(self, corridor, entries, first_start):
+        self.corridor = corridor
+        # (person, group, course id, start interval in msec)
+        self.entries: List[Tuple[Person, object, Optional[int], int]] = entries
+        self.index = 0
+        self.time = first_start
+        self.count = 0
+
+
+class StartSlotAllocator:
+    """Allocate start times in all corridors in one pass.
+
+    Corridors are filled in parallel, the earliest free slot of all corridors
+    is taken first. Persons of the same course in different corridors start
+    at least course_gap apart, otherwise the corridor waits for its next slot
+    after the gap and reserves it, so the other corridors keep the gap to it
+    and the corridors take turns. Reserve persons (see ReserveManager) hold
+    their slots like the others, vacant_slots leaves empty slots after each
+    group, it's a number or a number for every group, see
+    ReserveManager.get_reserve_slots.
+    """
+
+    def __init__(self, r):
+        self.race = r
+        self.shifted_count = 0
+
+    def process(
+        self,
+        corridor_first_start,
+        is_group_start_interval,
+        fixed_start_interval=None,
+        one_minute_qty=1,
+        mix_groups=False,
+        course_gap=None,
+        vacant_slots=0,
+    ):
+        first_start = corridor_first_start.to_msec() if corridor_first_start else 0
+        gap = course_gap.to_msec() if course_gap else 0
+        one_minute_qty = max(1, one_minute_qty)
+        self.shifted_count = 0
+
+        heap = []
+        states = []
+        for entries in self.get_corridor_entries(
+            is_group_start_interval, fixed_start_interval, mix_groups
+        ):
+            if entries:
+                heap.append((first_start, len(states)))
+                states.append(_CorridorState(len(states), entries, first_start))
+        heapq.heapify(heap)
+
+        # course id -> {corridor: last start}
+        course_starts: Dict[int, Dict[int, int]] = {}
+        # course id -> {corridor: slot waiting for the gap}
+        course_reserved: Dict[int, Dict[int, int]] = {}
+        while heap:
+            current_time, n = heapq.heappop(heap)
+            state = states[n]
+            person, group, course, interval = state.entries[state.index]
+
+            if gap and course is not None and course in course_starts:
+                free_time = self._get_free_time(
+                    current_time,
+                    n,
+                    gap,
+                    interval,
+                    (course_starts[course], course_reserved.get(course, {})),
+                )
+                if free_time > current_time:
+                    course_reserved.setdefault(course, {})[n] = free_time
+                    state.time = free_time
+                    state.count = 0
+                    self.shifted_count += 1
+                    heapq.heappush(heap, (free_time, n))
+                    continue
+
+            person.start_time = OTime(msec=current_time)
+            if course is not None:
+                course_starts.setdefault(course, {})[n] = current_time
+                course_reserved.get(course, {}).pop(n, None)
+            state.count += 1
+            state.index += 1
+            if state.index >= len(state.entries):
+                continue
+
+            next_group = state.entries[state.index][1]
+            if next_group is not group:
+                if state.count:
+                    state.time += interval
+                state.time += self._get_vacant_slots(vacant_slots, group) * interval
+                state.count = 0
+            elif state.count >= one_minute_qty:
+                state.time += interval
+                state.count = 0
+            heapq.heappush(heap, (state.time, n))
+
+    @staticmethod
+    def _get_free_time(start, corridor, gap, interval, starts) -> int:
+        """The first slot of the corridor at least gap apart from the starts
+        and reserved slots of other corridors"""
+        current_time = start
+        while True:
+            free_time = current_time
+            for times in starts:
+                for other, other_time in times.items():
+                    if other != corridor and abs(other_time - free_time) < gap:
+                        free_time = max(free_time, other_time + gap)
+            if free_time == current_time:
+                return current_time
+            if interval:
+                current_time = (
+                    start + math.ceil((free_time - start) / interval) * interval
+                )
+            else:
+                current_time = free_time
+
+    @staticmethod
+    def _get_vacant_slots(vacant_slots, group) -> int:
+        if isinstance(vacant_slots, dict):
+            return vacant_slots.get(group, 0)
+        return vacant_slots
+
+    def get_corridor_entries(
+        self, is_group_start_interval, fixed_start_interval, mix_groups
+    ) -> List[List[Tuple[Person, object, Optional[int], int]]]:
+        fixed_interval = fixed_start_interval.to_msec() if fixed_start_interval else 0
+        corridor_groups: Dict[int, list] = {}
+        for group in self.race.groups:
+            corridor_groups.setdefault(group.start_corridor or 0, []).append(group)
+
+        ret = []
+        if mix_groups:
+            # keep the drawn order, groups of the corridor are mixed
+            corridor_persons: Dict[int, list] = {i: [] for i in corridor_groups}
+            for person in self.race.persons:
+                if person.group:
+                    corridor_persons[person.group.start_corridor or 0].append(
+                        self._get_entry(person, None, fixed_interval)
+                    )
+            for corridor in sorted(corridor_persons):
+                ret.append(corridor_persons[corridor])
+            return ret
+
+        for corridor in sorted(corridor_groups):
+            entries = []
+            groups = sorted(
+                corridor_groups[corridor], key=lambda item: item.order_in_corridor
+            )
+            for group in groups:
+                interval = fixed_interval
+                if is_group_start_interval and group.start_interval:
+                    interval = group.start_interval.to_msec()
+                for person in self.race.get_persons_by_group(group) or []:
+                    entries.append(self._get_entry(person, group, interval))
+            ret.append(entries)
+        return ret
+
+    @staticmethod
+    def _get_entry(person, group, interval):
+        course = person.group.course
+        return person, group, id(course) if course else None, interval
+
+
 def get_corridors():
     current_race = race()
     ret = []
@@ -1,6 +1,9 @@
 import gzip
 import logging
-from typing import Optional
+from functools import partial
+from queue import Queue
+from threading import Thread
+from typing import Callable, Optional
 
 from boltons.fileutils import atomic_rename
 
@@ -19,6 +22,56 @@ def is_gzip_file(file_name: str) -> bool:
         return False
 
 
+class SaveThread(Thread):
+    """Writes files in the background, the GUI is not blocked by autosave"""
+
+    def __init__(self):
+        super().__init__(name="SaveThread", daemon=True)
+        self._queue: Queue = Queue()
+
+    def put(self, job: Callable[[], None]) -> None:
+        self._queue.put(job)
+
+    def is_busy(self) -> bool:
+        return self._queue.unfinished_tasks > 0
+
+    def wait(self) -> None:
+        self._queue.join()
+
+    def run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                job()
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                self._queue.task_done()
+
+
+_save_thread: Optional[SaveThread] = None
+# encoded races of the last save, used by one thread at a time
+_dump_cache = json.DumpCache()
+
+
+def _get_save_thread() -> SaveThread:
+    global _save_thread
+    if _save_thread is None:
+        _save_thread = SaveThread()
+        _save_thread.start()
+    return _save_thread
+
+
+def is_saving() -> bool:
+    return _save_thread is not None and _save_thread.is_busy()
+
+
+def wait_for_save() -> None:
+    """Wait until the background save is written"""
+    if _save_thread is not None:
+        _save_thread.wait()
+
+
 class File:
     def __init__(self, file_name: str):
         self._file_name = file_name
@@ -52,22 +105,36 @@ class File:
 
     def create(self) -> None:
         logger.info("Create " + self._file_name)
-        self._backup(
-            self._file_name + ".tmp",
-            json.dump,
-            "w",
-        )
-        atomic_rename(self._file_name + ".tmp", self._file_name, overwrite=True)
+        self._save(json.get_snapshot(), indent=True)
 
-    def save(self) -> None:
+    def save(self, *, indent: bool = True) -> None:
         logger.info("Save " + self._file_name)
+        self._save(json.get_snapshot(), indent=indent)
+        self._generate_srb()
+
+    def save_in_background(self, *, indent: bool = False) -> None:
+        """Autosave, only the snapshot of the race is made in this thread"""
+        logger.info("Save in background " + self._file_name)
+        snapshot = json.get_snapshot()
+        _get_save_thread().put(partial(self._write, snapshot, indent))
+        self._generate_srb()
+
+    def _save(self, snapshot, indent: bool) -> None:
+        # the same temporary file and the cache are used
+        wait_for_save()
+        self._write(snapshot, indent)
+
+    def _write(self, snapshot, indent: bool) -> None:
         self._backup(
             self._file_name + ".tmp",
-            json.dump,
+            partial(
+                json.dump_snapshot, snapshot=snapshot, indent=indent, cache=_dump_cache
+            ),
             "w",
         )
         atomic_rename(self._file_name + ".tmp", self._file_name, overwrite=True)
 
+    def _generate_srb(self) -> None:
         if settings.SETTINGS.file_generate_srb:
             self._backup(
                 self._file_name + ".srb",
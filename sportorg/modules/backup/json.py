@@ -1,6 +1,7 @@
 import gzip
 import os
 import uuid
+from typing import Dict, Optional, Set, Tuple
 
 import orjson
 
@@ -16,21 +17,100 @@ from sportorg.models.memory import (
 from sportorg.models.result.result_tools import recalculate_results
 
 
-def dump(file, *, compress=False):
-    data = {
+def get_snapshot():
+    """Data of the event for dump_snapshot, made in the GUI thread
+
+    to_dict copies the objects, so the snapshot can be written in another
+    thread while the race is changed.
+    """
+    return {
         "version": config.VERSION,
         "current_race": get_current_race_index(),
         "races": [r.to_dict() for r in races()],
     }
-    raw = orjson.dumps(data, option=orjson.OPT_INDENT_2)
-    if compress:
-        file.write(gzip.compress(raw))
-    else:
-        file.write(raw.decode())
+
+
+class DumpCache:
+    """Encoded races of the last dump
+
+    A race is serialized every time, it's fast. Compression is slow, so an
+    unchanged race reuses its gzip member from the previous dump.
+    """
+
+    def __init__(self):
+        self._parts: Dict[Tuple[str, bool, bool], Tuple[bytes, bytes]] = {}
+        self._used: Set[Tuple[str, bool, bool]] = set()
+
+    def get(self, key: Tuple[str, bool, bool], raw: bytes) -> Optional[bytes]:
+        self._used.add(key)
+        part = self._parts.get(key)
+        if part is not None and part[0] == raw:
+            return part[1]
+        return None
+
+    def set(self, key: Tuple[str, bool, bool], raw: bytes, data: bytes) -> None:
+        self._parts[key] = (raw, data)
+
+    def prune(self) -> None:
+        """Forget races that were not in the last dump"""
+        for key in set(self._parts) - self._used:
+            del self._parts[key]
+        self._used.clear()
+
+
+def dump(file, *, compress=False, indent=True):
+    dump_snapshot(file, get_snapshot(), compress=compress, indent=indent)
+
+
+def dump_snapshot(file, snapshot, *, compress=False, indent=True, cache=None):
+    """Write the snapshot race by race
+
+    The output is the same JSON document as one orjson.dumps of the snapshot.
+    With compression every part is a gzip member, gzip readers join them.
+    """
+    option = orjson.OPT_INDENT_2 if indent else 0
+    outer = orjson.dumps({**snapshot, "races": []}, option=option)
+    # "races" is the last key, races are written between the brackets
+    pos = outer.rindex(b"[]") + 1
+    head, tail = outer[:pos], outer[pos:]
+    first, separator = b"", b","
+    if indent:
+        first, separator = b"\n    ", b",\n    "
+        if snapshot["races"]:
+            tail = b"\n  " + tail
+    _write(file, head, compress)
+    for i, race_dict in enumerate(snapshot["races"]):
+        _write(file, separator if i else first, compress)
+        raw = orjson.dumps(race_dict, option=option)
+        key = (str(race_dict["id"]), indent, compress)
+        data = cache.get(key, raw) if cache is not None else None
+        if data is None:
+            if indent:
+                # nested in the list, JSON strings have no raw line breaks
+                data = raw.replace(b"\n", b"\n    ")
+            else:
+                data = raw
+            if compress:
+                data = gzip.compress(data, mtime=0)
+            if cache is not None:
+                cache.set(key, raw, data)
+        file.write(data if compress else data.decode())
+    _write(file, tail, compress)
+    if cache is not None:
+        cache.prune()
     file.flush()
     os.fsync(file.fileno())
 
 
+def _write(file, data: bytes, compress: bool) -> None:
+    if not data:
+        return
+    if compress:
+        file.write(gzip.compress(data, mtime=0))
+    else:
+        file.write(data.decode())
+
+
 def load(file, *, compress=False):
     # clear current race, here we'll have index data after loading
     tmp_obj = Race()
@@ -40,8 +120,10 @@ def load(file, *, compress=False):
     new_event(event)
     set_current_race_index(current_race)
 
+    # other days of a multi day event keep results from the file, they are
+    # recalculated when selected
+    recalculate_results(race_object=race())
     for obj in races():
-        recalculate_results(race_object=obj)
         obj.set_setting(
             "live_enabled", False
         )  # force user to activate Live broadcast manually (not to lose live results)
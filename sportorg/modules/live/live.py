@@ -1,64 +1,342 @@
 import asyncio
 import logging
 import os
-from functools import partial
-from queue import Empty, Queue
-from threading import Event, Thread
+import time
+from dataclasses import asdict, dataclass, field, replace
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from uuid import UUID
 
 import aiohttp
+import orjson
 
-from sportorg.models.memory import race
+from sportorg import config
+from sportorg.models.memory import Group, Organization, Person, Result, find, race
 from sportorg.modules.live import orgeo
 
 LIVE_TIMEOUT = int(os.getenv("SPORTORG_LIVE_TIMEOUT", "10"))
+# concurrent requests to one url
+LIVE_CONNECTIONS = int(os.getenv("SPORTORG_LIVE_CONNECTIONS", "4"))
+LIVE_RETRY_DELAY = 1.0
+LIVE_MAX_RETRY_DELAY = 60.0
+LIVE_MAX_ATTEMPTS = 20
+LIVE_JOURNAL = config.data_dir("live_journal.json")
 
 
-async def create_session(timeout: int) -> aiohttp.ClientSession:
-    return aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout))
+async def create_session(
+    timeout: int, connections: int = LIVE_CONNECTIONS
+) -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        connector=aiohttp.TCPConnector(limit_per_host=connections),
+    )
+
+
+@dataclass
+class LiveRequest:
+    """Request to orgeo, kept in the journal until it's sent"""
+
+    method: str  # create, create_online_cp or delete
+    url: str
+    items: List[Dict[str, Any]]
+    race_data: Dict[str, Any]
+    ids: Tuple[str, ...] = ()
+    attempt: int = 0
+    retry_time: float = 0.0
+    # online punches accepted by the server, see orgeo.create_online_cp
+    sent: List[str] = field(default_factory=list)
+
+    @property
+    def key(self) -> Hashable:
+        # requests for the same persons are coalesced
+        return self.method, self.url, self.ids
+
+    async def __call__(self, session) -> bool:
+        func = getattr(orgeo, self.method)
+        if self.method == "create_online_cp":
+            return await func(
+                self.url,
+                self.items,
+                self.race_data,
+                logging.root,
+                session=session,
+                sent=self.sent,
+            )
+        return await func(
+            self.url, self.items, self.race_data, logging.root, session=session
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LiveRequest":
+        if data["method"] not in ("create", "create_online_cp", "delete"):
+            raise ValueError("Unknown method {}".format(data["method"]))
+        data["ids"] = tuple(data["ids"])
+        return cls(**data)
+
+
+@dataclass
+class LiveMetrics:
+    queue_depth: int = 0
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    dropped: int = 0
+    last_latency: float = 0.0
+    max_latency: float = 0.0
+    total_latency: float = 0.0
+
+    @property
+    def average_latency(self) -> float:
+        count = self.sent + self.failed
+        return self.total_latency / count if count else 0.0
 
 
 class LiveThread(Thread):
-    def __init__(self):
+    def __init__(
+        self,
+        journal_path: Optional[str] = None,
+        connections: int = LIVE_CONNECTIONS,
+        retry_delay: float = LIVE_RETRY_DELAY,
+        max_retry_delay: float = LIVE_MAX_RETRY_DELAY,
+        max_attempts: int = LIVE_MAX_ATTEMPTS,
+        delay: float = 0.5,
+    ):
         super().__init__(name="LiveThread", daemon=True)
-        self._queue = Queue()
+        # key -> request, requests with the same key are coalesced
+        self._pending: Dict[Hashable, Any] = {}
+        # requests being sent, still in the journal
+        self._active: Dict[Hashable, Any] = {}
+        self._lock = Lock()
         self._stop_event = Event()
-        self._delay = 0.5
+        self._delay = delay
+        self._journal_path = journal_path
+        self._journal_changed = False
+        self._connections = connections
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._max_attempts = max_attempts
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._metrics = LiveMetrics()
+        self._load_journal()
 
-    def send(self, func) -> None:
-        self._queue.put_nowait(func)
+    def send(self, func, key: Optional[Hashable] = None) -> None:
+        """Add request to the next batch. If there is a pending request
+        with the same key, it's replaced, and the new one goes last"""
+        if key is None:
+            key = func.key if isinstance(func, LiveRequest) else object()
+        with self._lock:
+            old = self._pending.pop(key, None)
+            if isinstance(old, LiveRequest) and isinstance(func, LiveRequest):
+                # punches of the replaced request are not sent again
+                func.sent.extend(i for i in old.sent if i not in func.sent)
+            self._pending[key] = func
+            self._journal_changed = True
 
     def stop(self) -> None:
         self._stop_event.set()
 
+    def get_metrics(self) -> LiveMetrics:
+        with self._lock:
+            metrics = replace(self._metrics)
+            metrics.queue_depth = len(self._pending) + len(self._active)
+        return metrics
+
+    def _get_pending(self) -> Dict[Hashable, Any]:
+        """Take requests ready to send"""
+        now = time.time()
+        with self._lock:
+            ready = {
+                key: func
+                for key, func in self._pending.items()
+                if not isinstance(func, LiveRequest) or func.retry_time <= now
+            }
+            for key in ready:
+                del self._pending[key]
+            self._active.update(ready)
+        return ready
+
+    def _get_delay(self, attempt: int) -> float:
+        return min(self._retry_delay * 2 ** (attempt - 1), self._max_retry_delay)
+
+    async def _send(self, session, key: Hashable, func) -> None:
+        url = func.url if isinstance(func, LiveRequest) else ""
+        if url not in self._semaphores:
+            self._semaphores[url] = asyncio.Semaphore(self._connections)
+        async with self._semaphores[url]:
+            start = time.monotonic()
+            try:
+                is_sent = await func(session=session)
+            except Exception as e:
+                logging.error("Error: %s", str(e))
+                is_sent = False
+            latency = time.monotonic() - start
+
+        if not isinstance(func, LiveRequest):
+            # not saved and not repeated
+            is_sent = True
+        with self._lock:
+            del self._active[key]
+            self._journal_changed = True
+            metrics = self._metrics
+            metrics.last_latency = latency
+            metrics.max_latency = max(metrics.max_latency, latency)
+            metrics.total_latency += latency
+            if is_sent:
+                metrics.sent += 1
+                return
+            metrics.failed += 1
+            if key in self._pending:
+                # there is a newer request for the same objects
+                return
+            if func.attempt + 1 >= self._max_attempts:
+                metrics.dropped += 1
+                logging.error("Live: request to %s dropped", func.url)
+                return
+            func.attempt += 1
+            func.retry_time = time.time() + self._get_delay(func.attempt)
+            metrics.retried += 1
+            self._pending[key] = func
+
+    def _load_journal(self) -> None:
+        if not self._journal_path or not os.path.exists(self._journal_path):
+            return
+        try:
+            with open(self._journal_path, "rb") as f:
+                data = orjson.loads(f.read())
+            for item in data:
+                request = LiveRequest.from_dict(item)
+                self._pending[request.key] = request
+            if data:
+                logging.info("Live: %s requests restored", len(data))
+        except Exception as e:
+            logging.error("Live journal is broken: %s", str(e))
+
+    def _save_journal(self) -> None:
+        with self._lock:
+            if not self._journal_path or not self._journal_changed:
+                return
+            self._journal_changed = False
+            requests = [
+                func.to_dict()
+                for func in [*self._active.values(), *self._pending.values()]
+                if isinstance(func, LiveRequest)
+            ]
+        try:
+            os.makedirs(os.path.dirname(self._journal_path), exist_ok=True)
+            tmp_path = self._journal_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(requests))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._journal_path)
+        except OSError as e:
+            logging.error("Live journal is not saved: %s", str(e))
+
     def run(self) -> None:
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        session = loop.run_until_complete(create_session(LIVE_TIMEOUT))
+        session = loop.run_until_complete(
+            create_session(LIVE_TIMEOUT, self._connections)
+        )
         while not self._stop_event.is_set():
             try:
-                funcs = []
-                while True:
-                    try:
-                        funcs.append(self._queue.get_nowait())
-                        self._queue.task_done()
-                    except Empty:
-                        break
+                self._save_journal()
+                funcs = self._get_pending()
                 if funcs:
                     loop.run_until_complete(
                         asyncio.gather(
-                            *[func(session=session) for func in funcs],
+                            *[
+                                self._send(session, key, func)
+                                for key, func in funcs.items()
+                            ],
                             return_exceptions=True,
                         )
                     )
+                    self._save_journal()
                 else:
                     self._stop_event.wait(self._delay)
             except Exception as e:
                 logging.error("Error: %s", str(e))
+        loop.run_until_complete(session.close())
+        self._save_journal()
+
+
+def get_race_data(data: List[Any]) -> Dict[str, Any]:
+    """Part of the race dict: sent objects, their persons, results,
+    groups and organizations"""
+    obj = race()
+    persons: Dict[str, Person] = {}
+    results: Dict[str, Result] = {}
+    groups: Dict[str, Group] = {}
+    organizations: Dict[str, Organization] = {}
+
+    def add_person(person: Optional[Person]) -> None:
+        if person:
+            persons[str(person.id)] = person
+
+    for item in data:
+        if isinstance(item, dict):
+            name = item["object"]
+            found = obj.get_obj(name, item["id"]) if name in obj.list_obj else None
+            if found is None:
+                # objects created in the GUI are not in the uuid index
+                found = find(obj.list_obj.get(name, []), id=UUID(item["id"]))
+            item = found
+        if isinstance(item, Person):
+            add_person(item)
+        elif isinstance(item, Result):
+            results[str(item.id)] = item
+            add_person(item.person)
+        elif isinstance(item, Group):
+            groups[str(item.id)] = item
+            for person in obj.get_persons_by_group(item) or []:
+                add_person(person)
+        elif isinstance(item, Organization):
+            organizations[str(item.id)] = item
+            for person in obj.get_persons_by_organization(item):
+                add_person(person)
+
+    for person in persons.values():
+        result = obj.find_person_result(person)
+        if result:
+            results.setdefault(str(result.id), result)
+        if person.group:
+            groups.setdefault(str(person.group.id), person.group)
+        if person.organization:
+            organizations.setdefault(str(person.organization.id), person.organization)
+
+    return {
+        "object": obj.__class__.__name__,
+        "id": str(obj.id),
+        "data": obj.data.to_dict(),
+        "settings": obj.settings.copy(),
+        "organizations": [item.to_dict() for item in organizations.values()],
+        "groups": [item.to_dict() for item in groups.values()],
+        "results": [item.to_dict() for item in results.values()],
+        "persons": [item.to_dict() for item in persons.values()],
+        "group_count": len(obj.groups),
+    }
+
+
+def get_ids(items: List[Dict[str, Any]]) -> Tuple[str, ...]:
+    """Ids of persons (or other objects) of items"""
+    ret = set()
+    for item in items:
+        if item["object"] in orgeo.RESULT_OBJECTS and item.get("person_id"):
+            ret.add(item["person_id"])
+        elif item["object"] == "Person":
+            ret.add(item["id"])
+        else:
+            ret.add("{} {}".format(item["object"], item["id"]))
+    return tuple(sorted(ret))
 
 
 class LiveClient:
     def __init__(self):
-        self._thread = LiveThread()
+        self._thread = LiveThread(journal_path=LIVE_JOURNAL)
 
     def init(self):
         self._thread.start()
@@ -91,21 +369,16 @@ class LiveClient:
                 items.append(item.to_dict())
 
         urls = self.get_urls()
-        race_data = race().to_dict()
+        race_data = get_race_data(data)
+        ids = get_ids(items)
         for url in urls:
             if race().get_setting("live_results_enabled", False):
-                func = partial(orgeo.create, url, items, race_data, logging.root)
-                self._thread.send(func)
+                self._thread.send(LiveRequest("create", url, items, race_data, ids))
 
             if race().get_setting("live_cp_enabled", False):
-                func = partial(
-                    orgeo.create_online_cp,
-                    url,
-                    items,
-                    race_data,
-                    logging.root,
+                self._thread.send(
+                    LiveRequest("create_online_cp", url, items, race_data, ids)
                 )
-                self._thread.send(func)
 
     def delete(self, data):
         if not self.is_enabled():
@@ -119,10 +392,13 @@ class LiveClient:
                 items.append(item.to_dict())
 
         urls = self.get_urls()
-        race_data = race().to_dict()
+        race_data = get_race_data(data)
+        ids = get_ids(items)
         for url in urls:
-            func = partial(orgeo.delete, url, items, race_data, logging.root)
-            self._thread.send(func)
+            self._thread.send(LiveRequest("delete", url, items, race_data, ids))
+
+    def get_metrics(self) -> LiveMetrics:
+        return self._thread.get_metrics()
 
 
 live_client = LiveClient()
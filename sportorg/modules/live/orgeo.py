@@ -1,13 +1,18 @@
+import asyncio
 import gzip
 import json
 from re import subn
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
+
+import aiohttp
 
 from sportorg import config, settings
 from sportorg.common.otime import OTime
 from sportorg.utils.time import int_to_otime, time_to_hhmmss
 
 LOG_MSG = "HTTP Status: %s, Msg: %s"
+# requests failed with these errors are repeated
+RETRY_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, OSError)
 
 RESULT_STATUS = [
     "NONE",
@@ -65,45 +70,78 @@ class Orgeo:
         return await self.session.get(url, headers=self._headers)
 
 
-def _get_obj(data, race_data, key, key_id):
+RESULT_OBJECTS = [
+    "Result",
+    "ResultSportident",
+    "ResultSportiduino",
+    "ResultSFR",
+    "ResultManual",
+    "ResultRfidImpinj",
+    "ResultSrpid",
+]
+
+
+def _get_index(race_data):
+    """Objects of race_data by id, built once per request"""
+    index = {
+        key: {obj["id"]: obj for obj in race_data[key]}
+        for key in ("groups", "organizations", "persons")
+    }
+    results = {}
+    results_by_person = {}
+    for obj in race_data["results"]:
+        if obj["id"]:
+            results.setdefault(obj["id"], obj)
+        if obj["person_id"]:
+            results_by_person.setdefault(obj["person_id"], obj)
+    index["results"] = results
+    index["results_by_person"] = results_by_person
+
+    persons_by_group = {}
+    persons_by_organization = {}
+    for obj in race_data["persons"]:
+        if obj["group_id"]:
+            persons_by_group.setdefault(obj["group_id"], []).append(obj)
+        if obj["organization_id"]:
+            persons_by_organization.setdefault(obj["organization_id"], []).append(obj)
+    index["persons_by_group"] = persons_by_group
+    index["persons_by_organization"] = persons_by_organization
+    return index
+
+
+def _get_obj(data, index, key, key_id):
     if key_id not in data or not data[key_id]:
         return
-    for obj in race_data[key]:
-        if data[key_id] == obj["id"]:
-            return obj
+    return index[key].get(data[key_id])
 
 
-def _get_group(data, race_data):
-    return _get_obj(data, race_data, "groups", "group_id")
+def _get_group(data, index):
+    return _get_obj(data, index, "groups", "group_id")
 
 
-def _get_organization(data, race_data):
-    return _get_obj(data, race_data, "organizations", "organization_id")
+def _get_organization(data, index):
+    return _get_obj(data, index, "organizations", "organization_id")
 
 
-def _get_person(data, race_data):
-    return _get_obj(data, race_data, "persons", "person_id")
+def _get_person(data, index):
+    return _get_obj(data, index, "persons", "person_id")
 
 
-def _get_result_by_person(data, race_data):
-    for obj in race_data["results"]:
-        if obj["person_id"] and data["id"] == obj["person_id"]:
-            return obj
+def _get_result_by_person(data, index):
+    return index["results_by_person"].get(data["id"])
 
 
-def _get_result_by_id(data, race_data):
-    for obj in race_data["results"]:
-        if obj["id"] and data["id"] == obj["id"]:
-            return obj
+def _get_result_by_id(data, index):
+    return index["results"].get(data["id"])
 
 
-def _get_person_obj(data, race_data, result=None):
+def _get_person_obj(data, race_data, index, result=None):
     organization = "-"
-    org = _get_organization(data, race_data)
+    org = _get_organization(data, index)
     if org:
         organization = org["name"]
     group_name = "-"
-    group = _get_group(data, race_data)
+    group = _get_group(data, index)
     if group:
         group_name = group["name"]
     obj = {
@@ -204,6 +242,11 @@ def _get_person_obj(data, race_data, result=None):
     return obj
 
 
+def is_sent(status: int) -> bool:
+    """False if the request should be repeated later"""
+    return status < 500 and status != 429
+
+
 def make_nice(s):
     """
     Converts unicode point string to urf8
@@ -220,42 +263,36 @@ async def create(url, data, race_data, log, *, session):
     """
     data is Dict: Person, Result, Group, Course, Organization
     race_data is Dict: Race
+    returns False if it should be sent again
     """
     o = Orgeo(session, url, compression=settings.SETTINGS.live_gzip_enabled)
+    index = _get_index(race_data)
     is_start = False
     group_i = 0
     persons = []
     for item in data:
         if item["object"] == "Person":
-            result_data = _get_result_by_person(item, race_data)
-            persons.append(_get_person_obj(item, race_data, result_data))
+            result_data = _get_result_by_person(item, index)
+            persons.append(_get_person_obj(item, race_data, index, result_data))
         if item["object"] == "Group":
             group_i += 1
-            for person_data in race_data["persons"]:
-                if person_data["group_id"] and person_data["group_id"] == item["id"]:
-                    result_data = _get_result_by_person(person_data, race_data)
-                    persons.append(_get_person_obj(person_data, race_data, result_data))
+            for person_data in index["persons_by_group"].get(item["id"], []):
+                result_data = _get_result_by_person(person_data, index)
+                persons.append(
+                    _get_person_obj(person_data, race_data, index, result_data)
+                )
         if item["object"] == "Organization":
-            for person_data in race_data["persons"]:
-                if (
-                    person_data["organization_id"]
-                    and person_data["organization_id"] == item["id"]
-                ):
-                    result_data = _get_result_by_person(person_data, race_data)
-                    persons.append(_get_person_obj(person_data, race_data, result_data))
-        elif item["object"] in [
-            "Result",
-            "ResultSportident",
-            "ResultSportiduino",
-            "ResultSFR",
-            "ResultManual",
-            "ResultRfidImpinj",
-            "ResultSrpid",
-        ]:
-            person_data = _get_person(item, race_data)
+            for person_data in index["persons_by_organization"].get(item["id"], []):
+                result_data = _get_result_by_person(person_data, index)
+                persons.append(
+                    _get_person_obj(person_data, race_data, index, result_data)
+                )
+        elif item["object"] in RESULT_OBJECTS:
+            person_data = _get_person(item, index)
             if person_data:
-                persons.append(_get_person_obj(person_data, race_data, item))
-    if group_i == len(race_data["groups"]):
+                persons.append(_get_person_obj(person_data, race_data, index, item))
+    # race_data may contain only the groups of sent objects
+    if group_i == race_data.get("group_count", len(race_data["groups"])):
         is_start = True
     if persons:
         obj_for_send: Dict[str, Any] = {"persons": persons}
@@ -269,116 +306,115 @@ async def create(url, data, race_data, log, *, session):
                 log.error(LOG_MSG, resp.status, result_txt)
             else:
                 log.info(LOG_MSG, resp.status, result_txt)
+            return is_sent(resp.status)
 
+        except RETRY_ERRORS as e:
+            log.error("Error: %s", str(e))
+            return False
         except Exception as e:
+            # broken data, repeating does not help
             log.exception(e)
-
-
-async def create_online_cp(url, data, race_data, log, *, session):
+    return True
+
+
+def _get_card_number(res, index) -> int:
+    card_number = res["card_number"]
+    if card_number == 0 and "person_id" in res:
+        person = _get_person(res, index)
+        if person:
+            card_number = person["card_number"]
+    return card_number
+
+
+def _get_online_punches(res, race_data, index) -> List[Tuple[int, str, str]]:
+    """Card number, code and time of every punch to send"""
+    ret: List[Tuple[int, str, str]] = []
+    race_settings = race_data["settings"]
+    card_number = _get_card_number(res, index)
+    if card_number <= 0:
+        return ret
+
+    if race_settings.get("live_cp_finish_enabled", True):
+        # send finish time as cp with specified code
+        code = race_settings.get("live_cp_code", "10")
+        finish_time = str(OTime.now())
+        if res["finish_time"] is not None:
+            finish_time = int_to_otime(res["finish_time"] // 10).to_str()
+        ret.append((card_number, code, finish_time))
+
+    if race_settings.get("live_cp_splits_enabled", True):
+        # send split as cp, codes of cp to send are set by the list
+        codes = race_settings.get("live_cp_split_codes", "91,91,92").split(",")
+        for split in res["splits"]:
+            if split["code"] in codes:
+                split_time = int_to_otime(split["time"] // 10).to_str()
+                ret.append((card_number, split["code"], split_time))
+    return ret
+
+
+async def create_online_cp(url, data, race_data, log, *, session, sent=None):
     """
     data is Dict: Results
     race_data is Dict: Race
+    sent is List of punches accepted by the server, they are not sent again
     """
 
     if not race_data["settings"].get("live_cp_enabled", False):
-        return
+        return True
 
+    if sent is None:
+        sent = []
+    ret = True
     o = Orgeo(session, url, compression=settings.SETTINGS.live_gzip_enabled)
+    index = _get_index(race_data)
 
     for item in data:
-        if item["object"] in [
-            "Result",
-            "ResultSportident",
-            "ResultSportiduino",
-            "ResultSFR",
-            "ResultManual",
-            "ResultRfidImpinj",
-            "ResultSrpid",
-        ]:
+        if item["object"] not in RESULT_OBJECTS:
+            continue
+        res = _get_result_by_id(item, index)
+        if not res:
+            continue
+        try:
+            punches = _get_online_punches(res, race_data, index)
+        except Exception as e:
+            # broken data, repeating does not help
+            log.exception(e)
+            continue
+        if not punches:
+            log.info(LOG_MSG, 401, "Ignoring empty card number")
+        for card_number, code, punch_time in punches:
+            key = "{} {} {}".format(card_number, code, punch_time)
+            if key in sent:
+                continue
             try:
-                res = _get_result_by_id(item, race_data)
-
-                if res and race_data["settings"].get("live_cp_finish_enabled", True):
-                    # send finish time as cp with specified code
-
-                    card_number = res["card_number"]
-                    if card_number == 0 and "person_id" in res:
-                        person = _get_person(res, race_data)
-                        if person:
-                            card_number = person["card_number"]
-
-                    if card_number > 0:
-                        code = race_data["settings"].get("live_cp_code", "10")
-                        finish_time = OTime.now()
-                        if res["finish_time"] is not None:
-                            finish_time = int_to_otime(
-                                res["finish_time"] // 10
-                            ).to_str()
-                        resp = await o.send_online_cp(card_number, code, finish_time)
-                        log.info(
-                            "card=%s code=%s finish=%s",
-                            str(card_number),
-                            str(code),
-                            str(finish_time),
-                        )
-                        result_txt = make_nice(str(await resp.text()))
-
-                        if resp.status != 200:
-                            log.error(LOG_MSG, resp.status, result_txt)
-                        else:
-                            log.info(LOG_MSG, resp.status, result_txt)
-                    else:
-                        log.info(LOG_MSG, 401, "Ignoring empty card number")
-
-                if res and race_data["settings"].get("live_cp_splits_enabled", True):
-                    # send split as cp, codes of cp to send are set by the list
-
-                    card_number = res["card_number"]
-                    if card_number == 0 and "person_id" in res:
-                        person = _get_person(res, race_data)
-                        if person:
-                            card_number = person["card_number"]
-
-                    if card_number > 0:
-                        codes = (
-                            race_data["settings"]
-                            .get("live_cp_split_codes", "91,91,92")
-                            .split(",")
-                        )
-                        for split in res["splits"]:
-                            if split["code"] in codes:
-                                split_time = int_to_otime(split["time"] // 10).to_str()
-                                resp = await o.send_online_cp(
-                                    card_number, split["code"], split_time
-                                )
-                                result_txt = make_nice(str(await resp.text()))
-                                if resp.status != 200:
-                                    log.error(LOG_MSG, resp.status, result_txt)
-                                else:
-                                    log.info(LOG_MSG, resp.status, result_txt)
-                    else:
-                        log.info(LOG_MSG, 401, "Ignoring empty card number")
-
-            except Exception as e:
-                log.exception(e)
+                resp = await o.send_online_cp(card_number, code, punch_time)
+                result_txt = make_nice(str(await resp.text()))
+            except RETRY_ERRORS as e:
+                log.error("Error: %s", str(e))
+                # the server is not available, the rest is sent on retry
+                return False
+            log.info("card=%s code=%s time=%s", card_number, code, punch_time)
+            if resp.status != 200:
+                log.error(LOG_MSG, resp.status, result_txt)
+            else:
+                log.info(LOG_MSG, resp.status, result_txt)
+            if is_sent(resp.status):
+                sent.append(key)
+            else:
+                ret = False
+
+    return ret
 
 
 async def delete(url, data, race_data, log, *, session):
     o = Orgeo(session, url, compression=settings.SETTINGS.live_gzip_enabled)
+    index = _get_index(race_data)
     persons = []
     for item in data:
         if item["object"] == "Person":
             persons.append({"ref_id": item["id"]})
-        elif item["object"] in [
-            "Result",
-            "ResultSportident",
-            "ResultSportiduino",
-            "ResultSFR",
-            "ResultManual",
-            "ResultRfidImpinj",
-            "ResultSrpid",
-        ]:
-            person_data = _get_person(item, race_data)
+        elif item["object"] in RESULT_OBJECTS:
+            person_data = _get_person(item, index)
             if person_data:
                 persons.append({"ref_id": person_data["id"]})
     try:
@@ -389,6 +425,12 @@ async def delete(url, data, race_data, log, *, session):
                 log.error(LOG_MSG, resp.status, result_txt)
             else:
                 log.info(LOG_MSG, resp.status, result_txt)
+            return is_sent(resp.status)
 
-    except Exception as e:
+    except RETRY_ERRORS as e:
         log.error("Error: %s", str(e))
+        return False
+    except Exception as e:
+        # broken data, repeating does not help
+        log.exception(e)
+    return True
@@ -6,7 +6,7 @@ from sportorg.common.template import get_text_from_file
 from sportorg.language import translate
 from sportorg.models.memory import Course, Group, Organization, Result, race
 from sportorg.models.result.split_calculation import GroupSplits
-from sportorg.modules.printing.printing import print_html
+from sportorg.modules.printing.printing import close_split_printer, print_html
 from sportorg.modules.printing.printout_split import SportorgPrinter
 
 
@@ -86,12 +86,14 @@ def split_printout(results: List[Result]):
                 course=course.to_dict(),
                 organization=organization.to_dict(),
                 items=group_splits.to_dict(),
+                legs=group_splits.legs.to_dict(),
             )
-            print_html(printer, template, **margins)
+            # a reprint replaces the queued printout of the result
+            print_html(printer, template, key=str(result.id), **margins)
 
     if isDirectMode:
         pr.end_doc()
 
 
 def split_printout_close():
-    print_html("NO_PRINTER", "CLOSE_SPLIT_PRN")
+    close_split_printer()
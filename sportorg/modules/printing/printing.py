@@ -1,7 +1,10 @@
 import logging
+import multiprocessing
 import sys
 import time
-from multiprocessing import Process, Queue
+from dataclasses import dataclass
+from queue import Empty
+from typing import Any, Dict, List, Optional, Tuple
 
 qt_version = 5
 try:
@@ -18,137 +21,241 @@ except ModuleNotFoundError:
     from PySide2.QtWidgets import QApplication
 
 from sportorg.common.fake_std import FakeStd
-from sportorg.gui.global_access import GlobalAccess
-
-
-class PrintProcess(Process):
-    def __init__(
-        self, queue, printer_name, html, left=5.0, top=5.0, right=5.0, bottom=5.0
-    ):
-        super().__init__()
-        self.printer_name = printer_name
-        self.html = html
-        self.margin_left = left
-        self.margin_top = top
-        self.margin_right = right
-        self.margin_bottom = bottom
-        self.queue = queue
-
-    def set_app_printer(self, app, printer):
-        self.app = app
-        self.printer_name = printer
-        self.mw.set_split_printer_app(app)
-        self.mw.set_split_printer(printer)
+
+# a forked child would share Qt state of the GUI
+_context = multiprocessing.get_context("spawn")
+
+# without a pause between jobs virtual printers (e.g. Adobe PDF) lose
+# the next split, the next document is rendered during the pause
+PRINT_DELAY = 0.25
+
+
+@dataclass
+class PrintJob:
+    html: str
+    printer_name: str = ""
+    left: float = 5.0
+    top: float = 5.0
+    right: float = 5.0
+    bottom: float = 5.0
+    # a job with the same key waiting in the queue is replaced, e.g. a reprint
+    key: Optional[str] = None
+    # print to PDF, for tests and printing to a file
+    output_file: str = ""
+
+    @property
+    def printer_options(self) -> Tuple[Any, ...]:
+        return (
+            self.printer_name,
+            self.left,
+            self.top,
+            self.right,
+            self.bottom,
+            self.output_file,
+        )
+
+
+@dataclass
+class PrintStatus:
+    """Result of a job: done, failed or replaced by a newer job"""
+
+    key: Optional[str]
+    state: str
+    error: str = ""
+
+
+def coalesce_jobs(jobs: List[PrintJob]) -> Tuple[List[PrintJob], List[PrintJob]]:
+    """Jobs to print and replaced jobs, the last job of a key takes the place
+    of the first one"""
+    ret: List[PrintJob] = []
+    positions: Dict[str, int] = {}
+    replaced = []
+    for job in jobs:
+        if job.key is not None and job.key in positions:
+            replaced.append(ret[positions[job.key]])
+            ret[positions[job.key]] = job
+            continue
+        if job.key is not None:
+            positions[job.key] = len(ret)
+        ret.append(job)
+    return ret, replaced
+
+
+class PrintProcess(_context.Process):
+    """Long-lived print worker with its own QApplication
+
+    Jobs queued while a split is printed are taken as one batch, reprints
+    are coalesced, the printer is set up again only when the options change.
+    """
+
+    def __init__(self, jobs, statuses, delay: float = PRINT_DELAY):
+        super().__init__(name="PrintProcess", daemon=True)
+        self.jobs = jobs
+        self.statuses = statuses
+        self.delay = delay
+        self._printer: Optional[QPrinter] = None
+        self._printer_options: Optional[Tuple[Any, ...]] = None
+        self._last_print = 0.0
 
     def run(self):
-        t = time.process_time()
         try:
             sys.stdout = FakeStd()
             sys.stderr = FakeStd()
-            logging.debug("print_html: RUN")
             app = QApplication.instance()
             if app is None:
                 app = QApplication(["--platform", "minimal"])
-                # we need this call to correctly render images...
+            # we need this call to correctly render images...
             app.processEvents()
+            while True:
+                batch = self._get_batch()
+                is_closed = None in batch
+                jobs, replaced = coalesce_jobs([job for job in batch if job])
+                for job in replaced:
+                    self.statuses.put(PrintStatus(job.key, "replaced"))
+                for job in jobs:
+                    self._print(job)
+                if is_closed:
+                    logging.debug("print_html: printing process termination")
+                    app.quit()
+                    break
+        except Exception as e:
+            logging.exception(e)
 
-            logging.debug(
-                "print_html: App instance is ready done: {}".format(
-                    time.process_time() - t
-                )
-            )
-
-            printer = QPrinter()
-            if self.printer_name:
-                printer.setPrinterName(self.printer_name)
-
-            logging.debug(
-                "print_html: got Printer done: {}".format(time.process_time() - t)
-            )
-
-            # printer.setResolution(96)
+    def _get_batch(self) -> List[Optional[PrintJob]]:
+        batch = [self.jobs.get()]
+        while True:
+            try:
+                batch.append(self.jobs.get_nowait())
+            except Empty:
+                return batch
 
+    def _print(self, job: PrintJob) -> None:
+        t = time.monotonic()
+        try:
+            printer = self._get_printer(job)
             text_document = QTextDocument()
-
-            printer.setFullPage(True)
-            if qt_version == 5:
-                printer.setPageMargins(
-                    self.margin_left,
-                    self.margin_top,
-                    self.margin_right,
-                    self.margin_bottom,
-                    QPrinter.Unit.Millimeter,
-                )
-            else:
-                printer.setPageMargins(
-                    QMarginsF(
-                        self.margin_left,
-                        self.margin_top,
-                        self.margin_right,
-                        self.margin_bottom,
-                    ),
-                    QPageLayout.Unit.Millimeter,
-                )
-
             page_size = QSizeF()
             page_size.setHeight(printer.height())
             page_size.setWidth(printer.width())
             text_document.setPageSize(page_size)
             text_document.setDocumentMargin(0.0)
+            text_document.setHtml(job.html)
 
-            while True:
-                t = time.process_time()
-                html = self.queue.get()
-                if html == "CLOSE_SPLIT_PRN":
-                    app.quit()
-                    logging.debug(
-                        "print_html: printing thread termination: {}".format(
-                            time.process_time() - t
-                        )
-                    )
-                    break
+            pause = self._last_print + self.delay - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            text_document.print_(printer)
+            self._last_print = time.monotonic()
+        except Exception as e:
+            logging.exception(e)
+            self.statuses.put(PrintStatus(job.key, "failed", str(e)))
+            return
+        logging.debug("print_html: job printed in {:.3f}".format(time.monotonic() - t))
+        self.statuses.put(PrintStatus(job.key, "done"))
 
-                logging.debug(
-                    "print_html: New task received: {}".format(time.process_time() - t)
-                )
+    def _get_printer(self, job: PrintJob) -> QPrinter:
+        if self._printer is not None and self._printer_options == job.printer_options:
+            return self._printer
+        printer = QPrinter()
+        if job.output_file:
+            printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
+            printer.setOutputFileName(job.output_file)
+        elif job.printer_name:
+            printer.setPrinterName(job.printer_name)
 
-                text_document.setHtml(html)
+        # printer.setResolution(96)
 
-                logging.debug(
-                    "print_html: text_document setHtml: {}".format(
-                        time.process_time() - t
-                    )
-                )
+        printer.setFullPage(True)
+        if qt_version == 5:
+            printer.setPageMargins(
+                job.left, job.top, job.right, job.bottom, QPrinter.Unit.Millimeter
+            )
+        else:
+            printer.setPageMargins(
+                QMarginsF(job.left, job.top, job.right, job.bottom),
+                QPageLayout.Unit.Millimeter,
+            )
+        self._printer = printer
+        self._printer_options = job.printer_options
+        return printer
 
-                text_document.print_(printer)
 
-                # without this timeout virtual printer (e.g. Adobe PDF) doesn't print task, having more than 1 split
-                time.sleep(0.25)
+class SplitPrinter:
+    """Print worker of the application, started with the first job"""
 
-                logging.debug(
-                    "print_html: text_document printing done: {}".format(
-                        time.process_time() - t
-                    )
-                )
-        except Exception as e:
-            logging.exception(e)
+    def __init__(self, delay: float = PRINT_DELAY):
+        self._jobs = _context.Queue()
+        self._statuses = _context.Queue()
+        self._delay = delay
+        self._process: Optional[PrintProcess] = None
+        self._pending = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs that are not printed yet"""
+        return self._pending
+
+    def put(self, job: PrintJob) -> None:
+        if self._process is None:
+            self._process = PrintProcess(self._jobs, self._statuses, self._delay)
+            self._process.start()
+            logging.info("print_html: Process initialized and started")
+        self._jobs.put(job)
+        self._pending += 1
+
+    def get_statuses(self) -> List[PrintStatus]:
+        ret = []
+        while True:
+            try:
+                ret.append(self._statuses.get_nowait())
+            except Empty:
+                break
+        self._pending -= len(ret)
+        return ret
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        if self._process is not None:
+            self._jobs.put(None)
+            self._process.join(timeout)
+            self._process = None
+        self._jobs.close()
+        self._statuses.close()
+
+
+_split_printer: Optional[SplitPrinter] = None
+
+
+def get_split_printer() -> SplitPrinter:
+    global _split_printer
+    if _split_printer is None:
+        _split_printer = SplitPrinter()
+    return _split_printer
 
 
 def print_html(
-    printer_name, html, left=5.0, top=5.0, right=5.0, bottom=5.0, scale=100.0
+    printer_name,
+    html,
+    left=5.0,
+    top=5.0,
+    right=5.0,
+    bottom=5.0,
+    scale=100.0,
+    key: Optional[str] = None,
 ):
-    logging.info("print_html: Starting printing process")
-    thread = GlobalAccess().get_main_window().get_split_printer_thread()
-    queue = GlobalAccess().get_main_window().get_split_printer_queue()
-    if not queue:
-        queue = Queue()
-        GlobalAccess().get_main_window().set_split_printer_queue(queue)
-        logging.info("print_html:  Queue created")
-    if not thread:
-        thread = PrintProcess(queue, printer_name, html, left, top, right, bottom)
-        thread.start()
-        GlobalAccess().get_main_window().set_split_printer_thread(thread)
-        logging.info("print_html:  Process initialized and started")
-
-    queue.put(html)
+    get_split_printer().put(
+        PrintJob(html, printer_name, left, top, right, bottom, key=key)
+    )
     logging.info("print_html: Task has been put to queue")
+
+
+def get_print_statuses() -> List[PrintStatus]:
+    if _split_printer is None:
+        return []
+    return _split_printer.get_statuses()
+
+
+def close_split_printer() -> None:
+    global _split_printer
+    if _split_printer is not None:
+        _split_printer.close(timeout=5)
+        _split_printer = None
@@ -1,7 +1,10 @@
 """
 Parse backup SI log generated in C:\\Program Files (x86)\\SportOrg\\log
 
--- Format:
+Readout journal si{date}.jsonl, see sportorg.modules.sportident.backup,
+or SI log si{date}.log of older versions.
+
+-- SI log format:
 
 start
 [SI_CARD]
@@ -29,8 +32,11 @@ end
 
 """
 
+from typing import Any, Dict
+
 from sportorg.common.otime import OTime
 from sportorg.models.memory import Race, ResultSportident, Split
+from sportorg.modules.sportident.backup import is_journal, read_journal
 from sportorg.modules.sportident.fix_time_sicard_5 import fix_time
 from sportorg.utils.time import hhmmss_to_time
 
@@ -41,6 +47,13 @@ def recovery(file_name: str, race: Race) -> None:
         hour=zero_time_val[0], minute=zero_time_val[1], sec=zero_time_val[2]
     )
 
+    if is_journal(file_name):
+        for record in read_journal(file_name):
+            cur_res = _get_result(record)
+            fix_time(cur_res, zero_time)
+            race.results.append(cur_res)
+        return
+
     cur_res = ResultSportident()
     read_num = False
     read_start = False
@@ -76,3 +89,17 @@ def recovery(file_name: str, race: Race) -> None:
                 spl.code = line.split(" ")[0]
                 spl.time = hhmmss_to_time(line.split(" ")[1])
                 cur_res.splits.append(spl)
+
+
+def _get_result(record: Dict[str, Any]) -> ResultSportident:
+    result = ResultSportident()
+    result.card_number = int(record["card_number"])
+    result.start_time = OTime(msec=record["start"] or 0)
+    result.finish_time = OTime(msec=record["finish"] or 0)
+    for code, msec in record["punches"]:
+        if msec is not None:
+            spl = Split()
+            spl.code = code
+            spl.time = OTime(msec=msec)
+            result.splits.append(spl)
+    return result
@@ -24,6 +24,7 @@ from sportorg.common.otime import OTime
 from sportorg.common.singleton import singleton
 from sportorg.models import memory
 from sportorg.models.memory import race
+from sportorg.modules.sportident import backup
 
 
 class ImpinjCommand:
@@ -176,6 +177,13 @@ class ResultThread(QThread):
                 if cmd.command == "card_data":
                     result = self._get_result(cmd.data)
                     self.data_sender.emit(result)
+                    backup.backup_data(
+                        {
+                            "card_number": result.card_number,
+                            "finish": result.finish_time,
+                            "punches": [],
+                        }
+                    )
 
             except Empty:
                 if not main_thread().is_alive() or self._stop_event.is_set():
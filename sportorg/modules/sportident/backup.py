@@ -1,44 +1,185 @@
+"""
+Readout journal, every card read by SPORTident, SFR, Sportiduino, SRPid and
+Impinj readers is appended to si{date}.jsonl in the log directory.
+
+-- Format, one record per line:
+
+[CRC32 of JSON, 8 hex digits] [JSON]
+
+JSON has card_number, start, finish, punches and created_at, times are
+milliseconds from midnight, null if not exist.
+
+-- Example:
+
+8be488d3 {"card_number":8013787,"start":null,"finish":41965000,"punches":[["57",42185000],["69",41879000]],"created_at":1760771965.1}
+
+One thread writes the records of all readers. Records put while the
+previous batch is written are written and synced to disk together. A record
+broken by power loss fails the checksum and is skipped by read_journal.
+"""
+
 import logging
-import sys
+import os
+import re
+import time
+import zlib
 from datetime import datetime
-from multiprocessing import Process
+from queue import Empty, Queue
+from threading import Lock, Thread
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
 
 from sportorg import config
-from sportorg.common.fake_std import FakeStd
-from sportorg.utils.time import time_to_hhmmss
-
-
-class BackupProcess(Process):
-    def __init__(self, text):
-        super().__init__()
-        self.data = text
-
-    def run(self):
-        try:
-            sys.stdout = FakeStd()
-            sys.stderr = FakeStd()
-            with open(
-                config.log_dir("si{}.log".format(datetime.now().strftime("%Y%m%d"))),
-                "a",
-            ) as f:
-                f.write(self.data)
-        except Exception as e:
-            logging.error(str(e))
-
-
-def backup_data(card_data):
-    text = "start\n{}\n{}\n{}\n".format(
-        card_data["card_number"],
-        time_to_hhmmss(card_data["start"]) if "start" in card_data else "",
-        time_to_hhmmss(card_data["finish"]) if "finish" in card_data else "",
+from sportorg.utils.time import time_to_otime
+
+logger = logging.getLogger(__name__)
+
+_record_re = re.compile(rb"^[0-9a-f]{8} \{")
+
+
+def get_journal_file_name() -> str:
+    return config.log_dir("si{}.jsonl".format(datetime.now().strftime("%Y%m%d")))
+
+
+def _to_msec(value) -> Optional[int]:
+    if value is None:
+        return None
+    return time_to_otime(value).to_msec()
+
+
+def encode_record(card_data: Dict[str, Any]) -> bytes:
+    data = orjson.dumps(
+        {
+            # SFR has no card id, only bib
+            "card_number": int(
+                card_data.get("card_number") or card_data.get("bib") or 0
+            ),
+            "start": _to_msec(card_data.get("start")),
+            "finish": _to_msec(card_data.get("finish")),
+            "punches": [
+                [str(code), _to_msec(t)] for code, t in card_data.get("punches", [])
+            ],
+            "created_at": time.time(),
+        }
     )
-    text += "split_start\n"
-    for i in range(len(card_data["punches"])):
-        text += "{} {}\n".format(
-            card_data["punches"][i][0], time_to_hhmmss(card_data["punches"][i][1])
-        )
+    return b"%08x %s\n" % (zlib.crc32(data), data)
+
+
+def read_journal(file_name: str) -> Iterator[Dict[str, Any]]:
+    """Records of the journal in the order they were read, broken are skipped"""
+    with open(file_name, "rb") as f:
+        for line_number, line in enumerate(f, 1):
+            crc, _, data = line.rstrip(b"\r\n").partition(b" ")
+            try:
+                if int(crc, 16) != zlib.crc32(data):
+                    raise ValueError("checksum mismatch")
+                yield orjson.loads(data)
+            except ValueError as e:
+                logger.warning(
+                    "Broken record in {}, line {}: {}".format(
+                        file_name, line_number, str(e)
+                    )
+                )
+
+
+def is_journal(file_name: str) -> bool:
+    with open(file_name, "rb") as f:
+        return bool(_record_re.match(f.readline()))
+
+
+class JournalThread(Thread):
+    """Appends records to the journal, one fsync for a batch of records"""
+
+    def __init__(self):
+        super().__init__(name="JournalThread", daemon=True)
+        self._queue: Queue = Queue()
+        self._file: Optional[IO[bytes]] = None
+        self._file_name = ""
+
+    def put(self, file_name: str, record: bytes) -> None:
+        self._queue.put((file_name, record))
+
+    def wait(self) -> None:
+        """Wait until the records are on disk"""
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self.join()
+
+    def run(self) -> None:
+        while True:
+            batch = self._get_batch()
+            try:
+                self._write([item for item in batch if item is not None])
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                self._close_file()
+                return
+
+    def _get_batch(self) -> List[Optional[Tuple[str, bytes]]]:
+        batch = [self._queue.get()]
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                return batch
+
+    def _write(self, records: List[Tuple[str, bytes]]) -> None:
+        for file_name, record in records:
+            if file_name != self._file_name:
+                # the next day
+                self._close_file()
+                self._file = open(file_name, "ab")
+                self._file_name = file_name
+            self._file.write(record)
+        self._sync()
+
+    def _sync(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+            self._file_name = ""
+
+
+_journal_thread: Optional[JournalThread] = None
+# readers put records from their threads
+_journal_lock = Lock()
+
+
+def _get_journal_thread() -> JournalThread:
+    global _journal_thread
+    with _journal_lock:
+        if _journal_thread is None:
+            _journal_thread = JournalThread()
+            _journal_thread.start()
+        return _journal_thread
+
+
+def backup_data(card_data: Dict[str, Any]) -> None:
+    _get_journal_thread().put(get_journal_file_name(), encode_record(card_data))
+
+
+def wait_for_journal() -> None:
+    if _journal_thread is not None:
+        _journal_thread.wait()
 
-    text += "split_end\n"
-    text += "end\n"
 
-    BackupProcess(text).start()
+def close_journal() -> None:
+    """Write the pending records and close the file"""
+    global _journal_thread
+    with _journal_lock:
+        if _journal_thread is not None:
+            _journal_thread.close()
+            _journal_thread = None
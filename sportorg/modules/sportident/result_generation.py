@@ -84,9 +84,9 @@ class ResultSportidentGeneration:
         return eq
 
     def _has_result(self):
-        for result in race().results:
-            if result is None:
-                continue
+        # the index has results with the same content when they were added,
+        # they can be edited since
+        for result in race().find_results_by_readout(self._result):
             if self._compare_result(result):
                 return True
         return False
@@ -94,20 +94,15 @@ class ResultSportidentGeneration:
     def _find_person_by_result(self):
         if self._person:
             return True
-        for person in race().persons:
-            if person.card_number and person.card_number == self._result.card_number:
-                self._person = person
-                return True
+        person = race().find_person_by_card(self._result.card_number)
+        if person:
+            self._person = person
+            return True
 
         return False
 
     def _has_sportident_card(self):
-        for result in race().results:
-            if result is None:
-                continue
-            if result.card_number == self._result.card_number:
-                return True
-        return False
+        return len(race().find_results_by_card(self._result.card_number)) > 0
 
     def _bib_dialog(self):
         try:
@@ -148,14 +143,16 @@ class ResultSportidentGeneration:
 
     def _merge_punches(self):
         card_number = self._result.card_number
-        existing_res = race().find_person_by_card(card_number)
+        existing_results = race().find_results_by_card(card_number)
 
-        if not existing_res:
+        if not existing_results:
             self._add_result()
             return True
         else:
+            existing_res = existing_results[0]
             if existing_res.merge_with(self._result):
                 # existing result changed, recalculate group results and printout
+                race().reindex_result_readout(existing_res)
                 self._result = existing_res
                 ResultChecker.checking(self._result)
                 self.popup_result(self._result)
@@ -241,10 +238,7 @@ class ResultSportidentGeneration:
         race().persons.append(new_person)
 
     def _get_max_bib(self):
-        max_bib = 0
-        for i in race().persons:
-            max_bib = max(max_bib, i.bib)
-        return max_bib
+        return race().get_max_bib()
 
     def _find_group_by_punches(self):
         for i in race().groups:
@@ -0,0 +1,152 @@
+import socket
+from collections import deque
+from typing import Deque, Iterator, Optional, Tuple, Union
+
+from .packet_header import Header
+from .protocol import FRAME_TAG, FrameHeader
+
+
+class ReceiveBuffer:
+    """Framed receive buffer
+
+    Socket data is read with recv_into straight into a preallocated bytearray,
+    packets are returned as memoryview slices without copying. Unread bytes
+    are moved to the beginning only when there is no room at the end, so
+    every byte is copied at most once more.
+    """
+
+    READ_SIZE = 256 * 1024
+
+    def __init__(self, read_size: int = READ_SIZE):
+        self._read_size = read_size
+        self._data = bytearray(read_size)
+        self._view = memoryview(self._data)
+        self._start = 0
+        self._end = 0
+        self._hdr: Optional[Union[Header, FrameHeader]] = None
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def recv_into(self, sock: socket.socket) -> int:
+        """Read available data, 0 means the connection is closed"""
+        size = self._read_size
+        if self._hdr is not None:
+            size = max(size, self._hdr.size - len(self))
+        self._reserve(size)
+        count = sock.recv_into(self._view[self._end :])
+        self._end += count
+        return count
+
+    def feed(self, data: bytes) -> None:
+        self._reserve(len(data))
+        self._view[self._end : self._end + len(data)] = data
+        self._end += len(data)
+
+    def packets(self) -> Iterator[Tuple[Union[Header, FrameHeader], memoryview]]:
+        """Complete v1 packets and v2 frames, payload is valid until the next read"""
+        while True:
+            if self._hdr is None:
+                if len(self) < 2:
+                    break
+                tag = self._view[self._start : self._start + 2]
+                if tag == FRAME_TAG:
+                    hdr: Union[Header, FrameHeader] = FrameHeader()
+                elif tag == b"SO":
+                    hdr = Header()
+                else:
+                    raise ValueError("Unknown packet tag {!r}".format(bytes(tag)))
+                header_size = hdr.header_size
+                if len(self) < header_size:
+                    break
+                hdr.unpack_header(self._view[self._start : self._start + header_size])
+                self._start += header_size
+                self._hdr = hdr
+            if len(self) < self._hdr.size:
+                break
+            hdr, self._hdr = self._hdr, None
+            payload = self._view[self._start : self._start + hdr.size]
+            self._start += hdr.size
+            yield hdr, payload
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def _reserve(self, size: int) -> None:
+        if len(self._data) - self._end >= size:
+            return
+        used = len(self)
+        if used + size <= len(self._data):
+            tail = self._view[self._start : self._end]
+            if self._start < used:
+                # overlapping move
+                tail = bytes(tail)
+            self._view[:used] = tail
+        else:
+            data = bytearray(max(len(self._data) * 2, used + size))
+            data[:used] = self._view[self._start : self._end]
+            self._data = data
+            self._view = memoryview(data)
+        self._start = 0
+        self._end = used
+
+
+class SendBuffer:
+    """Pending output of a non-blocking socket
+
+    The buffer is full over the high-water mark: the client stops taking
+    new commands until the server reads, the server drops the connection of
+    a peer that does not read.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    HIGH_WATER = 128 * 1024 * 1024
+
+    def __init__(self, high_water: Optional[int] = None):
+        self._chunks: Deque[bytes] = deque()
+        self._offset = 0
+        self.size = 0
+        self.high_water = high_water or self.HIGH_WATER
+
+    def __len__(self) -> int:
+        return self.size
+
+    def is_full(self) -> bool:
+        return self.size >= self.high_water
+
+    def append(self, data: bytes) -> None:
+        if data:
+            self._chunks.append(data)
+            self.size += len(data)
+
+    def send(self, sock: socket.socket) -> bool:
+        """Send as much as the socket takes, True if everything is sent"""
+        chunks = self._chunks
+        while chunks:
+            if self._offset == 0 and len(chunks) > 1:
+                self._join_small_chunks()
+            data = memoryview(chunks[0])[self._offset :]
+            try:
+                sent = sock.send(data)
+            except (BlockingIOError, InterruptedError):
+                return False
+            self.size -= sent
+            if sent < len(data):
+                self._offset += sent
+                return False
+            chunks.popleft()
+            self._offset = 0
+        return True
+
+    def _join_small_chunks(self) -> None:
+        # one send call for many small packets
+        chunks = self._chunks
+        size = 0
+        count = 0
+        for chunk in chunks:
+            if count and size + len(chunk) > self.CHUNK_SIZE:
+                break
+            size += len(chunk)
+            count += 1
+        if count > 1:
+            data = b"".join([chunks.popleft() for _ in range(count)])
+            chunks.appendleft(data)
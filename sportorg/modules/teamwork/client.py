@@ -1,66 +1,129 @@
 import queue
 import selectors
 import socket
+import time
 from threading import Event, Thread
-from typing import Tuple, cast
+from typing import Optional, Tuple, cast
 
 import orjson
 
-from .command import Command
-from .packet_header import Header, Operations
+from .buffer import ReceiveBuffer, SendBuffer
+from .packet_header import Operations
+from .protocol import PING, PROTOCOL_VERSION, ObjectVersions, Peer, SyncPosition
+from .wakeup import Wakeup
 
 
 class ClientSender:
-    def __init__(self, in_queue: queue.Queue):
+    def __init__(
+        self,
+        in_queue: queue.Queue,
+        peer: Peer,
+        versions: ObjectVersions,
+        position: SyncPosition,
+    ):
         self._in_queue = in_queue
+        self._peer = peer
+        self._versions = versions
+        self._position = position
+        self._buffer = SendBuffer()
 
-    def __call__(self, conn: socket.socket) -> None:
+    def is_pending(self) -> bool:
+        return len(self._buffer) > 0
+
+    def is_full(self) -> bool:
+        return self._buffer.is_full()
+
+    def send_hello(self) -> None:
+        self._buffer.append(self._peer.get_hello(self._position))
+
+    def send_ping(self) -> None:
+        self._buffer.append(PING)
+
+    def process_queue(self) -> None:
+        commands = []
         try:
             while True:
-                cmd = self._in_queue.get(timeout=0.1)
-                conn.sendall(cmd.get_packet())
+                commands.append(self._in_queue.get_nowait())
         except queue.Empty:
+            pass
+        if not commands:
             return
+        for command in commands:
+            if not command.version:
+                command.set_version(self._versions.next_version(command.header.uuid))
+        for data in self._peer.encode(commands):
+            self._buffer.append(data)
 
+    def __call__(self, conn: socket.socket) -> None:
+        self._buffer.send(conn)
 
-class ClientReceiver:
-    MSG_SIZE = 1024
 
-    def __init__(self, out_queue: queue.Queue):
+class ClientReceiver:
+    def __init__(
+        self,
+        out_queue: queue.Queue,
+        peer: Peer,
+        versions: ObjectVersions,
+        position: SyncPosition,
+        logger,
+    ):
         self._out_queue = out_queue
-        self._full_data = b""
-        self._hdr = Header()
-        self._is_new_pack = True
+        self._peer = peer
+        self._versions = versions
+        self._position = position
+        self._logger = logger
+        self._buffer = ReceiveBuffer()
+        self.is_hello = False
+        self.last_seen = time.monotonic()
 
-    def __call__(self, conn: socket.socket) -> None:
-        data = conn.recv(self.MSG_SIZE)
-        if not data:
-            return
-        self._full_data += data
-        while True:
-            # getting Header
-            if self._is_new_pack:
-                if len(self._full_data) >= self._hdr.header_size:
-                    self._hdr.unpack_header(self._full_data[: self._hdr.header_size])
-                    self._full_data = self._full_data[self._hdr.header_size :]
-                    self._is_new_pack = False
-                else:
-                    break
-            # Getting JSON data
-            else:
-                if len(self._full_data) >= self._hdr.size:
-                    command = Command(
-                        orjson.loads(self._full_data[: self._hdr.size].decode()),
-                        Operations(self._hdr.op_type).name,
+    def __call__(self, conn: socket.socket) -> bool:
+        """False if the connection is closed"""
+        try:
+            if not self._buffer.recv_into(conn):
+                return False
+        except (BlockingIOError, InterruptedError):
+            return True
+        self.last_seen = time.monotonic()
+        for hdr, payload in self._buffer.packets():
+            if hdr.op_type == Operations.Ping.value:
+                continue
+            if hdr.op_type == Operations.Hello.value:
+                self._peer.set_hello(payload, self._position)
+                self.is_hello = True
+                self._logger.info(
+                    "Teamwork protocol v{}, {}".format(
+                        self._peer.protocol, self._peer.codec
                     )
+                )
+                continue
+            if hdr.op_type == Operations.Sync.value:
+                # the commands before are received
+                self._position.seq = orjson.loads(payload)["seq"]
+                continue
+            for command in self._peer.decode(hdr, payload):
+                if self._versions.accept(command.header.uuid, command.version):
                     self._out_queue.put_nowait(command)
-                    self._full_data = self._full_data[self._hdr.size :]
-                    self._is_new_pack = True
-                else:
-                    break
+        return True
 
 
 class ClientThread(Thread):
+    """Connection to the teamwork server
+
+    The lost connection is restored with growing delay until the thread is
+    stopped. A v2 server sends the commands missed while disconnected,
+    see ChangeLog. Commands queued meanwhile are sent after reconnect,
+    commands already taken to the send buffer of the lost connection are lost.
+    """
+
+    # a v1 server does not answer Hello
+    HELLO_TIMEOUT = 3
+    CONNECT_TIMEOUT = 5
+    RECONNECT_DELAY = 0.5
+    MAX_RECONNECT_DELAY = 30
+    # v2 server answers Ping, the connection is lost without an answer
+    HEARTBEAT_INTERVAL = 5
+    HEARTBEAT_TIMEOUT = 20
+
     def __init__(
         self,
         addr: Tuple[str, int],
@@ -68,6 +131,8 @@ class ClientThread(Thread):
         out_queue: queue.Queue,
         stop_event: Event,
         logger,
+        versions: Optional[ObjectVersions] = None,
+        position: Optional[SyncPosition] = None,
     ):
         super().__init__()
         self.setName("Teamwork Client")
@@ -76,37 +141,121 @@ class ClientThread(Thread):
         self._out_queue = out_queue
         self._stop_event = stop_event
         self._logger = logger
-        self._started = Event()
+        self._versions = versions or ObjectVersions()
+        self._position = position or SyncPosition()
+        # Thread has its own _started
+        self._ready = Event()
+        self._wakeup = Wakeup()
 
     def wait(self) -> None:
-        self._started.wait()
+        """Wait until the thread is connected or stopped"""
+        self._ready.wait()
+
+    def wake(self) -> None:
+        """Process the queue or the stop event now"""
+        self._wakeup.set()
 
     def run(self) -> None:
+        protocol = PROTOCOL_VERSION
+        delay = self.RECONNECT_DELAY
+        try:
+            while True:
+                try:
+                    if not self._run_connection(protocol):
+                        self._logger.info("No answer to Hello, fallback to protocol v1")
+                        protocol = 1
+                        continue
+                    delay = self.RECONNECT_DELAY
+                except OSError as e:
+                    self._logger.error("Teamwork connection error: {}".format(e))
+                finally:
+                    self._ready.set()
+                if self._stop_event.is_set():
+                    break
+                self._logger.info("Reconnect in {:.1f} s".format(delay))
+                if self._stop_event.wait(delay):
+                    break
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+        except Exception as e:
+            self._logger.exception(e)
+            self._stop_event.set()
+        finally:
+            self._ready.set()
+            self._wakeup.close()
+        self._logger.info("Client stopped")
+
+    def _run_connection(self, protocol: int) -> bool:
+        """False if the server did not answer Hello in time"""
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             selector = selectors.DefaultSelector()
             try:
+                # the host may be unreachable, not only refuse
+                s.settimeout(self.CONNECT_TIMEOUT)
                 s.connect(self._addr)
-                s.settimeout(5)
                 s.setblocking(False)
-                selector.register(s, selectors.EVENT_READ | selectors.EVENT_WRITE)
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                selector.register(s, selectors.EVENT_READ)
+                selector.register(self._wakeup, selectors.EVENT_READ)
                 self._logger.info("Client started")
-                self._started.set()
-                sender = ClientSender(self._in_queue)
-                receiver = ClientReceiver(self._out_queue)
-                while True:
+                peer = Peer()
+                sender = ClientSender(
+                    self._in_queue, peer, self._versions, self._position
+                )
+                receiver = ClientReceiver(
+                    self._out_queue, peer, self._versions, self._position, self._logger
+                )
+                if protocol >= 2:
+                    sender.send_hello()
+                    # a new socket takes the small frame at once
+                    sender(s)
+                hello_deadline = time.monotonic() + self.HELLO_TIMEOUT
+                next_ping = time.monotonic() + self.HEARTBEAT_INTERVAL
+                self._ready.set()
+                is_writing = False
+                is_connected = True
+                while is_connected:
                     if self._stop_event.is_set():
                         break
-                    events = selector.select(timeout=1)
-                    if not events:
-                        continue
+                    timeout = None
+                    if protocol >= 2:
+                        deadline = next_ping if receiver.is_hello else hello_deadline
+                        timeout = max(deadline - time.monotonic(), 0)
+                    events = selector.select(timeout=timeout)
                     for key, mask in events:
+                        if key.fileobj is self._wakeup:
+                            self._wakeup.clear()
+                            continue
                         if mask & selectors.EVENT_READ:
-                            receiver(cast(socket.socket, key.fileobj))
+                            if not receiver(cast(socket.socket, key.fileobj)):
+                                self._logger.info("Connection closed by server")
+                                is_connected = False
                         if mask & selectors.EVENT_WRITE:
                             sender(cast(socket.socket, key.fileobj))
-            except Exception as e:
-                self._logger.exception(e)
-                self._stop_event.set()
+
+                    now = time.monotonic()
+                    if protocol >= 2 and not receiver.is_hello:
+                        # commands wait for the protocol of the server
+                        if now >= hello_deadline:
+                            return False
+                    elif not sender.is_full():
+                        # backpressure, commands stay in the queue
+                        sender.process_queue()
+                    if protocol >= 2 and receiver.is_hello:
+                        if now - receiver.last_seen > self.HEARTBEAT_TIMEOUT:
+                            self._logger.error("Teamwork server does not answer")
+                            break
+                        if now >= next_ping:
+                            sender.send_ping()
+                            next_ping = now + self.HEARTBEAT_INTERVAL
+                    # write interest only while there is something to send
+                    if sender.is_pending():
+                        sender(s)
+                    if sender.is_pending() != is_writing:
+                        is_writing = sender.is_pending()
+                        events_mask = selectors.EVENT_READ
+                        if is_writing:
+                            events_mask |= selectors.EVENT_WRITE
+                        selector.modify(s, events_mask)
             finally:
                 selector.close()
-        self._logger.info("Client stopped")
+        return True
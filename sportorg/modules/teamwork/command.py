@@ -12,11 +12,31 @@ class Command:
         data=None,
         op=Operations.Update.name,
         sender: Optional[socket.socket] = None,
+        version: int = 0,
     ):
         self.data = data
         self.header = Header(data, op)
+        self.header.version = version
         self.next_cmd_obj_type = ObjectTypes.Unknown.value
         self._sender = sender
+        self._packet: Optional[bytes] = None
+        # protocol v2 record, see get_record
+        self.record: Optional[bytes] = None
+        # position in the change log of the server, see ChangeLog
+        self.seq = 0
+
+    @property
+    def version(self) -> int:
+        """Object version, 0 for a new local change or a v1 peer"""
+        return self.header.version
+
+    def set_version(self, version: int) -> None:
+        self.header.version = version
+        self._packet = None
+        self.record = None
+
+    def is_local(self) -> bool:
+        return self._sender is None
 
     def __repr__(self) -> str:
         return str(self.data)
@@ -25,5 +45,8 @@ class Command:
         return self._sender is sender
 
     def get_packet(self) -> bytes:
-        pack_data = orjson.dumps(self.data)
-        return self.header.pack_header(len(pack_data)) + pack_data
+        # the same packet is sent to every connection
+        if self._packet is None:
+            pack_data = orjson.dumps(self.data)
+            self._packet = self.header.pack_header(len(pack_data)) + pack_data
+        return self._packet
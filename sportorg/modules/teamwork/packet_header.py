@@ -49,6 +49,9 @@ class Operations(Enum):
     SyncRace = 4
     GetLock = 5
     ReleaseLoc = 6
+    Hello = 7
+    Sync = 8
+    Ping = 9
 
     def __str__(self):
         return self._name_
@@ -91,10 +94,12 @@ class Header:
                 obj_uuid = obj_data["id"]
             except AttributeError:
                 raise ValueError
+            # formatted only if enabled, every received command gets a header
             logging.debug(
-                "Header Init: obj_type: {}, op_type: {}, uuid: {}".format(
-                    obj_type, op_type, obj_uuid
-                )
+                "Header Init: obj_type: %s, op_type: %s, uuid: %s",
+                obj_type,
+                op_type,
+                obj_uuid,
             )
             self.op_type = Operations[op_type].value
             self.obj_type = ObjectTypes[obj_type].value
@@ -0,0 +1,410 @@
+"""Teamwork protocol v2
+
+```
+Frame header, 14 Bytes:
+    tag: 2 Bytes b"S2"
+    operation type: 1 Byte
+    codec: 1 Byte, payload compression
+    count: 2 Bytes, records in the frame
+    size: 4 Bytes, payload size
+    raw size: 4 Bytes, payload size before compression
+
+Record, 29 Bytes + JSON:
+    object type: 1 Byte
+    uuid: 16 Bytes
+    version: 8 Bytes
+    size: 4 Bytes
+```
+
+A v2 client starts with a Hello frame, its payload is JSON with the protocol
+version and codecs. The server answers with Hello and the chosen codec, after
+that both sides send v2 frames. Connections without Hello use v1 packets,
+see `Header`.
+
+The server numbers the commands it sends, see `ChangeLog`. Frames to a client
+are followed by a Sync frame with the last sequence number. A reconnecting
+client sends the session of the server and its last sequence number in Hello
+and gets the missed commands and Sync after the answer.
+
+A v2 client sends an empty Ping frame every few seconds and the server
+answers with Ping. Both sides drop the connection if nothing is
+received for longer, so the client reconnects after a lost network.
+"""
+
+import gzip
+import struct
+import uuid
+from collections import deque
+from enum import Enum
+from itertools import islice
+from threading import Lock
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from .command import Command
+from .packet_header import Operations
+
+try:
+    from compression import zstd  # type: ignore[import-not-found]
+except ModuleNotFoundError:
+    zstd = None
+if zstd is None:
+    try:
+        import zstandard
+    except ModuleNotFoundError:
+        zstandard = None
+
+PROTOCOL_VERSION = 2
+FRAME_TAG = b"S2"
+# larger payloads are compressed
+COMPRESS_SIZE = 16 * 1024
+# records are batched until the frame has this size
+FRAME_SIZE = 1024 * 1024
+MAX_RECORDS = 0xFFFF
+
+
+class Codec(Enum):
+    No = 0
+    Gzip = 1
+    Zstd = 2
+
+    def __str__(self):
+        return self._name_
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def get_codecs() -> List[Codec]:
+    """Available codecs, the best first"""
+    ret = [Codec.Gzip]
+    if zstd is not None or zstandard is not None:
+        ret.insert(0, Codec.Zstd)
+    return ret
+
+
+def choose_codec(names: List[str]) -> Codec:
+    for codec in get_codecs():
+        if codec.name in names:
+            return codec
+    return Codec.No
+
+
+def compress(data: bytes, codec: Codec) -> bytes:
+    if codec == Codec.Gzip:
+        return gzip.compress(data, compresslevel=1, mtime=0)
+    if codec == Codec.Zstd:
+        if zstd is not None:
+            return zstd.compress(data)
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def decompress(data, codec: Codec) -> bytes:
+    if codec == Codec.Gzip:
+        return gzip.decompress(data)
+    if codec == Codec.Zstd:
+        if zstd is not None:
+            return zstd.decompress(data)
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+class FrameHeader:
+    header_struct = "=2sBBHLL"
+    header_size = struct.calcsize(header_struct)
+
+    def __init__(
+        self, op_type=Operations.Update.value, codec=Codec.No, count=0, size=0
+    ):
+        self.pack_tag = FRAME_TAG
+        self.op_type = op_type
+        self.codec = codec
+        self.count = count
+        self.size = size
+        self.raw_size = size
+
+    def unpack_header(self, header) -> None:
+        pack_tag, self.op_type, codec, self.count, self.size, self.raw_size = (
+            struct.unpack(FrameHeader.header_struct, header)
+        )
+        self.codec = Codec(codec)
+
+    def pack_header(self) -> bytes:
+        return struct.pack(
+            FrameHeader.header_struct,
+            self.pack_tag,
+            self.op_type,
+            self.codec.value,
+            self.count,
+            self.size,
+            self.raw_size,
+        )
+
+
+class Record:
+    record_struct = "=B16sQL"
+    record_size = struct.calcsize(record_struct)
+
+
+def get_record(command: Command) -> bytes:
+    """Binary record of the command, the same for every connection"""
+    if command.record is None:
+        data = orjson.dumps(command.data)
+        command.record = (
+            struct.pack(
+                Record.record_struct,
+                command.header.obj_type,
+                uuid.UUID(command.header.uuid).bytes,
+                command.version,
+                len(data),
+            )
+            + data
+        )
+    return command.record
+
+
+def encode_hello(data: dict) -> bytes:
+    payload = orjson.dumps(data)
+    hdr = FrameHeader(Operations.Hello.value, size=len(payload))
+    return hdr.pack_header() + payload
+
+
+PING = FrameHeader(Operations.Ping.value).pack_header()
+
+
+def encode_sync(seq: int) -> bytes:
+    payload = orjson.dumps({"seq": seq})
+    hdr = FrameHeader(Operations.Sync.value, size=len(payload))
+    return hdr.pack_header() + payload
+
+
+def encode_frames(commands: List[Command], codec: Codec = Codec.No) -> List[bytes]:
+    """Batch commands of the same operation into frames"""
+    ret = []
+    records: List[bytes] = []
+    size = 0
+    op_type = None
+    for command in commands:
+        record = get_record(command)
+        if records and (
+            command.header.op_type != op_type
+            or size + len(record) > FRAME_SIZE
+            or len(records) >= MAX_RECORDS
+        ):
+            ret.append(_encode_frame(op_type, records, codec))
+            records = []
+            size = 0
+        op_type = command.header.op_type
+        records.append(record)
+        size += len(record)
+    if records:
+        ret.append(_encode_frame(op_type, records, codec))
+    return ret
+
+
+def _encode_frame(op_type, records: List[bytes], codec: Codec) -> bytes:
+    payload = b"".join(records)
+    raw_size = len(payload)
+    if codec != Codec.No and raw_size >= COMPRESS_SIZE:
+        payload = compress(payload, codec)
+    else:
+        codec = Codec.No
+    hdr = FrameHeader(op_type, codec, len(records), len(payload))
+    hdr.raw_size = raw_size
+    return hdr.pack_header() + payload
+
+
+def decode_records(
+    hdr: FrameHeader, payload
+) -> Iterator[Tuple[int, str, int, memoryview]]:
+    """Object type, uuid, version and JSON of every record"""
+    data = memoryview(decompress(payload, hdr.codec))
+    offset = 0
+    for _ in range(hdr.count):
+        obj_type, obj_uuid, version, size = struct.unpack_from(
+            Record.record_struct, data, offset
+        )
+        offset += Record.record_size
+        yield (
+            obj_type,
+            str(uuid.UUID(bytes=obj_uuid)),
+            version,
+            data[offset : offset + size],
+        )
+        offset += size
+
+
+class ObjectVersions:
+    """Last version of every object, shared by the GUI and network threads
+
+    Every local change gets the next version. The server accepts only newer
+    versions, so the first change that reaches the server wins, the stale
+    sender gets the current object back. Clients take everything from the
+    server except older versions of their own newer changes. Version 0 comes
+    from v1 peers, the server gives it the next version.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._versions: Dict[str, int] = {}
+        self._commands: Dict[str, Command] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+            self._commands.clear()
+
+    def get(self, obj_id: str) -> int:
+        return self._versions.get(obj_id, 0)
+
+    def get_command(self, obj_id: str) -> Optional[Command]:
+        """Last accepted command of the object on the server"""
+        return self._commands.get(obj_id)
+
+    def get_snapshot(self) -> List[Command]:
+        """Last commands of the changed objects in the order they were sent"""
+        with self._lock:
+            commands = [i for i in self._commands.values() if i.seq]
+        return sorted(commands, key=lambda i: i.seq)
+
+    def next_version(self, obj_id: str) -> int:
+        with self._lock:
+            version = self._versions.get(obj_id, 0) + 1
+            self._versions[obj_id] = version
+            return version
+
+    def accept(self, obj_id: str, version: int) -> bool:
+        """Client side: take the version unless ours is newer"""
+        with self._lock:
+            if not version:
+                return True
+            if version < self._versions.get(obj_id, 0):
+                return False
+            self._versions[obj_id] = version
+            return True
+
+    def accept_on_server(self, command: Command) -> bool:
+        """Server side: take only a newer version, set version of v1 commands"""
+        obj_id = command.header.uuid
+        with self._lock:
+            current = self._versions.get(obj_id, 0)
+            if not command.version:
+                command.set_version(current + 1)
+            elif command.version <= current:
+                return False
+            self._versions[obj_id] = command.version
+            self._commands[obj_id] = command
+            return True
+
+
+class ChangeLog:
+    """Last commands sent by the server, numbered by sequence
+
+    A reconnecting client gets only the commands after its last sequence
+    number. If they are not in the log any more or the server session is
+    another (the server was restarted), the client gets the last command
+    of every changed object instead, see ObjectVersions.get_snapshot.
+    Used by the server thread only.
+    """
+
+    SIZE = 10000
+
+    def __init__(self, size: Optional[int] = None):
+        self.session = uuid.uuid4().hex
+        self.seq = 0
+        self._commands: Deque[Command] = deque(maxlen=size or self.SIZE)
+
+    def append(self, command: Command) -> None:
+        self.seq += 1
+        command.seq = self.seq
+        self._commands.append(command)
+
+    def get_missing(
+        self, session: str, seq: int, versions: ObjectVersions
+    ) -> List[Command]:
+        if session == self.session:
+            if seq >= self.seq:
+                return []
+            if self._commands and seq >= self._commands[0].seq - 1:
+                return list(
+                    islice(self._commands, seq - self._commands[0].seq + 1, None)
+                )
+        return versions.get_snapshot()
+
+
+class SyncPosition:
+    """Position of a client in the change log, kept between connections"""
+
+    def __init__(self):
+        self.session = ""
+        self.seq = 0
+
+
+class Peer:
+    """Protocol of one connection, v1 until Hello"""
+
+    def __init__(self):
+        self.protocol = 1
+        self.codec = Codec.No
+        # change log position sent by the client
+        self.session = ""
+        self.seq = 0
+
+    def get_hello(self, position: Optional[SyncPosition] = None) -> bytes:
+        data = {
+            "protocol": PROTOCOL_VERSION,
+            "codecs": [codec.name for codec in get_codecs()],
+        }
+        if position is not None and position.session:
+            data["session"] = position.session
+            data["seq"] = position.seq
+        return encode_hello(data)
+
+    def accept_hello(self, payload, change_log: ChangeLog) -> bytes:
+        """Server side, the answer with the chosen codec and the session
+
+        A new client starts at the current sequence number, a reconnecting
+        one gets Sync after the missed commands.
+        """
+        data = orjson.loads(payload)
+        self.protocol = min(int(data.get("protocol", 1)), PROTOCOL_VERSION)
+        self.codec = choose_codec(data.get("codecs", []))
+        self.session = str(data.get("session", ""))
+        self.seq = int(data.get("seq", 0))
+        answer = {
+            "protocol": self.protocol,
+            "codec": self.codec.name,
+            "session": change_log.session,
+        }
+        if not self.session:
+            answer["seq"] = change_log.seq
+        return encode_hello(answer)
+
+    def set_hello(self, payload, position: Optional[SyncPosition] = None) -> None:
+        """Client side, the answer of the server"""
+        data = orjson.loads(payload)
+        self.protocol = min(int(data.get("protocol", 1)), PROTOCOL_VERSION)
+        self.codec = Codec[data.get("codec", Codec.No.name)]
+        if position is not None and "session" in data:
+            if position.session != data["session"]:
+                position.session = data["session"]
+                position.seq = 0
+            if "seq" in data:
+                position.seq = int(data["seq"])
+
+    def encode(self, commands: List[Command]) -> List[bytes]:
+        if self.protocol >= 2:
+            return encode_frames(commands, self.codec)
+        return [command.get_packet() for command in commands]
+
+    @staticmethod
+    def decode(hdr, payload, sender=None) -> Iterator[Command]:
+        """Commands of a v1 packet or a v2 frame"""
+        op = Operations(hdr.op_type).name
+        if isinstance(hdr, FrameHeader):
+            for _, _, version, data in decode_records(hdr, payload):
+                yield Command(orjson.loads(data), op, sender, version)
+        else:
+            yield Command(orjson.loads(payload), op, sender, hdr.version)
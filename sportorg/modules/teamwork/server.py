@@ -1,17 +1,19 @@
 import selectors
 import socket
+import time
 from queue import Empty, Queue
 from threading import Event, Thread
-from typing import List, Tuple, cast
-
-import orjson
+from typing import Dict, List, Optional, Tuple, cast
 
+from .buffer import ReceiveBuffer, SendBuffer
 from .command import Command
-from .packet_header import Header, Operations
+from .packet_header import Operations
+from .protocol import PING, ChangeLog, Codec, ObjectVersions, Peer, encode_sync
+from .wakeup import Wakeup
 
 
 class ServerReceiver:
-    MSG_SIZE = 1024
+    """Connection data, reads commands and keeps pending output"""
 
     def __init__(
         self,
@@ -19,80 +21,197 @@ class ServerReceiver:
         in_queue: Queue,
         out_queue: Queue,
         logger,
+        versions: ObjectVersions,
+        change_log: ChangeLog,
     ):
         self._selector = selector
         self._in_queue = in_queue
         self._out_queue = out_queue
         self._logger = logger
-        self._full_data = b""
-        self._hdr = Header()
-        self._is_new_pack = True
+        self._versions = versions
+        self._change_log = change_log
+        # later commands are sent to the connection anyway
+        self._accept_seq = change_log.seq
+        self._buffer = ReceiveBuffer()
+        self.send_buffer = SendBuffer()
+        self.peer = Peer()
+        self.last_seen = time.monotonic()
 
     def __call__(self, sock: socket.socket) -> None:
         try:
-            data = sock.recv(self.MSG_SIZE)
-            if not data:
-                self._selector.unregister(sock)
-                sock.close()
+            if not self._buffer.recv_into(sock):
+                close_connection(self._selector, sock)
                 return
+        except (BlockingIOError, InterruptedError):
+            return
         except OSError as e:
             self._logger.error(str(e))
-            self._selector.unregister(sock)
-            sock.close()
+            close_connection(self._selector, sock)
             return
+        self.last_seen = time.monotonic()
         try:
-            self._full_data += data
-            while True:
-                # getting Header
-                if self._is_new_pack:
-                    if len(self._full_data) >= self._hdr.header_size:
-                        self._hdr.unpack_header(
-                            self._full_data[: self._hdr.header_size]
+            for hdr, payload in self._buffer.packets():
+                if hdr.op_type == Operations.Ping.value:
+                    self.send_buffer.append(PING)
+                    continue
+                if hdr.op_type == Operations.Hello.value:
+                    self.send_buffer.append(
+                        self.peer.accept_hello(payload, self._change_log)
+                    )
+                    self._logger.info(
+                        "Teamwork protocol v{}, {}".format(
+                            self.peer.protocol, self.peer.codec
                         )
-                        self._full_data = self._full_data[self._hdr.header_size :]
-                        self._is_new_pack = False
-                    else:
-                        break
-                # Getting JSON data
-                else:
-                    if len(self._full_data) >= self._hdr.size:
-                        command = Command(
-                            orjson.loads(self._full_data[: self._hdr.size].decode()),
-                            Operations(self._hdr.op_type).name,
-                            sender=sock,
-                        )
-                        self._out_queue.put(command)  # for local
-                        self._in_queue.put(command)  # for child
-                        self._full_data = self._full_data[self._hdr.size :]
-                        self._is_new_pack = True
-                    else:
-                        break
+                    )
+                    if self.peer.session:
+                        self._catch_up()
+                    continue
+                for command in self.peer.decode(hdr, payload, sender=sock):
+                    self._process_command(command)
+        except ValueError as e:
+            # broken stream, the packet boundaries are lost
+            self._logger.error(str(e))
+            close_connection(self._selector, sock)
         except Exception as e:
             self._logger.error(str(e))
 
+    def send(self, commands: List[Command]) -> None:
+        for data in self.peer.encode(commands):
+            self.send_buffer.append(data)
+
+    def _catch_up(self) -> None:
+        """Send the commands the reconnected client has missed"""
+        commands = [
+            command
+            for command in self._change_log.get_missing(
+                self.peer.session, self.peer.seq, self._versions
+            )
+            if command.seq <= self._accept_seq
+        ]
+        self._logger.info(
+            "Teamwork client reconnected, {} commands to catch up".format(len(commands))
+        )
+        self.send(commands)
+        self.send_buffer.append(encode_sync(self._change_log.seq))
+
+    def _process_command(self, command: Command) -> None:
+        if not self._versions.accept_on_server(command):
+            # stale change, the sender gets the current object
+            self._logger.warning(
+                "Stale {} {} version {}".format(
+                    command.header.obj_type, command.header.uuid, command.version
+                )
+            )
+            current = self._versions.get_command(command.header.uuid)
+            if current is not None:
+                self.send([current])
+            return
+        self._out_queue.put(command)  # for local
+        self._in_queue.put(command)  # for child
+
 
 class ServerSender:
-    def __init__(self, selector: selectors.BaseSelector, in_queue: Queue, logger):
+    def __init__(
+        self,
+        selector: selectors.BaseSelector,
+        in_queue: Queue,
+        logger,
+        versions: ObjectVersions,
+        change_log: ChangeLog,
+    ):
         self._selector = selector
         self._in_queue = in_queue
         self._logger = logger
+        self._versions = versions
+        self._change_log = change_log
 
-    def __call__(self, socks: List[socket.socket]) -> None:
+    def process_queue(self) -> None:
+        """Move new commands to the send buffers of connections"""
+        commands = []
         try:
             while True:
-                command = self._in_queue.get(timeout=0.1)
-                for sock in socks:
-                    if command.is_sender(sock):
-                        continue
-                    try:
-                        sock.sendall(command.get_packet())
-                    except OSError as e:
-                        self._logger.error(str(e))
-                        self._selector.unregister(sock)
-                        sock.close()
+                commands.append(self._in_queue.get_nowait())
         except Empty:
             pass
 
+        connections = [
+            key
+            for key in self._selector.get_map().values()
+            if isinstance(key.data, ServerReceiver)
+        ]
+        if commands:
+            for command in commands:
+                if command.is_local():
+                    self._versions.accept_on_server(command)
+                self._change_log.append(command)
+            # v2 clients remember the position to catch up after reconnect
+            sync = encode_sync(self._change_log.seq)
+            # frames are encoded once for each codec
+            frames: Dict[
+                Tuple[Optional[Codec], Optional[socket.socket]], List[bytes]
+            ] = {}
+            for key in connections:
+                sock = cast(socket.socket, key.fileobj)
+                peer = key.data.peer
+                own = any(command.is_sender(sock) for command in commands)
+                cache_key = (
+                    peer.codec if peer.protocol >= 2 else None,
+                    sock if own else None,
+                )
+                if cache_key not in frames:
+                    data = peer.encode(
+                        [command for command in commands if not command.is_sender(sock)]
+                    )
+                    if data and peer.protocol >= 2:
+                        data.append(sync)
+                    frames[cache_key] = data
+                for data in frames[cache_key]:
+                    key.data.send_buffer.append(data)
+
+        for key in connections:
+            if key.data.send_buffer:
+                self(key)
+
+    def close_idle(self, timeout: float) -> None:
+        """Drop v2 clients that send nothing, even Ping, the network is lost"""
+        now = time.monotonic()
+        for key in list(self._selector.get_map().values()):
+            if not isinstance(key.data, ServerReceiver):
+                continue
+            if key.data.peer.protocol >= 2 and now - key.data.last_seen > timeout:
+                self._logger.error("Teamwork client does not answer, disconnect")
+                close_connection(self._selector, cast(socket.socket, key.fileobj))
+
+    def __call__(self, key: selectors.SelectorKey) -> None:
+        sock = cast(socket.socket, key.fileobj)
+        try:
+            is_sent = key.data.send_buffer.send(sock)
+        except OSError as e:
+            self._logger.error(str(e))
+            close_connection(self._selector, sock)
+            return
+        if key.data.send_buffer.is_full():
+            # slow consumer, it would hold the whole race in memory,
+            # the client catches up from the change log after reconnect
+            self._logger.error(
+                "Teamwork client does not read, {} bytes pending, disconnect".format(
+                    len(key.data.send_buffer)
+                )
+            )
+            close_connection(self._selector, sock)
+            return
+        # write interest only while there is something to send
+        events = selectors.EVENT_READ
+        if not is_sent:
+            events |= selectors.EVENT_WRITE
+        if key.events != events:
+            self._selector.modify(sock, events, key.data)
+
+
+def close_connection(selector: selectors.BaseSelector, sock: socket.socket) -> None:
+    selector.unregister(sock)
+    sock.close()
+
 
 class ConnectionAcceptor:
     def __init__(
@@ -101,24 +220,45 @@ class ConnectionAcceptor:
         in_queue: Queue,
         out_queue: Queue,
         logger,
+        versions: ObjectVersions,
+        change_log: ChangeLog,
     ):
         self._selector = selector
         self._logger = logger
         self._in_queue = in_queue
         self._out_queue = out_queue
+        self._versions = versions
+        self._change_log = change_log
 
     def __call__(self, sock: socket.socket) -> None:
-        conn, addr = sock.accept()
-        self._selector.register(
-            conn,
-            selectors.EVENT_READ | selectors.EVENT_WRITE,
-            data=ServerReceiver(
-                self._selector, self._in_queue, self._out_queue, self._logger
-            ),
-        )
+        # stations connect at once after the server restart
+        while True:
+            try:
+                conn, addr = sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            conn.setblocking(False)
+            # readout frames are small, don't wait for more data
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._selector.register(
+                conn,
+                selectors.EVENT_READ,
+                data=ServerReceiver(
+                    self._selector,
+                    self._in_queue,
+                    self._out_queue,
+                    self._logger,
+                    self._versions,
+                    self._change_log,
+                ),
+            )
 
 
 class ServerThread(Thread):
+    # v2 clients send Ping, see ClientThread.HEARTBEAT_INTERVAL
+    HEARTBEAT_TIMEOUT = 20
+    BACKLOG = 64
+
     def __init__(
         self,
         addr: Tuple[str, int],
@@ -126,6 +266,8 @@ class ServerThread(Thread):
         out_queue: Queue,
         stop_event: Event,
         logger,
+        versions: Optional[ObjectVersions] = None,
+        change_log: Optional[ChangeLog] = None,
     ):
         super().__init__(daemon=True)
         self.setName("Teamwork Server")
@@ -134,12 +276,27 @@ class ServerThread(Thread):
         self._out_queue = out_queue
         self._stop_event = stop_event
         self._logger = logger
-        self._started = Event()
+        self._versions = versions or ObjectVersions()
+        self._change_log = change_log or ChangeLog()
+        # Thread has its own _started
+        self._ready = Event()
+        self._wakeup = Wakeup()
 
     def wait(self) -> None:
-        self._started.wait()
+        """Wait until the thread is connected or stopped"""
+        self._ready.wait()
+
+    def wake(self) -> None:
+        """Process the queue or the stop event now"""
+        self._wakeup.set()
 
     def run(self) -> None:
+        try:
+            self._run()
+        finally:
+            self._wakeup.close()
+
+    def _run(self) -> None:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
@@ -149,8 +306,11 @@ class ServerThread(Thread):
                 self._logger.error("Server start error")
                 self._logger.debug(str(e))
                 self._stop_event.set()
+                self._ready.set()
                 return
-            s.listen(1)
+            # the real port if 0 was given
+            self.addr = s.getsockname()
+            s.listen(self.BACKLOG)
             s.settimeout(5)
             s.setblocking(False)
             selector = selectors.DefaultSelector()
@@ -158,35 +318,42 @@ class ServerThread(Thread):
                 s,
                 selectors.EVENT_READ,
                 data=ConnectionAcceptor(
-                    selector, self._in_queue, self._out_queue, self._logger
+                    selector,
+                    self._in_queue,
+                    self._out_queue,
+                    self._logger,
+                    self._versions,
+                    self._change_log,
                 ),
             )
+            selector.register(self._wakeup, selectors.EVENT_READ, data=self._wakeup)
 
             self._logger.info("Server started")
 
-            sender = ServerSender(selector, self._in_queue, self._logger)
-            self._started.set()
+            sender = ServerSender(
+                selector, self._in_queue, self._logger, self._versions, self._change_log
+            )
+            self._ready.set()
+            check_interval = self.HEARTBEAT_TIMEOUT / 4
+            next_check = time.monotonic() + check_interval
 
             while True:
                 try:
                     if self._stop_event.is_set():
                         break
-                    events = selector.select(timeout=1)
-                    if not events:
-                        continue
-
+                    events = selector.select(
+                        timeout=max(next_check - time.monotonic(), 0)
+                    )
                     for key, mask in events:
                         if mask & selectors.EVENT_READ:
                             callback = key.data
                             callback(key.fileobj)
-
-                    ready_to_write = [
-                        key.fileobj
-                        for key, mask in events
-                        if mask & selectors.EVENT_WRITE
-                    ]
-                    if ready_to_write:
-                        sender(cast(List[socket.socket], ready_to_write))
+                        if mask & selectors.EVENT_WRITE and key.fileobj.fileno() >= 0:
+                            sender(selector.get_key(key.fileobj))
+                    sender.process_queue()
+                    if time.monotonic() >= next_check:
+                        sender.close_idle(self.HEARTBEAT_TIMEOUT)
+                        next_check = time.monotonic() + check_interval
 
                 except Exception as e:
                     self._logger.exception(str(e))
@@ -11,6 +11,7 @@ from sportorg.common.singleton import singleton
 
 from .client import ClientThread
 from .packet_header import Operations
+from .protocol import ChangeLog, ObjectVersions, SyncPosition
 from .server import Command, ServerThread
 
 
@@ -44,6 +45,10 @@ class Teamwork:
         self._in_queue = Queue()
         self._out_queue = Queue()
         self._stop_event = Event()
+        self._versions = ObjectVersions()
+        # kept between restarts, clients catch up after reconnect
+        self._change_log = ChangeLog()
+        self._position = SyncPosition()
         self.factory = {"client": ClientThread, "server": ServerThread}
         self._thread = None
         self._result_thread = None
@@ -70,12 +75,18 @@ class Teamwork:
         if self.connection_type not in self.factory.keys():
             return
         if self._thread is None:
+            if self.connection_type == "server":
+                options = {"change_log": self._change_log}
+            else:
+                options = {"position": self._position}
             self._thread = self.factory[self.connection_type](
                 (self.host, self.port),
                 self._in_queue,
                 self._out_queue,
                 self._stop_event,
                 self._logger,
+                versions=self._versions,
+                **options,
             )
             self._thread.start()
         elif not self._thread.is_alive():
@@ -105,6 +116,11 @@ class Teamwork:
 
     def stop(self):
         self._stop_event.set()
+        self._wake()
+
+    def _wake(self):
+        if self._thread is not None:
+            self._thread.wake()
 
     def start(self):
         self._stop_event.clear()
@@ -128,9 +144,9 @@ class Teamwork:
             if isinstance(data, list):
                 for item in data:
                     self._in_queue.put(Command(item, op))
-                return
-
-            self._in_queue.put(Command(data, op))
+            else:
+                self._in_queue.put(Command(data, op))
+            self._wake()
 
     def delete(self, data):
         """data is Dict or List[Dict]"""
@@ -0,0 +1,41 @@
+import socket
+
+
+class Wakeup:
+    """Wakes a thread blocked in select
+
+    The read end is registered in the selector, other threads write a byte
+    when they queue a command or stop the thread.
+    """
+
+    def __init__(self):
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+
+    def fileno(self) -> int:
+        return self._reader.fileno()
+
+    def set(self) -> None:
+        try:
+            self._writer.send(b"\0")
+        except (BlockingIOError, InterruptedError):
+            # the pipe is full, the thread is woken anyway
+            pass
+        except OSError:
+            # closed, the thread is stopped
+            pass
+
+    def clear(self) -> None:
+        try:
+            while self._reader.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def __call__(self, fileobj=None) -> None:
+        self.clear()
+
+    def close(self) -> None:
+        self._reader.close()
+        self._writer.close()
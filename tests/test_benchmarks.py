@@ -0,0 +1,63 @@
+import pytest
+
+from benchmarks import teamwork
+from benchmarks.generator import KINDS, generate_event
+from benchmarks.run import STEPS, compare, main
+from sportorg.models.memory import ResultStatus, races
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_generate_event(kind):
+    event = generate_event(kind, persons=60, seed=1)
+    assert races() == event
+    for obj in event:
+        assert 50 < len(obj.persons) <= 60
+        assert 0 < len(obj.results) <= len(obj.persons)
+
+
+def test_generate_event_is_reproducible():
+    first = [
+        result.to_dict()["splits"] for result in generate_event("ardf", 30)[0].results
+    ]
+    second = [
+        result.to_dict()["splits"] for result in generate_event("ardf", 30)[0].results
+    ]
+    assert first == second
+
+
+def test_run(tmp_path):
+    output = tmp_path / "benchmarks.json"
+    main(
+        [
+            "--kinds",
+            "individual",
+            "relay",
+            "--sizes",
+            "30",
+            "--repeat",
+            "1",
+            "--output",
+            str(output),
+        ]
+    )
+    assert any(
+        result.status == ResultStatus.OK for obj in races() for result in obj.results
+    )
+    lines = compare(
+        [{"kind": "relay", "persons": 30, "step": "check_all", "min": 1.0}],
+        str(output),
+    )
+    assert len(lines) == 1
+    assert len(output.read_text().split('"step"')) == 2 * len(STEPS) + 1
+
+
+def test_teamwork_sync(capsys):
+    teamwork.main(["--persons", "60", "--clients", "2", "--repeat", "1"])
+    assert "to 2 clients" in capsys.readouterr().out
+
+
+def test_teamwork_push(capsys):
+    teamwork.main(
+        ["--mode", "push", "--persons", "60", "--clients", "3", "--repeat", "1"]
+    )
+    assert "from 3 clients" in capsys.readouterr().out
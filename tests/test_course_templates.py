@@ -0,0 +1,57 @@
+from sportorg.models.memory import (
+    Course,
+    CourseControl,
+    CourseControlTemplate,
+    Race,
+    ResultSportident,
+    Split,
+    create,
+    new_event,
+)
+
+
+def make_course(codes):
+    course = Course()
+    for code in codes:
+        course.controls.append(create(CourseControl, code=code))
+    return course
+
+
+def make_result(codes):
+    result = ResultSportident()
+    for code in codes:
+        result.splits.append(create(Split, code=code))
+    return result
+
+
+def test_template_parsing():
+    template = CourseControlTemplate("*(31, 35-37)")
+    assert template.kind == "*"
+    assert template.is_unique
+    assert template.has_list
+    assert [template.contains(code) for code in ("31", "35", "37", "38")] == [
+        True,
+        True,
+        True,
+        False,
+    ]
+
+    template = CourseControlTemplate("31(31,32) 989")
+    assert template.kind == ""
+    assert template.main_code == "31"
+
+
+def test_templates_cached_until_controls_changed():
+    new_event([create(Race)])
+    course = make_course(["31", "32"])
+    templates = course.get_control_templates()
+    assert course.get_control_templates() is templates
+
+    course.controls[1].code = "33"
+    assert course.get_control_templates() is not templates
+    assert make_result(["31", "33"]).check(course)
+    assert not make_result(["31", "32"]).check(course)
+
+    course.controls.append(create(CourseControl, code="*"))
+    assert not make_result(["31", "33"]).check(course)
+    assert make_result(["31", "33", "40"]).check(course)
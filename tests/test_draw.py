@@ -0,0 +1,79 @@
+from collections import Counter
+
+import pytest
+
+from sportorg.models.memory import (
+    Course,
+    Group,
+    Organization,
+    Person,
+    Race,
+    create,
+    new_event,
+    race,
+)
+from sportorg.models.start.start_preparation import DrawManager
+
+
+def make_persons(group, counts):
+    persons = []
+    for team, count in enumerate(counts):
+        organization = create(Organization, name=f"Team {team}")
+        for i in range(count):
+            persons.append(
+                create(
+                    Person, name=f"{team}_{i}", group=group, organization=organization
+                )
+            )
+    return persons
+
+
+def get_neighbours(persons):
+    return sum(
+        1
+        for prev, cur in zip(persons, persons[1:])
+        if prev.organization is cur.organization
+    )
+
+
+@pytest.mark.parametrize(
+    "counts", [[1], [5, 5], [7, 3, 2, 1], [6, 1, 1, 1, 1, 1], [20] + [1] * 19]
+)
+def test_teams_separated(counts):
+    persons = make_persons(create(Group, name="M21"), counts)
+    for seed in range(20):
+        result = DrawManager(race(), seed).process_array_impl(persons, True, False)
+        assert Counter(map(id, result)) == Counter(map(id, persons))
+        assert get_neighbours(result) == 0
+
+
+def test_too_large_team():
+    persons = make_persons(create(Group, name="M21"), [10, 2, 1])
+    result = DrawManager(race(), 1).process_array_impl(persons, True, False)
+    assert Counter(map(id, result)) == Counter(map(id, persons))
+    assert len(result) == len(persons)
+
+
+def test_seed():
+    persons = make_persons(create(Group, name="M21"), [30, 20, 10, 5])
+    first = DrawManager(race(), 7).process_array_impl(persons, True, False)
+    second = DrawManager(race(), 7).process_array_impl(persons, True, False)
+    assert first == second
+
+
+def test_mix_groups():
+    new_event([create(Race)])
+    obj = race()
+    courses = [create(Course, name=name) for name in ("A", "B")]
+    obj.courses.extend(courses)
+    persons = []
+    for i, name in enumerate(("M21", "W21", "M40")):
+        group = create(Group, name=name, course=courses[i % 2])
+        obj.groups.append(group)
+        persons += make_persons(group, [4, 3, 3])
+
+    result = DrawManager(obj, 3).process_array(persons, False, True, False, True)
+    assert Counter(map(id, result)) == Counter(map(id, persons))
+    # persons of the course are drawn together
+    course_names = [person.group.course.name for person in result]
+    assert course_names == ["A"] * 20 + ["B"] * 10
@@ -0,0 +1,151 @@
+import pytest
+
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    ResultManual,
+    create,
+    new_event,
+    race,
+)
+
+
+@pytest.fixture
+def indexed_race():
+    new_event([create(Race)])
+    obj = race()
+    for name in ("M21", "W21"):
+        obj.groups.append(create(Group, name=name))
+    for i in range(6):
+        person = create(Person, name=f"P{i}", group=obj.groups[i % 2])
+        person.set_bib(i + 1)
+        obj.add_person(person)
+        if i < 4:
+            add_result(person)
+    obj.rebuild_group_indexes()
+    return obj
+
+
+def add_result(person):
+    result = ResultManual()
+    result.person = person
+    race().add_new_result(result)
+    return result
+
+
+def assert_index_consistent(obj: Race):
+    groups = [None, *obj.groups]
+    persons = {group: obj.get_persons_by_group(group) for group in groups}
+    results = {group: obj.get_group_results(group) for group in groups}
+    person_results = {person: obj.find_person_result(person) for person in obj.persons}
+
+    for group in groups:
+        expected = [person for person in obj.persons if person.group is group]
+        assert persons[group] == (expected or None)
+        expected = [
+            result
+            for result in obj.results
+            if result.person and result.person.group is group
+        ]
+        assert [id(i) for i in results[group]] == [id(i) for i in expected]
+    for organization in {person.organization for person in obj.persons}:
+        expected = [
+            person for person in obj.persons if person.organization is organization
+        ]
+        assert obj.get_persons_by_organization(organization) == expected
+    for person, result in person_results.items():
+        expected = next((i for i in obj.results if i.person is person), None)
+        assert result is expected
+
+
+def test_add_and_delete_result(indexed_race):
+    result = add_result(indexed_race.persons[0])
+    # updated in place, without rebuilding
+    assert indexed_race._is_group_index_valid()
+    assert indexed_race.find_person_result(indexed_race.persons[0]) is result
+    assert_index_consistent(indexed_race)
+
+    indexed_race.delete_results([0])
+    assert_index_consistent(indexed_race)
+
+
+def test_person_group_changed(indexed_race):
+    person = indexed_race.find_person_by_bib(1)
+    person.group = indexed_race.groups[1]
+    assert_index_consistent(indexed_race)
+
+
+def test_result_person_changed(indexed_race):
+    result = indexed_race.find_person_result(indexed_race.find_person_by_bib(1))
+    result.person = indexed_race.find_person_by_bib(3)
+    assert_index_consistent(indexed_race)
+
+    result.person = indexed_race.find_person_by_bib(2)
+    assert_index_consistent(indexed_race)
+
+    result.person = None
+    assert_index_consistent(indexed_race)
+
+
+def test_delete_persons(indexed_race):
+    person = indexed_race.find_person_by_bib(2)
+    result = indexed_race.find_person_result(person)
+    indexed_race.delete_persons([indexed_race.persons.index(person)])
+    assert result.person is None
+    assert result.bib == 2
+    assert_index_consistent(indexed_race)
+
+
+def test_direct_list_changes(indexed_race):
+    person = create(Person, name="New", group=indexed_race.groups[0])
+    indexed_race.persons.append(person)
+    indexed_race.results.append(ResultManual())
+    indexed_race.results[-1].person = person
+    assert_index_consistent(indexed_race)
+
+    indexed_race.results = list(reversed(indexed_race.results))
+    assert_index_consistent(indexed_race)
+
+
+def test_update_data(indexed_race):
+    data = indexed_race.to_dict()
+    new_event([create(Race)])
+    copy = race()
+    copy.id = indexed_race.id
+    copy.update_data(data)
+    assert_index_consistent(copy)
+
+    person = copy.persons[0]
+    person_data = person.to_dict()
+    person_data["group_id"] = str(copy.groups[1].id)
+    copy.update_data(person_data)
+    assert person.group is copy.groups[1]
+    assert_index_consistent(copy)
+
+
+def test_not_current_race(indexed_race):
+    other = create(Race)
+    data = indexed_race.to_dict()
+    data["id"] = str(other.id)
+    other.update_data(data)
+    new_event([create(Race), other])
+    other.rebuild_group_indexes()
+    assert race() is not other
+
+    # the same uuids in both races must not confuse the index
+    indexed_race.rebuild_group_indexes()
+    person = get_person(other, 1)
+    person.group = other.groups[1]
+    assert_index_consistent(other)
+    assert_index_consistent(indexed_race)
+
+    result = other.find_person_result(get_person(other, 2))
+    result.person = get_person(other, 5)
+    assert other.find_person_result(get_person(other, 5)) is result
+    assert_index_consistent(other)
+    assert_index_consistent(indexed_race)
+
+
+def get_person(obj, bib):
+    return next(person for person in obj.persons if person.bib == bib)
@@ -0,0 +1,179 @@
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Course,
+    CourseControl,
+    Group,
+    Organization,
+    Person,
+    Race,
+    RaceType,
+    ResultSportident,
+    ResultStatus,
+    Split,
+    create,
+    new_event,
+    race,
+)
+from sportorg.models.result.result_tools import get_tracker, recalculate_results
+
+
+@pytest.fixture
+def big_race():
+    new_event([create(Race)])
+    obj = race()
+    obj.set_setting("scores_mode", "formula")
+    obj.set_setting("scores_formula", "1000 * leader / time")
+    org = create(Organization, name="Club")
+    obj.organizations.append(org)
+
+    for group_index in range(3):
+        course = create(Course, name=f"C{group_index}")
+        for code in (31, 32, 33, 34):
+            course.controls.append(create(CourseControl, code=str(code + group_index)))
+        obj.courses.append(course)
+        group = create(Group, name=f"G{group_index}", course=course)
+        obj.groups.append(group)
+        for i in range(6):
+            person = make_person(
+                f"P{group_index}_{i}", group, group_index * 100 + i + 1
+            )
+            person.organization = org
+            make_result(person, 60 + i * 7 + group_index, group_index)
+
+    relay = create(Group, name="Relay")
+    relay.set_type(RaceType.RELAY)
+    obj.groups.append(relay)
+    for team in range(1, 4):
+        for leg in range(1, 4):
+            person = make_person(f"R{team}_{leg}", relay, leg * 1000 + team)
+            person.organization = org
+            make_result(person, 20 + team * 3 + leg, 0, leg_start=(leg - 1) * 30)
+
+    recalculate_results()
+    return obj
+
+
+def make_person(name: str, group: Group, bib: int) -> Person:
+    person = create(Person, name=name, group=group)
+    person.set_bib(bib)
+    person.start_time = OTime(hour=10)
+    race().add_person(person)
+    return person
+
+
+def make_result(person: Person, minutes: int, shift: int, leg_start: int = 0):
+    result = ResultSportident()
+    result.person = person
+    result.card_number = person.bib
+    result.start_time = OTime(hour=10, minute=leg_start)
+    result.finish_time = OTime(hour=10, minute=leg_start + minutes)
+    for n, code in enumerate((31, 32, 33, 34)):
+        split = Split()
+        split.code = str(code + shift)
+        split.time = OTime(hour=10, minute=leg_start + (n + 1) * minutes // 5)
+        result.splits.append(split)
+    race().add_new_result(result)
+    return result
+
+
+def dump(obj: Race):
+    data = obj.to_dict()
+    teams = [
+        (team.group.name, team.bib_number, team.place, team.order, len(team.legs))
+        for team in obj.relay_teams
+    ]
+    return data, teams
+
+
+def assert_same_as_full(obj: Race, recheck_results: bool = False):
+    incremental = dump(obj)
+    recalculate_results(recheck_results=recheck_results)
+    assert incremental == dump(obj)
+
+
+def test_new_result_in_group(big_race):
+    person = make_person("New", big_race.groups[1], 150)
+    make_result(person, 55, 1)
+    recalculate_results(incremental=True)
+    assert person.result_count == 1
+    assert_same_as_full(big_race, recheck_results=True)
+
+
+def test_changed_objects_for_tables(big_race):
+    person = make_person("New", big_race.groups[1], 150)
+    result = make_result(person, 55, 1)
+    changes = recalculate_results(incremental=True)
+    assert changes.get_groups(big_race) == [big_race.groups[1]]
+    changed = changes.get_changed_results(big_race)
+    assert any(i is result for i in changed)
+    assert {i.person.group for i in changed} == {big_race.groups[1]}
+    assert recalculate_results() is None
+
+
+def test_person_moved_to_another_group(big_race):
+    person = big_race.find_person_by_bib(3)
+    person.group = big_race.groups[2]
+    recalculate_results(recheck_results=False, incremental=True)
+    assert_same_as_full(big_race)
+
+
+def test_changed_relay_leg(big_race):
+    result = big_race.find_person_result(big_race.find_person_by_bib(2002))
+    result.status = ResultStatus.DISQUALIFIED
+    get_tracker(big_race).mark_result(result)
+    recalculate_results(recheck_results=False, incremental=True)
+    assert_same_as_full(big_race)
+
+
+def test_deleted_result(big_race):
+    index = big_race.results.index(
+        big_race.find_person_result(big_race.find_person_by_bib(101))
+    )
+    big_race.delete_results([index])
+    recalculate_results(recheck_results=False, incremental=True)
+    assert_same_as_full(big_race)
+
+
+def test_marked_result(big_race):
+    result = big_race.find_person_result(big_race.find_person_by_bib(201))
+    result.splits[1].time = OTime(hour=10, minute=1)
+    get_tracker(big_race).mark_result(result)
+    recalculate_results(incremental=True)
+    assert_same_as_full(big_race, recheck_results=True)
+
+
+def test_changed_settings_fallback_to_full(big_race):
+    big_race.set_setting("scores_mode", "off")
+    for result in big_race.results:
+        result.scores = 0
+    recalculate_results(recheck_results=False, incremental=True)
+    assert all(result.scores == 0 for result in big_race.results)
+    assert_same_as_full(big_race)
+
+
+def test_changed_relay_bib(big_race):
+    person = big_race.find_person_by_bib(1003)
+    person.set_bib(1002)
+    big_race.find_person_by_bib(2002).set_bib(2003)
+    changes = recalculate_results(recheck_results=False, incremental=True)
+    assert changes.relay_team_numbers[big_race.groups[3]] == {2, 3}
+    assert_same_as_full(big_race)
+
+
+def test_updated_result_from_teamwork(big_race):
+    result = big_race.find_person_result(big_race.find_person_by_bib(102))
+    data = result.to_dict()
+    data["finish_time"] = OTime(hour=10, minute=30).to_msec()
+    big_race.update_data(data)
+    changes = recalculate_results(incremental=True)
+    assert changes.get_groups(big_race) == [big_race.groups[1]]
+    assert_same_as_full(big_race, recheck_results=True)
+
+
+def test_list_changed_directly_fallback_to_full(big_race):
+    person = create(Person, name="Direct", group=big_race.groups[2])
+    person.set_bib(250)
+    big_race.persons.append(person)
+    assert recalculate_results(recheck_results=False, incremental=True) is None
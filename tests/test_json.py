@@ -1,5 +1,22 @@
-from sportorg.models.memory import Group, Organization, Person, race
-from sportorg.modules.backup.file import File
+import gzip
+
+import orjson
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Organization,
+    Person,
+    Race,
+    Split,
+    create,
+    new_event,
+    race,
+    races,
+)
+from sportorg.modules.backup import json
+from sportorg.modules.backup.file import File, is_saving, wait_for_save
 
 
 def test_open_json_file():
@@ -12,3 +29,63 @@ def test_open_json_file():
     assert isinstance(person, Person), "Import person failed"
     assert isinstance(person.group, Group), "Import group failed"
     assert isinstance(person.organization, Organization), "Import organization failed"
+
+
+def test_split_round_trip():
+    split = Split()
+    split.code = "31"
+    split.time = OTime(hour=10, minute=5, sec=3)
+    split.days = 1
+    assert not hasattr(split, "__dict__")
+
+    copy = Split()
+    copy.update_data(split.to_dict())
+    assert copy.code == split.code
+    assert copy.time == split.time
+    assert copy.days == split.days
+
+
+@pytest.mark.parametrize("indent", [True, False])
+def test_dump_snapshot_as_one_document(tmp_path, indent):
+    new_event([create(Race) for _ in range(3)])
+    for obj in races():
+        obj.persons.append(create(Person, name="Иван\nПетров"))
+    snapshot = json.get_snapshot()
+    expected = orjson.dumps(snapshot, option=orjson.OPT_INDENT_2 if indent else 0)
+    with open(tmp_path / "event.json", "w", encoding="utf-8") as f:
+        json.dump_snapshot(f, snapshot, indent=indent)
+    assert (tmp_path / "event.json").read_bytes() == expected
+    # an empty event too
+    with open(tmp_path / "empty.json", "w") as f:
+        json.dump_snapshot(f, {**snapshot, "races": []}, indent=indent)
+    assert (tmp_path / "empty.json").read_bytes() == orjson.dumps(
+        {**snapshot, "races": []}, option=orjson.OPT_INDENT_2 if indent else 0
+    )
+
+
+def test_dump_cache_reuses_unchanged_races(tmp_path, mocker):
+    new_event([create(Race) for _ in range(3)])
+    cache = json.DumpCache()
+    with open(tmp_path / "first.json", "wb") as f:
+        json.dump_snapshot(f, json.get_snapshot(), compress=True, cache=cache)
+    races()[1].persons.append(create(Person, name="New"))
+    compress = mocker.spy(json.gzip, "compress")
+    with open(tmp_path / "second.json", "wb") as f:
+        json.dump_snapshot(f, json.get_snapshot(), compress=True, cache=cache)
+    # only the changed race is compressed with the separators and brackets
+    large = [c for c in compress.call_args_list if len(c.args[0]) > 100]
+    assert len(large) == 1
+    assert b'"New"' in large[0].args[0]
+    data = orjson.loads(gzip.decompress((tmp_path / "second.json").read_bytes()))
+    assert data["races"] == [obj.to_dict() for obj in races()]
+
+
+def test_save_in_background(tmp_path):
+    new_event([create(Race)])
+    race().persons.append(create(Person, name="Background"))
+    file_name = str(tmp_path / "event.json")
+    File(file_name).save_in_background()
+    wait_for_save()
+    assert not is_saving()
+    File(file_name).open()
+    assert race().persons[0].name == "Background"
@@ -1,6 +1,27 @@
+import asyncio
+import gzip
+import logging
+import threading
 import time
 
-from sportorg.modules.live.live import LiveThread
+import aiohttp
+import orjson
+import pytest
+from aiohttp import web
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Organization,
+    Person,
+    Race,
+    ResultManual,
+    create,
+    new_event,
+    race,
+)
+from sportorg.modules.live import orgeo
+from sportorg.modules.live.live import LiveRequest, LiveThread, get_ids, get_race_data
 
 
 def test_live_thread():
@@ -17,3 +38,305 @@ def test_live_thread():
     live_thread.stop()
     live_thread.join()
     assert result == [1]
+
+
+def test_live_thread_coalesce():
+    live_thread = LiveThread()
+    live_thread.send("first", key="person")
+    live_thread.send("other", key="other")
+    live_thread.send("second", key="person")
+    live_thread.send("no key")
+    assert list(live_thread._get_pending().values()) == ["other", "second", "no key"]
+    assert live_thread._get_pending() == {}
+
+
+@pytest.fixture
+def live_race():
+    new_event([create(Race)])
+    obj = race()
+    for name in ("M21", "W21"):
+        obj.groups.append(create(Group, name=name))
+    org = create(Organization, name="Club")
+    obj.organizations.append(org)
+    for i, group in enumerate(obj.groups * 3):
+        person = create(Person, name=f"P{i}", group=group, organization=org)
+        person.set_bib(i + 1)
+        obj.add_person(person)
+        result = ResultManual()
+        result.person = person
+        result.finish_time = OTime(hour=11, minute=i)
+        obj.add_new_result(result)
+    return obj
+
+
+class FakeResponse:
+    status = 200
+
+    async def text(self):
+        return "OK"
+
+
+class FakeSession:
+    def __init__(self):
+        self.sent = []
+
+    async def post(self, url, headers, data=None, json=None):
+        if data is not None:
+            json = orjson.loads(gzip.decompress(data))
+        self.sent.append(json)
+        return FakeResponse()
+
+
+def test_race_data_with_sent_objects_only(live_race):
+    result = live_race.find_person_result(live_race.find_person_by_bib(3))
+    race_data = get_race_data([result])
+    assert [i["id"] for i in race_data["results"]] == [str(result.id)]
+    assert [i["id"] for i in race_data["persons"]] == [str(result.person.id)]
+    assert [i["name"] for i in race_data["groups"]] == ["M21"]
+    assert [i["name"] for i in race_data["organizations"]] == ["Club"]
+    assert race_data["group_count"] == 2
+
+    session = FakeSession()
+    asyncio.run(
+        orgeo.create("url", [result.to_dict()], race_data, logging, session=session)
+    )
+    (person,) = session.sent[0]["persons"]
+    assert person["ref_id"] == str(result.person.id)
+    assert person["group_name"] == "M21"
+    assert person["organization"] == "Club"
+    assert "params" not in session.sent[0]
+
+
+def test_race_data_with_organization(live_race):
+    org = live_race.organizations[0]
+    race_data = get_race_data([org.to_dict()])
+    assert len(race_data["persons"]) == 6
+    assert len(race_data["results"]) == 6
+
+    other = create(Organization, name="Other")
+    live_race.organizations.append(other)
+    live_race.find_person_by_bib(2).organization = other
+    race_data = get_race_data([other.to_dict()])
+    assert [i["bib"] for i in race_data["persons"]] == [2]
+    assert len(get_race_data([org])["persons"]) == 5
+
+
+def test_race_data_with_group(live_race):
+    group = live_race.groups[1]
+    race_data = get_race_data(live_race.groups)
+    assert len(race_data["persons"]) == 6
+    assert len(race_data["results"]) == 6
+
+    session = FakeSession()
+    asyncio.run(
+        orgeo.create("url", [group.to_dict()], race_data, logging, session=session)
+    )
+    assert len(session.sent[0]["persons"]) == 3
+    assert "params" not in session.sent[0]
+
+    data = [group.to_dict() for group in live_race.groups]
+    asyncio.run(orgeo.create("url", data, race_data, logging, session=session))
+    assert len(session.sent[1]["persons"]) == 6
+    assert session.sent[1]["params"] == {"start_list": True}
+
+
+class StandInServer:
+    """Local live server, answers with given statuses first, then with 200"""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.received = []
+        self.concurrent = 0
+        self.max_concurrent = 0
+        self.url = ""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    async def handle(self, request):
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        await asyncio.sleep(self.delay)
+        self.concurrent -= 1
+        # gzip content is decompressed by aiohttp
+        self.received.append(await request.json())
+        status = self.statuses.pop(0) if self.statuses else 200
+        return web.Response(status=status, text="OK")
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/?id=1"
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(StandInServer(**kwargs))
+        servers[-1].start()
+        return servers[-1]
+
+    yield start
+    for item in servers:
+        item.stop()
+
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "Timeout"
+        time.sleep(0.01)
+
+
+def make_request(obj, url, bib):
+    result = obj.find_person_result(obj.find_person_by_bib(bib))
+    items = [result.to_dict()]
+    return LiveRequest("create", url, items, get_race_data([result]), get_ids(items))
+
+
+def test_live_request_retry(live_race, server, tmp_path):
+    live_server = server(statuses=[500])
+    journal = str(tmp_path / "journal.json")
+    live_thread = LiveThread(journal_path=journal, retry_delay=0.05, delay=0.01)
+    live_thread.start()
+    live_thread.send(make_request(live_race, live_server.url, 1))
+    wait_for(lambda: live_thread.get_metrics().sent == 1)
+    live_thread.stop()
+    live_thread.join()
+
+    metrics = live_thread.get_metrics()
+    assert metrics.failed == 1
+    assert metrics.retried == 1
+    assert metrics.queue_depth == 0
+    assert len(live_server.received) == 2
+    with open(journal, "rb") as f:
+        assert orjson.loads(f.read()) == []
+
+
+def test_live_journal_after_restart(live_race, server, tmp_path):
+    live_server = server(statuses=[503])
+    journal = str(tmp_path / "journal.json")
+    live_thread = LiveThread(journal_path=journal, retry_delay=0.2, delay=0.01)
+    live_thread.start()
+    live_thread.send(make_request(live_race, live_server.url, 1))
+    wait_for(lambda: live_thread.get_metrics().failed == 1)
+    live_thread.stop()
+    live_thread.join()
+    assert live_thread.get_metrics().queue_depth == 1
+
+    live_thread = LiveThread(journal_path=journal, retry_delay=0.2, delay=0.01)
+    assert live_thread.get_metrics().queue_depth == 1
+    live_thread.start()
+    wait_for(lambda: live_thread.get_metrics().sent == 1)
+    live_thread.stop()
+    live_thread.join()
+    assert len(live_server.received) == 2
+    person = live_server.received[1]["persons"][0]
+    assert person["ref_id"] == str(live_race.find_person_by_bib(1).id)
+
+
+def test_live_connection_limit(live_race, server):
+    live_server = server(delay=0.05)
+    live_thread = LiveThread(connections=2, delay=0.01)
+    for bib in range(1, 7):
+        live_thread.send(make_request(live_race, live_server.url, bib))
+    live_thread.start()
+    wait_for(lambda: live_thread.get_metrics().sent == 6)
+    live_thread.stop()
+    live_thread.join()
+    assert len(live_server.received) == 6
+    assert live_server.max_concurrent == 2
+
+
+class FakeCpSession:
+    """Answers online punches with given statuses or errors, then with 200"""
+
+    def __init__(self, answers=()):
+        self.answers = list(answers)
+        self.urls = []
+
+    async def get(self, url, headers):
+        answer = self.answers.pop(0) if self.answers else 200
+        if isinstance(answer, Exception):
+            raise answer
+        self.urls.append(url)
+        response = FakeResponse()
+        response.status = answer
+        return response
+
+
+def make_cp_request(obj):
+    obj.set_setting("live_cp_enabled", True)
+    for person in obj.persons:
+        person.set_card_number(100 + person.bib)
+    results = [obj.find_person_result(obj.find_person_by_bib(i)) for i in (1, 2, 3)]
+    items = [result.to_dict() for result in results]
+    return LiveRequest(
+        "create_online_cp", "url?id=1", items, get_race_data(results), get_ids(items)
+    )
+
+
+def get_cards(session):
+    return [url.split("si=")[1].split("&")[0] for url in session.urls]
+
+
+def test_online_cp_sent_once(live_race):
+    request = make_cp_request(live_race)
+    session = FakeCpSession([200, 500, 200])
+    assert not asyncio.run(request(session))
+    assert get_cards(session) == ["101", "102", "103"]
+
+    session = FakeCpSession()
+    assert asyncio.run(request(session))
+    assert get_cards(session) == ["102"]
+
+    # the journal keeps sent punches
+    request = LiveRequest.from_dict(orjson.loads(orjson.dumps(request.to_dict())))
+    session = FakeCpSession()
+    assert asyncio.run(request(session))
+    assert session.urls == []
+
+
+def test_online_cp_connection_error(live_race):
+    request = make_cp_request(live_race)
+    session = FakeCpSession([200, aiohttp.ClientConnectionError()])
+    assert not asyncio.run(request(session))
+    assert get_cards(session) == ["101"]
+
+    session = FakeCpSession()
+    assert asyncio.run(request(session))
+    assert get_cards(session) == ["102", "103"]
+
+
+def test_online_cp_broken_data_not_repeated(live_race):
+    request = make_cp_request(live_race)
+    del request.race_data["results"][0]["finish_time"]
+    session = FakeCpSession()
+    assert asyncio.run(request(session))
+    assert len(session.urls) == 2
+
+
+def test_coalesced_online_cp_keeps_sent(live_race):
+    live_thread = LiveThread()
+    request = make_cp_request(live_race)
+    request.sent.append("101 10 11:00:00")
+    live_thread.send(request)
+    newer = make_cp_request(live_race)
+    live_thread.send(newer)
+    assert newer.sent == ["101 10 11:00:00"]
@@ -1,7 +1,27 @@
 import pytest
 
-from sportorg.gui.tabs.memory_model import AbstractSportOrgMemoryModel
+try:
+    from PySide6.QtCore import Qt
+except ModuleNotFoundError:
+    from PySide2.QtCore import Qt
+
+from sportorg.gui.tabs.memory_model import (
+    AbstractSportOrgMemoryModel,
+    PersonMemoryModel,
+    ResultMemoryModel,
+)
+from sportorg.common.otime import OTime
+from sportorg.gui.global_access import GlobalAccess
 from sportorg.language import translate
+from sportorg.models.memory import (
+    Person,
+    Race,
+    ResultManual,
+    ResultStatus,
+    create,
+    new_event,
+    race,
+)
 
 
 @pytest.mark.parametrize(
@@ -91,3 +111,88 @@ def test_filter_wrong_action(pattern, value, expected):
     check = model.compile_regex(translate("wrong action"), pattern)
     result = model.match_value(check, value)
     assert result == expected
+
+
+@pytest.fixture
+def person_model():
+    new_event([create(Race)])
+    for i in range(6000):
+        person = create(Person, name=f"P{i}")
+        person.set_bib(i + 1)
+        race().add_person(person)
+    return PersonMemoryModel()
+
+
+def test_rows_are_lazy_and_not_capped(person_model):
+    assert person_model.rowCount() == 6000
+    assert person_model.cache.count(None) == 6000
+
+    index = person_model.index(5999, 1)
+    assert person_model.data(index, Qt.DisplayRole) == "P0"
+    assert person_model.cache.count(None) == 5999
+
+
+def test_update_objects(person_model):
+    person = race().persons[10]
+    person_model.get_row(10)
+    changed = []
+    person_model.dataChanged.connect(
+        lambda top, bottom: changed.append((top.row(), bottom.row()))
+    )
+
+    person.name = "Changed"
+    person_model.update_objects([person])
+    assert changed == [(10, 10)]
+    assert person_model.get_row(10)[1] == "Changed"
+
+
+def test_duplicate_inserts_row(person_model):
+    inserted = []
+    person_model.rowsInserted.connect(
+        lambda parent, first, last: inserted.append((first, last))
+    )
+    person_model.duplicate(3)
+    assert inserted == [(3, 3)]
+    assert person_model.rowCount() == 6001
+    assert person_model.get_row_by_object(race().persons[4]) == 4
+
+
+def test_refresh_reports_row_count_changes(person_model):
+    removed = []
+    person_model.rowsRemoved.connect(
+        lambda parent, first, last: removed.append((first, last))
+    )
+    race().delete_persons([0, 1])
+    person_model.refresh()
+    assert removed == [(5998, 5999)]
+    assert person_model.rowCount() == 5998
+    assert person_model.get_row(0)[1] == "P5997"
+
+
+def test_sort_results_by_place_order(mocker):
+    new_event([create(Race)])
+    race().set_setting("result_processing_mode", "scores")
+    for i, (score, status) in enumerate(
+        [
+            (1, ResultStatus.OK),
+            (20, ResultStatus.DISQUALIFIED),
+            (10, ResultStatus.OK),
+            (2, ResultStatus.OK),
+        ]
+    ):
+        person = create(Person, name=f"P{i}")
+        race().add_person(person)
+        result = ResultManual()
+        result.person = person
+        result.status = status
+        result.rogaine_score = score
+        result.start_time = OTime(hour=10)
+        result.finish_time = OTime(hour=11)
+        race().add_new_result(result)
+    main_window = mocker.Mock(current_tab=1)
+    mocker.patch.object(GlobalAccess(), "get_main_window", return_value=main_window)
+
+    model = ResultMemoryModel()
+    model.sort(model.get_headers().index(translate("Result")), Qt.AscendingOrder)
+    # text order would be "1 points", "10 points", "2 points"
+    assert [model.get_row(i)[1] for i in range(4)] == ["P2", "P3", "P0", "P1"]
@@ -0,0 +1,103 @@
+import uuid
+
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    RaceType,
+    ResultManual,
+    ResultStatus,
+    create,
+    get_multi_day_index,
+    new_event,
+    races,
+    set_current_race_index,
+)
+from sportorg.models.result.result_tools import recalculate_results
+from sportorg.modules.backup import json
+
+
+@pytest.fixture
+def event():
+    new_event([create(Race) for _ in range(2)])
+    for day, obj in enumerate(races()):
+        set_current_race_index(day)
+        obj.data.race_type = RaceType.MULTI_DAY_RACE
+        group = create(Group, name="M21")
+        group.set_type(RaceType.MULTI_DAY_RACE)
+        obj.groups.append(group)
+        for i in range(3):
+            person = create(Person, name=f"P{i}", surname="S", group=group)
+            obj.add_person(person)
+            result = ResultManual()
+            result.person = person
+            result.start_time = OTime(hour=10)
+            result.finish_time = OTime(hour=10, minute=30 + i * (day + 1))
+            obj.add_new_result(result)
+    set_current_race_index(0)
+    return races()
+
+
+def get_result(obj: Race, name: str):
+    return next(i for i in obj.results if i.person.name == name)
+
+
+def test_totals(event):
+    recalculate_results(race_object=event[0])
+    assert get_result(event[0], "P1").get_result_otime() == OTime(hour=1, minute=3)
+    assert get_result(event[0], "P0").place == 1
+
+    result = get_result(event[1], "P0")
+    result.status = ResultStatus.DISQUALIFIED
+    result.status_comment = "31"
+    recalculate_results(race_object=event[0])
+    result = get_result(event[0], "P0")
+    assert result.status == ResultStatus.MULTI_DAY_ISSUE
+    assert result.status_comment == "31"
+
+
+def test_totals_once_per_pass(event, mocker):
+    spy = mocker.spy(type(get_multi_day_index()), "_get_total")
+    recalculate_results(race_object=event[0])
+    assert spy.call_count == 3
+
+    event[1].results.remove(get_result(event[1], "P2"))
+    assert get_result(event[0], "P0").get_result_otime() == OTime(hour=1)
+    assert spy.call_count == 4
+
+
+def test_index_after_update_data(event):
+    data = [obj.to_dict() for obj in event]
+    new_event([create(Race) for _ in range(2)])
+    for day, obj in enumerate(races()):
+        set_current_race_index(day)
+        obj.id = uuid.UUID(data[day]["id"])
+        obj.update_data(data[day])
+    set_current_race_index(0)
+
+    obj = races()[0]
+    recalculate_results(race_object=obj)
+    assert [i.status for i in obj.results] == [ResultStatus.OK] * 3
+    # result uuid index is not cleared by the calculation
+    result = obj.results[0]
+    assert obj.get_obj("Result", str(result.id)) is result
+
+
+def test_load_recalculates_current_day(event, mocker, tmp_path):
+    set_current_race_index(1)
+    file_name = tmp_path / "event.json"
+    with open(file_name, "w") as f:
+        json.dump(f)
+
+    spy = mocker.spy(json, "recalculate_results")
+    try:
+        with open(file_name) as f:
+            json.load(f)
+        assert spy.call_count == 1
+        assert spy.call_args.kwargs["race_object"] is races()[1]
+    finally:
+        # new_event keeps the index, other tests use one race
+        set_current_race_index(0)
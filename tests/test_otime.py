@@ -50,3 +50,18 @@ def test_otime_sum():
     assert otime1 + otime2 == otime3
     assert otime1 + otime2 == otime3
     assert otime1 - otime2 == otime4
+
+
+def test_otime_midnight():
+    assert OTime(0, 0, 0, 10) - OTime(0, 0, 0, 20) == OTime(0, 23, 59, 50)
+    assert OTime(minute=-1) == OTime(0, 23, 59)
+    assert OTime(msec=-1).to_msec() == OTime.get_msec(msec=-1)
+
+
+def test_otime_hash():
+    assert OTime() is OTime(0, 0, 0, 0, 0)
+    assert OTime(0, 0, 1) - OTime(0, 0, 1) is OTime()
+    assert {OTime(0, 1), OTime(hour=1), OTime(msec=3600000)} == {OTime(0, 1)}
+    times = [OTime(0, 0, 3), OTime(0, 0, 1), OTime(0, 0, 2)]
+    assert sorted(times) == [OTime(0, 0, 1), OTime(0, 0, 2), OTime(0, 0, 3)]
+    assert max(times) == OTime(0, 0, 3)
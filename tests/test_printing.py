@@ -0,0 +1,46 @@
+import time
+
+from sportorg.modules.printing.printing import (
+    PrintJob,
+    SplitPrinter,
+    coalesce_jobs,
+)
+
+
+def test_coalesce_jobs():
+    first = PrintJob("1", key="a")
+    other = PrintJob("2", key="b")
+    reprint = PrintJob("3", key="a")
+    no_key = PrintJob("4")
+    jobs, replaced = coalesce_jobs([first, other, reprint, no_key, PrintJob("4")])
+    assert [job.html for job in jobs] == ["3", "2", "4", "4"]
+    assert replaced == [first]
+
+
+def test_print_to_pdf(tmp_path, monkeypatch):
+    # the worker is spawned with the environment of the test
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    printer = SplitPrinter(delay=0.01)
+    try:
+        for key in ("a", "b"):
+            printer.put(
+                PrintJob(
+                    "<h1>Split {}</h1>".format(key),
+                    key=key,
+                    output_file=str(tmp_path / "{}.pdf".format(key)),
+                )
+            )
+        assert printer.queue_depth == 2
+        statuses = []
+        deadline = time.monotonic() + 60
+        while printer.queue_depth and time.monotonic() < deadline:
+            statuses += printer.get_statuses()
+            time.sleep(0.05)
+        assert [(status.key, status.state) for status in statuses] == [
+            ("a", "done"),
+            ("b", "done"),
+        ]
+    finally:
+        printer.close(timeout=30)
+    for key in ("a", "b"):
+        assert (tmp_path / "{}.pdf".format(key)).read_bytes().startswith(b"%PDF")
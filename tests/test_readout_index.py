@@ -0,0 +1,127 @@
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    ResultSportident,
+    Split,
+    create,
+    new_event,
+    race,
+)
+from sportorg.modules.sportident.result_generation import ResultSportidentGeneration
+
+
+@pytest.fixture
+def readout_race():
+    new_event([create(Race)])
+    obj = race()
+    obj.groups.append(create(Group, name="M21"))
+    for i in range(3):
+        person = create(Person, name=f"P{i}", group=obj.groups[0])
+        person.set_bib(i + 1)
+        person.set_card_number(100 + i)
+        obj.add_person(person)
+    return obj
+
+
+def new_readout(card, finish, codes=(31, 32, 33)):
+    result = ResultSportident()
+    result.card_number = card
+    result.start_time = OTime(hour=10)
+    result.finish_time = OTime(hour=10, minute=finish)
+    for i, code in enumerate(codes):
+        split = Split()
+        split.code = str(code)
+        split.time = OTime(hour=10, minute=i + 1)
+        result.splits.append(split)
+    return result
+
+
+def read_card(result):
+    return ResultSportidentGeneration(result).add_result()
+
+
+def assert_index_consistent(obj: Race):
+    for result in obj.results:
+        expected = [i for i in obj.results if i.card_number == result.card_number]
+        found = obj.find_results_by_card(result.card_number)
+        assert [id(i) for i in found] == [id(i) for i in expected]
+        expected = [
+            i for i in obj.results if i.get_readout_key() == result.get_readout_key()
+        ]
+        found = obj.find_results_by_readout(result)
+        assert [id(i) for i in found] == [id(i) for i in expected]
+
+
+def test_duplicate_readout(readout_race):
+    assert read_card(new_readout(100, 30))
+    assert readout_race._is_readout_index_valid()
+    assert not read_card(new_readout(100, 30))
+    # the same card with other punches is a new result
+    assert read_card(new_readout(100, 30, codes=(31, 33)))
+    assert len(readout_race.results) == 2
+    assert readout_race.results[0].person is readout_race.find_person_by_bib(1)
+    assert_index_consistent(readout_race)
+
+
+def test_readout_without_start(readout_race):
+    assert read_card(new_readout(101, 40))
+    result = new_readout(101, 40)
+    result.start_time = None
+    assert not read_card(result)
+
+
+def test_card_changed(readout_race):
+    read_card(new_readout(100, 30))
+    read_card(new_readout(101, 40))
+    result = readout_race.find_results_by_card(100)[0]
+    result.card_number = 101
+    assert readout_race.find_results_by_card(100) == []
+    assert len(readout_race.find_results_by_card(101)) == 2
+    assert_index_consistent(readout_race)
+
+
+def test_delete_and_direct_changes(readout_race):
+    read_card(new_readout(100, 30))
+    read_card(new_readout(101, 40))
+    readout_race.delete_results([1])
+    assert readout_race.find_results_by_card(100) == []
+    assert_index_consistent(readout_race)
+
+    readout_race.results.append(new_readout(102, 50))
+    assert_index_consistent(readout_race)
+    assert not read_card(new_readout(102, 50))
+
+
+def test_edited_result(readout_race):
+    read_card(new_readout(100, 30))
+    result = readout_race.results[0]
+    result.finish_time = OTime(hour=10, minute=35)
+    readout_race.reindex_result_readout(result)
+    assert_index_consistent(readout_race)
+    assert not read_card(new_readout(100, 35))
+
+    # without reindexing the old content is found, but it's not the same
+    result.finish_time = OTime(hour=10, minute=36)
+    assert read_card(new_readout(100, 35))
+
+
+def test_merge_punches(readout_race):
+    readout_race.set_setting("system_duplicate_chip_processing", "merge")
+    read_card(new_readout(100, 30, codes=(31, 32)))
+    assert read_card(new_readout(100, 30, codes=(33,)))
+    assert len(readout_race.results) == 1
+    merged = readout_race.results[0]
+    assert [split.code for split in merged.splits] == ["31", "32", "33"]
+    assert readout_race.find_results_by_readout(merged) == [merged]
+    assert_index_consistent(readout_race)
+
+
+def test_autocreate_bib(readout_race):
+    readout_race.set_setting("system_assign_chip_reading", "autocreate")
+    readout_race.find_person_by_bib(3).set_bib(7)
+    read_card(new_readout(500, 30))
+    assert readout_race.results[0].person.bib == 8
@@ -0,0 +1,128 @@
+from datetime import datetime
+from threading import Thread
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import Race, create
+from sportorg.modules.recovery import recovery_sportorg_si_log
+from sportorg.modules.sportident import backup
+
+
+def get_card_data(card_number, finish_minute=30):
+    return {
+        "card_number": card_number,
+        "start": None,
+        "finish": datetime(2024, 5, 1, 11, finish_minute, 5),
+        "punches": [
+            (31, datetime(2024, 5, 1, 11, 10, 0, 500000)),
+            (32, datetime(2024, 5, 1, 11, 20, 0)),
+            (33, None),
+        ],
+    }
+
+
+def test_record(tmp_path):
+    file_name = str(tmp_path / "si.jsonl")
+    with open(file_name, "wb") as f:
+        f.write(backup.encode_record(get_card_data(8013787)))
+        f.write(backup.encode_record({"bib": 12, "punches": []}))
+
+    assert backup.is_journal(file_name)
+    records = list(backup.read_journal(file_name))
+    assert records[0]["card_number"] == 8013787
+    assert records[0]["start"] is None
+    assert records[0]["finish"] == OTime(hour=11, minute=30, sec=5).to_msec()
+    assert records[0]["punches"] == [
+        ["31", OTime(hour=11, minute=10, msec=500).to_msec()],
+        ["32", OTime(hour=11, minute=20).to_msec()],
+        ["33", None],
+    ]
+    # SFR
+    assert records[1]["card_number"] == 12
+
+
+def test_broken_record(tmp_path):
+    file_name = str(tmp_path / "si.jsonl")
+    first = backup.encode_record(get_card_data(1))
+    second = backup.encode_record(get_card_data(2))
+    changed = backup.encode_record(get_card_data(3)).replace(
+        b'"card_number":3', b'"card_number":4'
+    )
+    with open(file_name, "wb") as f:
+        f.write(first + changed + second + second[: len(second) // 2])
+
+    cards = [record["card_number"] for record in backup.read_journal(file_name)]
+    assert cards == [1, 2]
+
+
+def test_journal_thread(tmp_path):
+    file_name = str(tmp_path / "si.jsonl")
+    thread = backup.JournalThread()
+    thread.start()
+
+    def read_cards(first):
+        for card in range(first, first + 100):
+            thread.put(file_name, backup.encode_record(get_card_data(card)))
+
+    readers = [Thread(target=read_cards, args=(i * 1000,)) for i in range(4)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    thread.wait()
+
+    cards = [record["card_number"] for record in backup.read_journal(file_name)]
+    assert len(cards) == 400
+    for i in range(4):
+        assert [card for card in cards if card // 1000 == i] == list(
+            range(i * 1000, i * 1000 + 100)
+        )
+
+    next_day = str(tmp_path / "si2.jsonl")
+    thread.put(next_day, backup.encode_record(get_card_data(5)))
+    thread.close()
+    assert not thread.is_alive()
+    assert len(list(backup.read_journal(next_day))) == 1
+
+
+def test_backup_data(tmp_path, monkeypatch):
+    file_name = str(tmp_path / "si.jsonl")
+    monkeypatch.setattr(backup, "get_journal_file_name", lambda: file_name)
+    backup.backup_data(get_card_data(1))
+    backup.backup_data(get_card_data(2))
+    backup.close_journal()
+    cards = [record["card_number"] for record in backup.read_journal(file_name)]
+    assert cards == [1, 2]
+
+
+def test_recovery(tmp_path):
+    file_name = str(tmp_path / "si.jsonl")
+    with open(file_name, "wb") as f:
+        f.write(backup.encode_record(get_card_data(8013787)))
+        f.write(backup.encode_record(get_card_data(8013788, 40)))
+    obj = create(Race)
+    recovery_sportorg_si_log.recovery(file_name, obj)
+
+    assert [result.card_number for result in obj.results] == [8013787, 8013788]
+    result = obj.results[0]
+    assert result.start_time == OTime()
+    assert result.finish_time == OTime(hour=11, minute=30, sec=5)
+    assert [(split.code, split.time) for split in result.splits] == [
+        ("31", OTime(hour=11, minute=10, msec=500)),
+        ("32", OTime(hour=11, minute=20)),
+    ]
+
+
+def test_recovery_log(tmp_path):
+    file_name = str(tmp_path / "si.log")
+    with open(file_name, "w") as f:
+        f.write(
+            "start\n8013787\n\n11:39:25\nsplit_start\n57 11:43:05\n"
+            "69 11:37:59\nsplit_end\nend\n"
+        )
+    assert not backup.is_journal(file_name)
+    obj = create(Race)
+    recovery_sportorg_si_log.recovery(file_name, obj)
+
+    assert len(obj.results) == 1
+    assert obj.results[0].finish_time == OTime(hour=11, minute=39, sec=25)
+    assert [split.code for split in obj.results[0].splits] == ["57", "69"]
@@ -453,6 +453,16 @@ class TestRelayResultsBestTeamPlacing:
         assert team.get_leg(1).result.status == ResultStatus.DID_NOT_START
 
 
+def test_relay_time_takes_penalty_of_previous_legs(create_single_team):
+    results = {result.person.bib: result for result in race().results}
+    results[1001].penalty_time = OTime(minute=1)
+    assert results[3001].get_result_otime_relay() == OTime(minute=31)
+
+    # bibs of an individual group are not legs
+    get_group().set_type(RaceType.INDIVIDUAL_RACE)
+    assert results[3001].get_result_otime_relay() == OTime(minute=10)
+
+
 def create_relay_team(
     team_name: str, team_bib: int, num_runners: int, result_minutes: int
 ) -> RelayTeam:
@@ -0,0 +1,89 @@
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    RaceType,
+    ResultManual,
+    ResultStatus,
+    create,
+    new_event,
+    race,
+)
+from sportorg.models.result.result_tools import recalculate_results
+from sportorg.models.start.relay import get_team_result
+
+
+@pytest.fixture
+def relay_race():
+    new_event([create(Race)])
+    obj = race()
+    obj.data.relay_leg_count = 3
+    for name in ("M21", "W21"):
+        group = create(Group, name=name)
+        group.set_type(RaceType.RELAY)
+        obj.groups.append(group)
+    for team in range(1, 5):
+        group = obj.groups[team % 2]
+        for leg in range(1, 4):
+            person = create(Person, name=f"{team}_{leg}", group=group)
+            person.set_bib(leg * 1000 + team)
+            obj.add_person(person)
+            result = ResultManual()
+            result.person = person
+            result.start_time = OTime(hour=10, minute=(leg - 1) * 30)
+            result.finish_time = OTime(hour=10, minute=leg * 30 - team)
+            obj.add_new_result(result)
+    recalculate_results(recheck_results=False)
+    return obj
+
+
+def test_team_index(relay_race):
+    for team in relay_race.relay_teams:
+        assert relay_race.find_relay_team(team.bib_number) is team
+    assert relay_race.find_relay_team(100) is None
+    for group in relay_race.groups:
+        teams = relay_race.get_relay_teams_by_group(group)
+        assert {team.bib_number for team in teams} == {
+            team.bib_number for team in relay_race.relay_teams if team.group is group
+        }
+
+
+def test_legs(relay_race):
+    team = relay_race.find_relay_team(3)
+    assert [team.get_leg(leg).leg for leg in (1, 2, 3)] == [1, 2, 3]
+    assert team.get_leg(4) is None
+    assert team.get_leg(2).get_prev_leg() is team.get_leg(1)
+    assert team.get_leg(2).get_next_leg() is team.get_leg(3)
+    assert team.get_leg(3).get_next_leg() is None
+    assert team.get_time() == OTime(hour=1, minute=27)
+    assert get_team_result(team.get_leg(1).person) == OTime(hour=1, minute=27)
+
+
+def test_team_recalculated(relay_race):
+    team = relay_race.find_relay_team(2)
+    assert team.place == 2
+    team.get_leg(2).result.status = ResultStatus.DISQUALIFIED
+    recalculate_results(recheck_results=False)
+
+    team = relay_race.find_relay_team(2)
+    assert team.place == -1
+    assert team.get_correct_lap_count() == 1
+    assert get_team_result(team.get_leg(1).person) == OTime(0)
+
+
+def test_next_leg_by_number(relay_race):
+    index = relay_race.results.index(
+        relay_race.find_person_result(relay_race.find_person_by_bib(2004))
+    )
+    relay_race.delete_results([index])
+    recalculate_results(recheck_results=False)
+
+    team = relay_race.find_relay_team(4)
+    assert [leg.leg for leg in team.legs] == [1, 3]
+    assert team.get_leg(1).get_next_leg() is None
+    assert team.get_leg(3).get_prev_leg() is None
+    team = relay_race.find_relay_team(1)
+    assert team.get_leg(1).get_next_leg() is team.get_leg(2)
@@ -0,0 +1,64 @@
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    ResultManual,
+    ResultStatus,
+    create,
+    new_event,
+    race,
+)
+from sportorg.models.result.result_calculation import (
+    CalculationContext,
+    ResultCalculation,
+)
+
+
+@pytest.fixture
+def group_results():
+    new_event([create(Race)])
+    obj = race()
+    group = create(Group, name="M21")
+    obj.groups.append(group)
+    items = [
+        (50, ResultStatus.OK, 3),
+        (40, ResultStatus.OK, 3),
+        (0, ResultStatus.OK, 5),
+        (45, ResultStatus.DISQUALIFIED, 7),
+        (30, ResultStatus.MISSING_PUNCH, 1),
+        (35, ResultStatus.DISQUALIFIED, 2),
+        (40, ResultStatus.RESTORED, 1),
+        (45, ResultStatus.OK, 5),
+    ]
+    for i, (minutes, status, score) in enumerate(items):
+        person = create(Person, name=f"P{i}", group=group)
+        obj.add_person(person)
+        result = ResultManual()
+        result.person = person
+        result.start_time = OTime(hour=10)
+        result.finish_time = OTime(hour=10, minute=minutes)
+        result.status = status
+        result.rogaine_score = score
+        result.scores_ardf = score
+        obj.add_new_result(result)
+    return obj.results
+
+
+@pytest.mark.parametrize("mode", ["time", "scores", "ardf"])
+def test_sort_key_same_as_comparison(group_results, mode):
+    race().set_setting("result_processing_mode", mode)
+    expected = sorted(group_results)
+    context = CalculationContext(race())
+    actual = sorted(group_results, key=context.get_sort_key)
+    assert [id(i) for i in actual] == [id(i) for i in expected]
+
+
+def test_sort_key_is_cached_per_context(group_results, mocker):
+    spy = mocker.spy(ResultManual, "get_sort_key")
+    context = CalculationContext(race())
+    ResultCalculation(race(), context).get_group_finishes(race().groups[0])
+    context.get_sort_key(group_results[0])
+    assert spy.call_count == len(group_results)
@@ -0,0 +1,52 @@
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Group,
+    Person,
+    Race,
+    ResultManual,
+    create,
+    new_event,
+    race,
+)
+from sportorg.models.result.result_tools import recalculate_results
+
+
+@pytest.fixture
+def formula_race():
+    new_event([create(Race)])
+    obj = race()
+    obj.set_setting("scores_mode", "formula")
+    obj.set_setting("scores_formula", "round(100 * leader / time)")
+    for name in ("M21", "W21"):
+        group = create(Group, name=name)
+        obj.groups.append(group)
+        for minutes in (40, 50, 80):
+            person = create(Person, name=f"{name}_{minutes}", group=group)
+            obj.add_person(person)
+            result = ResultManual()
+            result.person = person
+            result.start_time = OTime(hour=10)
+            result.finish_time = OTime(hour=10, minute=minutes)
+            obj.add_new_result(result)
+    return obj
+
+
+def test_formula_scores(formula_race):
+    recalculate_results(recheck_results=False)
+    scores = {result.person.name: result.scores for result in formula_race.results}
+    assert scores == {
+        "M21_40": 100,
+        "M21_50": 80,
+        "M21_80": 50,
+        "W21_40": 100,
+        "W21_50": 80,
+        "W21_80": 50,
+    }
+
+
+def test_group_results_sorted_once_per_pass(formula_race, mocker):
+    spy = mocker.spy(Race, "get_group_results")
+    recalculate_results(recheck_results=False)
+    assert spy.call_count == len(formula_race.groups)
@@ -0,0 +1,89 @@
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Course,
+    CourseControl,
+    Group,
+    Person,
+    Race,
+    ResultSportident,
+    Split,
+    create,
+    new_event,
+    race,
+)
+from sportorg.models.result.split_calculation import GroupSplits
+
+
+def make_group():
+    new_event([create(Race)])
+    course = create(Course, name="C")
+    for code in ("31", "32", "33"):
+        course.controls.append(create(CourseControl, code=code))
+    race().courses.append(course)
+    group = create(Group, name="M21", course=course)
+    race().groups.append(group)
+    return group
+
+
+def make_result(group, name, split_minutes, finish_minutes):
+    person = create(Person, name=name, group=group)
+    person.start_time = OTime(hour=10)
+    race().add_person(person)
+    result = ResultSportident()
+    result.person = person
+    result.start_time = OTime(hour=10)
+    result.finish_time = OTime(hour=10, minute=finish_minutes)
+    for code, minutes in zip(("31", "32", "33"), split_minutes):
+        split = Split()
+        split.code = code
+        split.time = OTime(hour=10, minute=minutes)
+        result.splits.append(split)
+    race().add_new_result(result)
+    return result
+
+
+def test_leg_matrix():
+    group = make_group()
+    a = make_result(group, "A", (2, 5, 9), 10)
+    b = make_result(group, "B", (3, 5, 8), 9)
+    c = make_result(group, "C", (2, 6, 10), 12)
+    # the only punch is the fastest first leg
+    d = make_result(group, "D", (1,), 20)
+
+    group_splits = GroupSplits(race(), group).generate()
+    legs = group_splits.legs
+
+    # rows in the finish order
+    assert [ps.result for ps in legs.person_splits] == [b, a, c, d]
+    assert legs.leg_places == [[4, 1, 1], [2, 2, 2], [2, 3, 2], [1, 0, 0]]
+    assert legs.relative_places == [[4, 1, 1], [2, 1, 2], [2, 3, 3], [1, 0, 0]]
+    assert legs.get_column(1)[3] is None
+    assert legs.leaders == [
+        ("D", OTime(minute=1)),
+        ("B", OTime(minute=2)),
+        ("B", OTime(minute=3)),
+    ]
+    assert group_splits.get_leg_leader(1) == ("B", OTime(minute=2))
+
+    # the places are in the splits for printouts and the results tab
+    assert [split.leg_place for split in c.splits] == [2, 3, 2]
+    assert [split.relative_place for split in c.splits] == [2, 3, 3]
+    assert c.splits[1].leader_time == OTime(minute=2)
+
+    data = legs.to_dict()
+    assert data["leaders"][0] == {"name": "D", "leg_time": 60000}
+    assert data["rows"][3]["person_id"] == str(d.person.id)
+    assert data["rows"][3]["legs"][0]["leg_place"] == 1
+    assert data["rows"][3]["legs"][1] is None
+
+
+def test_group_without_course():
+    group = create(Group, name="Open")
+    new_event([create(Race)])
+    race().groups.append(group)
+    make_result(group, "A", (2, 5), 10)
+
+    group_splits = GroupSplits(race(), group).generate()
+    assert group_splits.legs.leaders == []
+    assert group_splits.legs.legs == [[]]
+    assert group_splits.get_leg_leader(0) == ("", "")
@@ -0,0 +1,184 @@
+import random
+
+import pytest
+
+from sportorg.common.otime import OTime
+from sportorg.models.memory import (
+    Course,
+    Group,
+    Person,
+    Race,
+    create,
+    new_event,
+    race,
+)
+from sportorg.models.start.start_preparation import (
+    ReserveManager,
+    StartSlotAllocator,
+    StartTimeManager,
+    get_corridors,
+    get_groups_by_corridor,
+)
+
+FIRST_START = OTime(hour=10)
+INTERVAL = OTime(minute=1)
+
+
+@pytest.fixture
+def corridor_race():
+    new_event([create(Race)])
+    obj = race()
+    rnd = random.Random(1)
+    courses = [create(Course, name=f"C{i}") for i in range(4)]
+    obj.courses.extend(courses)
+    for i in range(12):
+        group = create(Group, name=f"G{i}", course=courses[i % len(courses)])
+        group.start_corridor = i % 3 + 1
+        group.order_in_corridor = rnd.randint(1, 10)
+        group.start_interval = OTime(minute=rnd.randint(1, 3))
+        obj.groups.append(group)
+    for i in range(200):
+        person = create(Person, name=f"P{i}", group=rnd.choice(obj.groups))
+        obj.persons.append(person)
+    return obj
+
+
+def process_by_corridor(obj, is_group_start_interval, one_minute_qty, mix_groups):
+    """Previous implementation, one corridor after another"""
+    manager = StartTimeManager(obj)
+    for corridor in get_corridors():
+        if mix_groups:
+            manager.process_corridor(corridor, FIRST_START, INTERVAL, one_minute_qty)
+            continue
+        cur_start = FIRST_START
+        for group in get_groups_by_corridor(corridor):
+            interval = INTERVAL
+            if is_group_start_interval and group.start_interval:
+                interval = group.start_interval
+            cur_start = manager.process_group(
+                group, cur_start, interval, one_minute_qty
+            )
+
+
+def get_start_times(obj):
+    return [person.start_time for person in obj.persons]
+
+
+@pytest.mark.parametrize("is_group_start_interval", [False, True])
+@pytest.mark.parametrize("one_minute_qty", [1, 3])
+@pytest.mark.parametrize("mix_groups", [False, True])
+def test_same_as_by_corridor(
+    corridor_race, is_group_start_interval, one_minute_qty, mix_groups
+):
+    process_by_corridor(
+        corridor_race, is_group_start_interval, one_minute_qty, mix_groups
+    )
+    expected = get_start_times(corridor_race)
+
+    StartTimeManager(corridor_race).process(
+        FIRST_START,
+        is_group_start_interval,
+        INTERVAL,
+        one_minute_qty,
+        mix_groups=mix_groups,
+    )
+    assert get_start_times(corridor_race) == expected
+
+
+@pytest.mark.parametrize("one_minute_qty", [1, 2])
+@pytest.mark.parametrize("mix_groups", [False, True])
+def test_course_gap(corridor_race, one_minute_qty, mix_groups):
+    gap = OTime(minute=2)
+    allocator = StartSlotAllocator(corridor_race)
+    allocator.process(
+        FIRST_START, True, INTERVAL, one_minute_qty, mix_groups, course_gap=gap
+    )
+    assert allocator.shifted_count > 0
+
+    starts = [
+        (person.start_time.to_msec(), person.group.start_corridor, person.group.course)
+        for person in corridor_race.persons
+    ]
+    for start, corridor, course in starts:
+        assert start >= FIRST_START.to_msec()
+        for other_start, other_corridor, other_course in starts:
+            if other_course is course and other_corridor != corridor:
+                assert abs(start - other_start) >= gap.to_msec()
+
+    # order in each corridor is kept
+    for corridor in get_corridors():
+        persons = [
+            person
+            for person in corridor_race.persons
+            if person.group.start_corridor == corridor
+        ]
+        if not mix_groups:
+            persons.sort(
+                key=lambda item: (
+                    item.group.order_in_corridor,
+                    corridor_race.groups.index(item.group),
+                )
+            )
+        times = [person.start_time for person in persons]
+        assert times == sorted(times)
+
+
+def test_one_minute_qty(corridor_race):
+    StartSlotAllocator(corridor_race).process(FIRST_START, False, INTERVAL, 3)
+    for group in corridor_race.groups:
+        persons = corridor_race.get_persons_by_group(group) or []
+        times = [person.start_time for person in persons]
+        assert all(times.count(i) <= 3 for i in times)
+
+
+def test_reserve_and_vacant_slots(corridor_race):
+    ReserveManager(corridor_race).process("Vacant", 1, 0)
+    StartSlotAllocator(corridor_race).process(
+        FIRST_START, False, INTERVAL, vacant_slots=2
+    )
+    for group in corridor_race.groups:
+        persons = corridor_race.get_persons_by_group(group)
+        assert [person.surname for person in persons].count("Vacant") == 1
+        times = [person.start_time for person in persons]
+        assert len(set(times)) == len(times)
+
+    corridor = corridor_race.groups[0].start_corridor
+    groups = get_groups_by_corridor(corridor)
+    last = corridor_race.get_persons_by_group(groups[0])[-1]
+    first = corridor_race.get_persons_by_group(groups[1])[0]
+    assert first.start_time - last.start_time == OTime(minute=3)
+
+
+def test_corridors_take_turns():
+    new_event([create(Race)])
+    obj = race()
+    course = create(Course, name="A")
+    obj.courses.append(course)
+    for corridor in (1, 2):
+        group = create(Group, name=f"G{corridor}", course=course)
+        group.start_corridor = corridor
+        obj.groups.append(group)
+        for i in range(3):
+            obj.persons.append(create(Person, name=f"P{corridor}{i}", group=group))
+
+    StartTimeManager(obj).process(
+        FIRST_START, False, INTERVAL, course_gap=OTime(minute=2)
+    )
+    minutes = [
+        (person.group.start_corridor, person.start_time.minute)
+        for person in obj.persons
+    ]
+    assert minutes == [(1, 0), (1, 4), (1, 8), (2, 2), (2, 6), (2, 10)]
+
+
+def test_reserve_manager_slots(corridor_race):
+    slots = ReserveManager(corridor_race).get_reserve_slots(1, 0)
+    assert set(slots.values()) == {1}
+    StartTimeManager(corridor_race).process(
+        FIRST_START, False, INTERVAL, vacant_slots=slots
+    )
+    corridor = corridor_race.groups[0].start_corridor
+    groups = get_groups_by_corridor(corridor)
+    last = corridor_race.get_persons_by_group(groups[0])[-1]
+    first = corridor_race.get_persons_by_group(groups[1])[0]
+    assert first.start_time - last.start_time == OTime(minute=2)
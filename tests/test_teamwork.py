@@ -1,10 +1,31 @@
 import logging
+import random
+import selectors
+import socket
 import time
+import uuid
 from queue import Queue
 from threading import Event
 
+import orjson
+
+from sportorg.modules.teamwork.buffer import ReceiveBuffer, SendBuffer
 from sportorg.modules.teamwork.client import ClientThread
+from sportorg.modules.teamwork.packet_header import Header, Operations
+from sportorg.modules.teamwork.protocol import (
+    PING,
+    ChangeLog,
+    Codec,
+    FrameHeader,
+    ObjectVersions,
+    Peer,
+    SyncPosition,
+    encode_frames,
+)
 from sportorg.modules.teamwork.server import Command, ServerThread
+from sportorg.modules.teamwork.wakeup import Wakeup
+
+PERSON_ID = "c24eef6c-a33b-4581-a6d1-78294711aef1"
 
 
 def test_teamwork():
@@ -33,6 +54,7 @@ def test_teamwork():
             "Create",
         )
     )
+    server.wake()
     result = client_out_queue.get(timeout=10)
     assert result.data == {
         "object": "Person",
@@ -50,6 +72,7 @@ def test_teamwork():
             "Create",
         )
     )
+    client.wake()
     result = out_queue.get(timeout=5)
     assert result.data == {
         "object": "Person",
@@ -58,5 +81,406 @@ def test_teamwork():
     }
 
     event.set()
+    server.wake()
+    client.wake()
     server.join()
     client.join()
+
+
+def make_packets(sizes):
+    return [
+        Command(
+            {
+                "object": "Person",
+                "id": "c24eef6c-a33b-4581-a6d1-78294711aef1",
+                "name": "x" * size,
+            }
+        ).get_packet()
+        for size in sizes
+    ]
+
+
+def test_receive_buffer_fragments():
+    packets = make_packets([0, 10, 100000, 5, 300000, 1])
+    data = b"".join(packets)
+    buffer = ReceiveBuffer(read_size=1000)
+    received = []
+    rnd = random.Random(1)
+    pos = 0
+    while pos < len(data):
+        size = rnd.randint(1, 50000)
+        buffer.feed(data[pos : pos + size])
+        pos += size
+        received.extend(
+            len(orjson.loads(payload)["name"]) for _, payload in buffer.packets()
+        )
+    assert received == [0, 10, 100000, 5, 300000, 1]
+    assert len(buffer) == 0
+
+
+def test_buffers_on_socket():
+    packets = make_packets([500000, 10, 20, 200000])
+    sender, receiver = socket.socketpair()
+    with sender, receiver:
+        sender.setblocking(False)
+        receiver.setblocking(False)
+        send_buffer = SendBuffer()
+        for packet in packets:
+            send_buffer.append(packet)
+        receive_buffer = ReceiveBuffer(read_size=4096)
+        received = []
+        is_sent = False
+        while len(received) < len(packets):
+            if not is_sent:
+                is_sent = send_buffer.send(sender)
+            try:
+                receive_buffer.recv_into(receiver)
+            except BlockingIOError:
+                pass
+            received.extend(bytes(payload) for _, payload in receive_buffer.packets())
+        assert len(send_buffer) == 0
+        assert received == [packet[Header.header_size :] for packet in packets]
+
+
+def make_person(name, op=Operations.Update.name, version=0):
+    return Command(
+        {"object": "Person", "id": PERSON_ID, "name": name}, op, version=version
+    )
+
+
+def receive_packets(sock, buffer, count):
+    ret = []
+    sock.settimeout(5)
+    while len(ret) < count:
+        if not buffer.recv_into(sock):
+            raise ConnectionError("Connection closed")
+        ret.extend((hdr, bytes(payload)) for hdr, payload in buffer.packets())
+    return ret
+
+
+def test_protocol_frames():
+    commands = [
+        make_person("x" * size, op, version)
+        for size, op, version in [
+            (10, "Create", 1),
+            (20000, "Update", 2),
+            (30000, "Update", 3),
+            (5, "Delete", 4),
+        ]
+    ]
+    frames = encode_frames(commands, Codec.Gzip)
+    # the same operations are batched
+    assert len(frames) == 3
+
+    buffer = ReceiveBuffer()
+    for frame in frames:
+        buffer.feed(frame)
+    decoded = []
+    for hdr, payload in buffer.packets():
+        assert isinstance(hdr, FrameHeader)
+        if hdr.count == 2:
+            assert hdr.codec == Codec.Gzip
+            assert hdr.size < hdr.raw_size
+        decoded.extend(Peer.decode(hdr, payload))
+    assert [command.data for command in decoded] == [
+        command.data for command in commands
+    ]
+    assert [command.version for command in decoded] == [1, 2, 3, 4]
+    assert [command.header.op_type for command in decoded] == [
+        command.header.op_type for command in commands
+    ]
+
+
+def test_object_versions():
+    server = ObjectVersions()
+    command = make_person("a")
+    assert server.accept_on_server(command)
+    # v1 and local changes get the next version
+    assert command.version == 1
+    assert server.accept_on_server(make_person("b", version=2))
+    assert not server.accept_on_server(make_person("c", version=2))
+    assert server.get_command(PERSON_ID).data["name"] == "b"
+
+    client = ObjectVersions()
+    assert client.next_version(PERSON_ID) == 1
+    assert client.next_version(PERSON_ID) == 2
+    assert client.accept(PERSON_ID, 3)
+    assert not client.accept(PERSON_ID, 2)
+    assert client.accept(PERSON_ID, 0)
+    assert client.next_version(PERSON_ID) == 4
+
+
+def test_stale_update_and_v1_peer():
+    in_queue = Queue()
+    out_queue = Queue()
+    event = Event()
+    server = ServerThread(("127.0.0.1", 0), in_queue, out_queue, event, logging.root)
+    server.start()
+    server.wait()
+    try:
+        with socket.create_connection(server.addr) as v2, socket.create_connection(
+            server.addr
+        ) as v1:
+            v2_buffer = ReceiveBuffer()
+            v1_buffer = ReceiveBuffer()
+            v2.sendall(Peer().get_hello())
+            hdr, payload = receive_packets(v2, v2_buffer, 1)[0]
+            assert hdr.op_type == Operations.Hello.value
+            peer = Peer()
+            peer.set_hello(payload)
+            assert peer.protocol == 2
+
+            for frame in peer.encode([make_person("first", version=1)]):
+                v2.sendall(frame)
+            assert out_queue.get(timeout=5).data["name"] == "first"
+            # v1 peer gets the change as v1 packet
+            hdr, payload = receive_packets(v1, v1_buffer, 1)[0]
+            assert isinstance(hdr, Header)
+            assert orjson.loads(payload)["name"] == "first"
+
+            # the same version again is stale, the current object comes back
+            for frame in peer.encode([make_person("stale", version=1)]):
+                v2.sendall(frame)
+            hdr, payload = receive_packets(v2, v2_buffer, 1)[0]
+            current = list(peer.decode(hdr, payload))
+            assert current[0].data["name"] == "first"
+            assert current[0].version == 1
+            assert out_queue.empty()
+
+            # v1 change without version is the next version
+            v1.sendall(make_person("v1").get_packet())
+            command = out_queue.get(timeout=5)
+            assert command.data["name"] == "v1"
+            assert command.version == 2
+            hdr, payload = receive_packets(v2, v2_buffer, 1)[0]
+            assert [item.version for item in peer.decode(hdr, payload)] == [2]
+    finally:
+        event.set()
+        server.wake()
+        server.join()
+
+
+def test_client_fallback_to_v1():
+    event = Event()
+    in_queue = Queue()
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(2)
+        listener.settimeout(5)
+        client = ClientThread(
+            listener.getsockname(), in_queue, Queue(), event, logging.root
+        )
+        client.HELLO_TIMEOUT = 0.2
+        client.start()
+        try:
+            # an old server ignores Hello
+            conn, _ = listener.accept()
+            with conn:
+                hdr, _ = receive_packets(conn, ReceiveBuffer(), 1)[0]
+                assert hdr.op_type == Operations.Hello.value
+                conn, _ = listener.accept()
+            with conn:
+                in_queue.put(make_person("old"))
+                client.wake()
+                hdr, payload = receive_packets(conn, ReceiveBuffer(), 1)[0]
+                assert isinstance(hdr, Header)
+                assert orjson.loads(payload)["name"] == "old"
+        finally:
+            event.set()
+            client.wake()
+            client.join()
+
+
+def test_wakeup():
+    wakeup = Wakeup()
+    selector = selectors.DefaultSelector()
+    selector.register(wakeup, selectors.EVENT_READ)
+    try:
+        assert selector.select(timeout=0) == []
+        wakeup.set()
+        wakeup.set()
+        assert len(selector.select(timeout=5)) == 1
+        wakeup.clear()
+        assert selector.select(timeout=0) == []
+    finally:
+        selector.close()
+        wakeup.close()
+    # a stopped thread is not woken
+    wakeup.set()
+
+
+def test_slow_client_disconnected(mocker):
+    mocker.patch.object(SendBuffer, "HIGH_WATER", 1024 * 1024)
+    in_queue = Queue()
+    out_queue = Queue()
+    event = Event()
+    server = ServerThread(("127.0.0.1", 0), in_queue, out_queue, event, logging.root)
+    server.start()
+    server.wait()
+    try:
+        with socket.socket() as slow:
+            slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            slow.connect(server.addr)
+            # v1 peer, packets are not compressed
+            slow.sendall(make_person("slow").get_packet())
+            out_queue.get(timeout=5)
+            for _ in range(100):
+                in_queue.put(make_person("x" * 200000))
+            server.wake()
+            size = 0
+            slow.settimeout(5)
+            while True:
+                try:
+                    data = slow.recv(1024 * 1024)
+                except ConnectionResetError:
+                    break
+                if not data:
+                    break
+                size += len(data)
+            assert size < 10 * 1024 * 1024
+    finally:
+        event.set()
+        server.wake()
+        server.join()
+
+
+def test_change_log():
+    versions = ObjectVersions()
+    change_log = ChangeLog(size=3)
+    for i in range(5):
+        command = Command(
+            {"object": "Person", "id": str(uuid.UUID(int=i % 2)), "name": str(i)}
+        )
+        versions.accept_on_server(command)
+        change_log.append(command)
+    assert change_log.seq == 5
+
+    def get_missing(session, seq):
+        return [
+            command.seq for command in change_log.get_missing(session, seq, versions)
+        ]
+
+    assert get_missing(change_log.session, 5) == []
+    assert get_missing(change_log.session, 3) == [4, 5]
+    assert get_missing(change_log.session, 2) == [3, 4, 5]
+    # too far behind or another server, the last command of every object
+    assert get_missing(change_log.session, 1) == [4, 5]
+    assert get_missing(uuid.uuid4().hex, 5) == [4, 5]
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_client_reconnect_and_catch_up(mocker):
+    mocker.patch.object(ClientThread, "RECONNECT_DELAY", 0.01)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        addr = s.getsockname()
+    server_in = Queue()
+    server_out = Queue()
+    server_stop = Event()
+    position = SyncPosition()
+    client_out = Queue()
+    client_stop = Event()
+
+    def start_client():
+        client = ClientThread(
+            addr, Queue(), client_out, client_stop, logging.root, position=position
+        )
+        client.start()
+        client.wait()
+        return client
+
+    def stop_client(client):
+        client_stop.set()
+        client.wake()
+        client.join()
+        client_stop.clear()
+
+    # the server is not started yet, the client tries again
+    client = start_client()
+    server = ServerThread(addr, server_in, server_out, server_stop, logging.root)
+    server.start()
+    server.wait()
+    try:
+        wait_for(lambda: position.session)
+        server_in.put(make_person("first"))
+        server.wake()
+        assert client_out.get(timeout=5).data["name"] == "first"
+        wait_for(lambda: position.seq == 1)
+        stop_client(client)
+
+        # missed while disconnected
+        server_in.put(make_person("second"))
+        server.wake()
+        client = start_client()
+        assert client_out.get(timeout=5).data["name"] == "second"
+        wait_for(lambda: position.seq == 2)
+        stop_client(client)
+        assert client_out.empty()
+    finally:
+        stop_client(client)
+        server_stop.set()
+        server.wake()
+        server.join()
+
+
+def test_silent_client_disconnected(mocker):
+    mocker.patch.object(ServerThread, "HEARTBEAT_TIMEOUT", 0.2)
+    event = Event()
+    server = ServerThread(("127.0.0.1", 0), Queue(), Queue(), event, logging.root)
+    server.start()
+    server.wait()
+    try:
+        with socket.create_connection(server.addr, timeout=5) as conn:
+            conn.sendall(Peer().get_hello())
+            buffer = ReceiveBuffer()
+            hdr, _ = receive_packets(conn, buffer, 1)[0]
+            assert hdr.op_type == Operations.Hello.value
+            # Ping is answered
+            conn.sendall(PING)
+            hdr, _ = receive_packets(conn, buffer, 1)[0]
+            assert hdr.op_type == Operations.Ping.value
+            # then the network is lost
+            assert conn.recv(1024) == b""
+    finally:
+        event.set()
+        server.wake()
+        server.join()
+
+
+def test_client_reconnects_to_silent_server(mocker):
+    mocker.patch.object(ClientThread, "HEARTBEAT_INTERVAL", 0.05)
+    mocker.patch.object(ClientThread, "HEARTBEAT_TIMEOUT", 0.2)
+    mocker.patch.object(ClientThread, "RECONNECT_DELAY", 0.01)
+    event = Event()
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(2)
+        listener.settimeout(5)
+        client = ClientThread(
+            listener.getsockname(), Queue(), Queue(), event, logging.root
+        )
+        client.start()
+        try:
+            conn, _ = listener.accept()
+            with conn:
+                buffer = ReceiveBuffer()
+                hdr, payload = receive_packets(conn, buffer, 1)[0]
+                assert hdr.op_type == Operations.Hello.value
+                conn.sendall(Peer().accept_hello(payload, ChangeLog()))
+                # the server answers nothing more
+                hdr, _ = receive_packets(conn, buffer, 1)[0]
+                assert hdr.op_type == Operations.Ping.value
+                conn, _ = listener.accept()
+            with conn:
+                hdr, _ = receive_packets(conn, ReceiveBuffer(), 1)[0]
+                assert hdr.op_type == Operations.Hello.value
+        finally:
+            event.set()
+            client.wake()
+            client.join()
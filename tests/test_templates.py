@@ -1,4 +1,8 @@
-from sportorg.common.template import get_text_from_file
+import os
+
+from sportorg import config, settings
+from sportorg.common.template import get_text_from_file, warm_up_templates
+from sportorg.libs.template import template
 from sportorg.models.constant import RentCards
 from sportorg.models.memory import get_current_race_index, races
 from sportorg.modules.backup.file import File
@@ -18,3 +22,38 @@ def test_generate_report():
     )
 
     assert result
+
+
+def test_template_cache_by_mtime(tmp_path):
+    path = tmp_path / "split.html"
+    path.write_text("{{ name }} 1")
+    first = template.get_template_from_path(str(path))
+    assert get_text_from_file(str(path)) == "SportOrg 1"
+    assert template.get_template_from_path(str(path)) is first
+
+    path.write_text("{{ name }} 2")
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+    assert get_text_from_file(str(path)) == "SportOrg 2"
+
+
+def test_report_names_share_cache():
+    searchpath = settings.template_dir()
+    assert template.get_template(
+        searchpath, "/reports/1_results.html"
+    ) is template.get_template(searchpath, "reports/1_results.html")
+
+
+def test_warm_up_templates(tmp_path, mocker):
+    path = tmp_path / "warm.html"
+    path.write_text("{{ version }}")
+    warm_up_templates([str(path), "missing.html"]).join()
+    get_source = mocker.spy(template.PathLoader, "get_source")
+    assert get_text_from_file(str(path)) == config.VERSION
+    get_source.assert_not_called()
+
+
+def test_split_printout_template_compiles():
+    # the default split printout is given by path and uses the date filter
+    path = settings.template_dir("split", "1_split_printout.html")
+    assert template.get_template_from_path(path)